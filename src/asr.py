@@ -0,0 +1,277 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+import numpy
+import audio
+try:
+    import pocketsphinx
+except ImportError:
+    pocketsphinx = None
+
+"""
+This module offers speech recognition by decoders that stay loaded. A decoder
+server process (see serve()) loads its models once and then reads one request
+after the other from a pipe: a json header line with sample rate and number of
+samples, followed by the samples as 16-bit pcm. Each request is answered with
+one json line holding the transcript and word timings. DecoderClient starts
+such a process and sends it requests from any number of threads, one at a time.
+
+Besides pocketsphinx, a stand-in decoder without models (StubDecoder) can be
+served, which is useful for testing without pocketsphinx installed.
+
+example:
+    client = asr.get_client(asr.DECODER_STUB, {'words': ['hello', 'there']})
+    print(client.transcribe(audio.AudioBuffer.from_wav('hello.wav')))
+"""
+
+# decoder of a new pocketsphinx_continuous process per utterance (no server;
+# see remote_tts.recognize_buffer())
+DECODER_CONTINUOUS = 'continuous'
+# pocketsphinx decoder kept in a server process (requires pocketsphinx 5)
+DECODER_POCKETSPHINX = 'pocketsphinx'
+# stand-in decoder kept in a server process, see StubDecoder
+DECODER_STUB = 'stub'
+
+# clients shared by all threads of this process; see get_client()
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class Word(namedtuple('Word', ['word', 'start', 'end'])):
+    """recognized word with its beginning and end in seconds"""
+    __slots__ = ()
+
+
+class Transcription(namedtuple('Transcription', ['text', 'words'])):
+    """result of recognition
+
+    attributes:
+        text: transcript as a single string
+        words: list of Word tuples in order; None if the decoder does not
+            provide timings
+    """
+    __slots__ = ()
+
+
+def get_default_decoder():
+    """returns the persistent pocketsphinx decoder if the pocketsphinx module
+    is available, else a pocketsphinx_continuous process per utterance"""
+    return DECODER_POCKETSPHINX if pocketsphinx else DECODER_CONTINUOUS
+
+
+class PocketsphinxDecoder(object):
+    """pocketsphinx decoder; models are loaded once by the constructor"""
+
+    def __init__(self, **config):
+        """constructor
+
+        args:
+            config: pocketsphinx configuration, e.g. hmm, lm and dict (paths of
+                the acoustic model, language model and dictionary); the
+                default us english models of pocketsphinx are used if none
+                given
+        """
+        if not pocketsphinx:
+            raise ValueError('pocketsphinx decoder requires pocketsphinx')
+        self._decoder = pocketsphinx.Decoder(**config)
+        self._frame_rate = float(self._decoder.config['frate'])
+        self._rate = int(self._decoder.config['samprate'])
+
+    def decode(self, samples, rate):
+        """returns Transcription of given samples (one utterance)"""
+        if rate != self._rate:
+            samples = audio.to_int16(audio.resample(samples, rate, self._rate))
+        self._decoder.start_utt()
+        self._decoder.process_raw(samples.astype('<i2').tobytes(),
+                                  full_utt=True)
+        self._decoder.end_utt()
+        hyp = self._decoder.hyp()
+        words = []
+        for seg in self._decoder.seg():
+            # skip silence and noise, remove the number of alternative
+            # pronunciations (as in 'the(2)')
+            if seg.word.startswith('<') or seg.word.startswith('['):
+                continue
+            words.append(Word(seg.word.split('(')[0],
+                              seg.start_frame / self._frame_rate,
+                              (seg.end_frame + 1) / self._frame_rate))
+        return Transcription(hyp.hypstr if hyp else '', words)
+
+
+class StubDecoder(object):
+    """stand-in decoder that finds words by energy instead of models
+
+    every stretch of audio above min_level_db that is separated from the next
+    by at least min_pause_secs counts as a word; words are labelled with the
+    given words in turn (or 'speech')
+
+    attributes:
+        words: labels for the recognized words, repeated if necessary
+        min_level_db: level (dBFS) of 10 ms frames above which they are speech
+        min_pause_secs: minimum pause between words in seconds
+        load_secs: seconds the constructor waits to simulate model loading
+    """
+
+    def __init__(self, words=None, min_level_db=-40.0, min_pause_secs=0.1,
+                 load_secs=0.0):
+        """constructor; see attributes for the parameters"""
+        self.words = words if words else ['speech']
+        self.min_level_db = min_level_db
+        self.min_pause_secs = min_pause_secs
+        self.load_secs = load_secs
+        if load_secs > 0:
+            time.sleep(load_secs)
+
+    def decode(self, samples, rate):
+        """returns Transcription of given samples (one utterance)"""
+        frame_len = audio.secs_to_samples(0.01, rate)
+        frame_count = len(samples) // frame_len
+        frames = numpy.asarray(samples[:frame_count * frame_len],
+                               dtype=numpy.float64).reshape(
+            frame_count, frame_len) / 32768.0
+        loud = 10 * numpy.log10(numpy.mean(frames ** 2, axis=1) + 1e-10) > \
+            self.min_level_db
+        # collect (first, last) frame of every loud stretch, then merge those
+        # separated by short pauses
+        changes = numpy.flatnonzero(numpy.diff(numpy.concatenate(
+            [[False], loud, [False]]).astype(numpy.int8)))
+        spans = []
+        min_pause = self.min_pause_secs / 0.01
+        for first, last in zip(changes[::2], changes[1::2]):
+            if spans and first - spans[-1][1] < min_pause:
+                spans[-1][1] = last
+            else:
+                spans.append([first, last])
+        words = [Word(self.words[i % len(self.words)],
+                      first * frame_len / float(rate),
+                      last * frame_len / float(rate))
+                 for i, (first, last) in enumerate(spans)]
+        return Transcription(' '.join(word.word for word in words), words)
+
+
+DECODERS = {DECODER_POCKETSPHINX: PocketsphinxDecoder,
+            DECODER_STUB: StubDecoder}
+
+
+def serve(decoder, config=None, in_file=None, out_file=None):
+    """answers requests from in_file with a decoder until in_file is closed
+
+    args:
+        decoder: DECODER_POCKETSPHINX or DECODER_STUB
+        config: dictionary of keyword arguments for the decoder's constructor
+        in_file: binary file requests are read from; stdin if None
+        out_file: binary file responses are written to; stdout if None
+    """
+    in_file = in_file if in_file else sys.stdin.buffer
+    out_file = out_file if out_file else sys.stdout.buffer
+    decoder = DECODERS[decoder](**(config if config else {}))
+    while True:
+        header = in_file.readline()
+        if not header:
+            break
+        request = json.loads(header.decode('utf-8'))
+        data = in_file.read(2 * request['samples'])
+        try:
+            transcription = decoder.decode(
+                numpy.frombuffer(data, dtype='<i2'), request['rate'])
+            response = {'text': transcription.text,
+                        'words': [list(word)
+                                  for word in transcription.words]}
+        except Exception as e:
+            # keep serving, the client raises the error
+            response = {'error': '%s: %s' % (type(e).__name__, e)}
+        out_file.write((json.dumps(response) + '\n').encode('utf-8'))
+        out_file.flush()
+
+
+class DecoderClient(object):
+    """sends audio to a decoder server process (see serve()) through a pipe
+
+    the process is started on the first request (or by start()) and keeps its
+    models loaded for all further requests; a lock lets one thread at a time
+    send a request and read its response; a process that died is restarted on
+    the next request
+
+    attributes:
+        decoder: DECODER_POCKETSPHINX or DECODER_STUB
+        config: dictionary of keyword arguments for the decoder's constructor
+        process: the server process; None before it is started
+    """
+
+    def __init__(self, decoder=DECODER_POCKETSPHINX, config=None):
+        """constructor; does not start the server yet"""
+        self.decoder = decoder
+        self.config = config if config else {}
+        self.process = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """starts the server process unless it is running"""
+        with self._lock:
+            self._start()
+
+    def transcribe(self, buffer):
+        """returns Transcription of an audio.AudioBuffer (one utterance)
+
+        raises:
+            subprocess.CalledProcessError: the server process terminated
+            RuntimeError: the decoder failed on the given audio
+        """
+        header = json.dumps({'rate': buffer.rate,
+                             'samples': len(buffer.samples)}) + '\n'
+        with self._lock:
+            self._start()
+            try:
+                self.process.stdin.write(header.encode('utf-8'))
+                self.process.stdin.write(
+                    buffer.samples.astype('<i2').tobytes())
+                self.process.stdin.flush()
+                line = self.process.stdout.readline()
+            except BrokenPipeError:
+                line = b''
+            if not line:
+                returncode = self.process.wait()
+                self.process = None
+                raise subprocess.CalledProcessError(returncode, self.decoder)
+        response = json.loads(line.decode('utf-8'))
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return Transcription(response['text'],
+                             [Word(*word) for word in response['words']])
+
+    def close(self):
+        """ends the server process (closing its input) and waits for it"""
+        with self._lock:
+            if self.process:
+                self.process.stdin.close()
+                self.process.wait()
+                self.process.stdout.close()
+                self.process = None
+
+    def _start(self):
+        if self.process and self.process.poll() is None:
+            return
+        # stderr is discarded like pocketsphinx_continuous' log before
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), self.decoder,
+             json.dumps(self.config)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL)
+
+
+def get_client(decoder, config=None):
+    """returns the client of this process for given decoder and config,
+    creating it on first use"""
+    key = (decoder, json.dumps(config, sort_keys=True))
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = DecoderClient(decoder, config)
+        return _clients[key]
+
+
+if __name__ == '__main__':
+    serve(sys.argv[1], json.loads(sys.argv[2]) if len(sys.argv) > 2 else None)
@@ -0,0 +1,444 @@
+import numpy
+import wave
+
+"""
+This module offers in-memory handling of 16-bit pcm audio, most importantly a
+timeline builder which splices audio sections and silence for several channels
+without writing intermediate files.
+"""
+
+DEFAULT_RATE = 16000
+
+
+def read_wav(fname):
+    """reads a 16-bit pcm wav file into memory
+
+    args:
+        fname: name of the wav file
+
+    returns:
+        tuple of a numpy int16 array with the (first channel's) samples and the
+        sample rate of the file
+
+    raises:
+        ValueError: the file does not contain 16-bit pcm audio
+    """
+    with wave.open(fname, 'rb') as wav_file:
+        if wav_file.getsampwidth() != 2:
+            raise ValueError('only 16-bit pcm wav files are supported')
+        channels = wav_file.getnchannels()
+        rate = wav_file.getframerate()
+        frames = wav_file.readframes(wav_file.getnframes())
+    samples = numpy.frombuffer(frames, dtype='<i2')
+    if channels > 1:
+        samples = samples[::channels]
+    return samples, rate
+
+
+def memmap_wav(fname):
+    """maps the samples of a 16-bit pcm wav file into memory without reading it
+
+    args:
+        fname: name of the wav file
+
+    returns:
+        tuple of a read-only numpy int16 memmap of the (first channel's)
+        samples and the sample rate of the file
+
+    raises:
+        ValueError: the file is not a 16-bit pcm wav file
+    """
+    with open(fname, 'rb') as wav_file:
+        header = wav_file.read(12)
+        if header[0:4] != b'RIFF' or header[8:12] != b'WAVE':
+            raise ValueError('not a wav file: %s' % fname)
+        channels = rate = None
+        # walk the chunks until the data chunk; format chunk precedes it
+        while True:
+            chunk_header = wav_file.read(8)
+            if len(chunk_header) < 8:
+                raise ValueError('no data chunk in wav file: %s' % fname)
+            chunk_id = chunk_header[0:4]
+            chunk_size = int.from_bytes(chunk_header[4:8], 'little')
+            if chunk_id == b'fmt ':
+                fmt = wav_file.read(chunk_size)
+                audio_format = int.from_bytes(fmt[0:2], 'little')
+                channels = int.from_bytes(fmt[2:4], 'little')
+                rate = int.from_bytes(fmt[4:8], 'little')
+                sample_width = int.from_bytes(fmt[14:16], 'little')
+                if audio_format != 1 or sample_width != 16:
+                    raise ValueError('only 16-bit pcm wav files are supported')
+                # chunks are padded to an even number of bytes
+                wav_file.seek(chunk_size % 2, 1)
+            elif chunk_id == b'data':
+                if channels is None:
+                    raise ValueError('no format chunk in wav file: %s' % fname)
+                offset = wav_file.tell()
+                break
+            else:
+                wav_file.seek(chunk_size + chunk_size % 2, 1)
+    frames = chunk_size // (2 * channels)
+    samples = numpy.memmap(fname, dtype='<i2', mode='r', offset=offset,
+                           shape=(frames * channels,))
+    if channels > 1:
+        samples = samples[::channels]
+    return samples, rate
+
+
+def parse_wav_header(data):
+    """parses the header of a 16-bit pcm wav file from its first bytes
+
+    meant for wav files that arrive in pieces (see
+    remote_tts.synthesize_stream()); the size of the data chunk is ignored
+    since streamed files often do not know it in advance
+
+    args:
+        data: bytes from the beginning of the wav file
+
+    returns:
+        tuple of number of channels, sample rate and offset of the first
+        sample in data; None if data ends before the first sample
+
+    raises:
+        ValueError: data is not the beginning of a 16-bit pcm wav file
+    """
+    if len(data) < 12:
+        return None
+    if data[0:4] != b'RIFF' or data[8:12] != b'WAVE':
+        raise ValueError('not a wav file')
+    channels = rate = None
+    pos = 12
+    # walk the chunks until the data chunk; format chunk precedes it
+    while len(data) >= pos + 8:
+        chunk_id = data[pos:pos + 4]
+        chunk_size = int.from_bytes(data[pos + 4:pos + 8], 'little')
+        pos += 8
+        if chunk_id == b'data':
+            if channels is None:
+                raise ValueError('no format chunk in wav file')
+            return channels, rate, pos
+        # chunks are padded to an even number of bytes
+        if len(data) < pos + chunk_size + chunk_size % 2:
+            return None
+        if chunk_id == b'fmt ':
+            audio_format = int.from_bytes(data[pos:pos + 2], 'little')
+            channels = int.from_bytes(data[pos + 2:pos + 4], 'little')
+            rate = int.from_bytes(data[pos + 4:pos + 8], 'little')
+            sample_width = int.from_bytes(data[pos + 14:pos + 16], 'little')
+            if audio_format != 1 or sample_width != 16:
+                raise ValueError('only 16-bit pcm wav files are supported')
+        pos += chunk_size + chunk_size % 2
+    return None
+
+
+def write_wav(fname, samples, rate=DEFAULT_RATE):
+    """writes given samples to a mono 16-bit pcm wav file
+
+    args:
+        fname: name of the wav file
+        samples: numpy array of samples; floats are rounded and clipped
+        rate: sample rate of the samples
+    """
+    samples = to_int16(samples)
+    with wave.open(fname, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(samples.astype('<i2').tobytes())
+
+
+def to_int16(samples):
+    """returns given samples as int16 array, rounding and clipping floats"""
+    if samples.dtype == numpy.int16:
+        return samples
+    return numpy.clip(numpy.round(samples), -32768, 32767).astype(numpy.int16)
+
+
+def secs_to_samples(secs, rate=DEFAULT_RATE):
+    """converts a time in seconds to the closest number of samples"""
+    return int(round(secs * rate))
+
+
+def resample(samples, in_rate, out_rate):
+    """changes the sample rate of given samples
+
+    uses band-limited (fft-based) interpolation, which behaves like sox's
+    default rate conversion for the integer ratios used here (8k to 16k)
+
+    args:
+        samples: numpy array of samples
+        in_rate: sample rate of the given samples
+        out_rate: target sample rate
+
+    returns:
+        numpy float64 array of the resampled samples
+    """
+    if in_rate == out_rate or len(samples) == 0:
+        return samples.astype(numpy.float64)
+    out_len = int(round(len(samples) * out_rate / float(in_rate)))
+    spectrum = numpy.fft.rfft(samples.astype(numpy.float64))
+    # irfft zero-pads (upsampling) or truncates (downsampling) the spectrum;
+    # rescale since numpy normalizes the inverse transform by its length
+    return numpy.fft.irfft(spectrum, out_len) * (out_len / float(len(samples)))
+
+
+class Source(object):
+    """audio file that is decoded once and then sliced without copying
+
+    the file is memory-mapped and, if necessary, resampled to the target rate
+    a single time; sections are views into that buffer
+
+    attributes:
+        fname: name of the wav file
+        rate: sample rate of samples
+        samples: numpy array with all samples at the target rate
+    """
+
+    def __init__(self, fname, rate=DEFAULT_RATE):
+        """constructor; maps the given file and resamples it to given rate"""
+        self.fname = fname
+        self.rate = rate
+        samples, in_rate = memmap_wav(fname)
+        if in_rate != rate:
+            samples = to_int16(resample(samples, in_rate, rate))
+        self.samples = samples
+
+    def section(self, start, end):
+        """returns a view of the samples between start and end (in seconds)"""
+        return self.samples[secs_to_samples(start, self.rate):
+                            secs_to_samples(end, self.rate)]
+
+
+class AudioBuffer(object):
+    """mono 16-bit pcm audio in memory
+
+    passed between recording, analysis and playback instead of wav files; a
+    file is only written where an external tool needs one (see
+    remote_tts.scratch_wav())
+
+    attributes:
+        samples: numpy int16 array of the samples
+        rate: sample rate of samples
+    """
+
+    def __init__(self, samples, rate=DEFAULT_RATE):
+        """constructor; floats are rounded and clipped to 16 bits"""
+        self.samples = to_int16(numpy.asarray(samples))
+        self.rate = rate
+
+    @classmethod
+    def from_wav(cls, fname):
+        """returns a buffer with the (first channel of the) given wav file"""
+        samples, rate = read_wav(fname)
+        return cls(samples, rate)
+
+    @classmethod
+    def from_frames(cls, frames, rate=DEFAULT_RATE):
+        """returns a buffer with given raw mono 16-bit pcm frames (bytes), as
+        read from a pyaudio stream"""
+        return cls(numpy.frombuffer(frames, dtype='<i2'), rate)
+
+    def get_duration(self):
+        """returns the length of the audio in seconds"""
+        return len(self.samples) / float(self.rate)
+
+    def prepend_silence(self, length_secs):
+        """returns a new buffer with given number of seconds of silence
+        followed by this buffer's samples"""
+        silence = numpy.zeros(secs_to_samples(length_secs, self.rate),
+                              dtype=numpy.int16)
+        return AudioBuffer(numpy.concatenate([silence, self.samples]),
+                           self.rate)
+
+    def write_wav(self, fname):
+        """writes the audio to a wav file"""
+        write_wav(fname, self.samples, self.rate)
+
+
+class Endpointer(object):
+    """energy-based detection of an utterance in audio arriving in chunks
+
+    the level of every frame is compared with a running estimate of the
+    background noise level; speech starts with min_speech_secs of consecutive
+    loud frames and is over once trailing_silence_secs of quiet frames follow
+
+    attributes:
+        rate: sample rate of the audio
+        trailing_silence_secs: seconds of quiet after speech that end it
+        min_speech_secs: seconds of consecutive loud frames that start speech
+        threshold_db: decibel above the noise level at which a frame is loud
+        min_level_db: level (dBFS) below which a frame is never loud
+        padding_secs: seconds of audio kept around speech by get_segment()
+        frame_len: number of samples per frame
+        length: number of samples processed so far
+        speech_start: index of the first sample of speech; None before speech
+            was detected
+        speech_end: index after the last loud frame of the speech so far
+        done: whether speech was followed by trailing_silence_secs of quiet
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, trailing_silence_secs=0.7,
+                 min_speech_secs=0.1, threshold_db=10.0, min_level_db=-50.0,
+                 padding_secs=0.1, frame_secs=0.01):
+        """constructor; see attributes for the parameters"""
+        self.rate = rate
+        self.trailing_silence_secs = trailing_silence_secs
+        self.min_speech_secs = min_speech_secs
+        self.threshold_db = threshold_db
+        self.min_level_db = min_level_db
+        self.padding_secs = padding_secs
+        self.frame_len = max(secs_to_samples(frame_secs, rate), 1)
+        self.length = 0
+        self.speech_start = None
+        self.speech_end = None
+        self.done = False
+        self._noise_db = None
+        self._loud_start = None
+        self._pending = numpy.zeros(0, dtype=numpy.float64)
+
+    def process(self, samples):
+        """analyzes the next chunk of samples
+
+        args:
+            samples: numpy array of 16-bit samples following the previous ones
+
+        returns:
+            True if the end of the utterance was reached (see done)
+        """
+        samples = numpy.concatenate(
+            [self._pending, numpy.asarray(samples, dtype=numpy.float64)])
+        frame_count = len(samples) // self.frame_len
+        self._pending = samples[frame_count * self.frame_len:]
+        if not frame_count or self.done:
+            self.length += frame_count * self.frame_len
+            return self.done
+        # level of each frame in decibel relative to full scale
+        frames = samples[:frame_count * self.frame_len].reshape(
+            frame_count, self.frame_len) / 32768.0
+        levels = 10 * numpy.log10(numpy.mean(frames ** 2, axis=1) + 1e-10)
+
+        min_speech = secs_to_samples(self.min_speech_secs, self.rate)
+        trailing_silence = secs_to_samples(self.trailing_silence_secs,
+                                           self.rate)
+        for level in levels:
+            if self._noise_db is None:
+                self._noise_db = min(level, self.min_level_db)
+            start = self.length
+            self.length += self.frame_len
+            if level > max(self._noise_db + self.threshold_db,
+                           self.min_level_db):
+                if self._loud_start is None:
+                    self._loud_start = start
+                if self.length - self._loud_start >= min_speech:
+                    if self.speech_start is None:
+                        self.speech_start = self._loud_start
+                    self.speech_end = self.length
+                continue
+            self._loud_start = None
+            # the noise estimate follows quiet frames, quickly downwards
+            if level < self._noise_db:
+                self._noise_db = level
+            else:
+                self._noise_db += 0.05 * (level - self._noise_db)
+            if self.speech_end is not None and \
+                    self.length - self.speech_end >= trailing_silence:
+                self.done = True
+                break
+        return self.done
+
+    def get_segment(self):
+        """returns tuple of the indices of the first and after the last sample
+        of speech, including padding; None if no speech was detected"""
+        if self.speech_start is None:
+            return None
+        padding = secs_to_samples(self.padding_secs, self.rate)
+        return (max(self.speech_start - padding, 0),
+                min(self.speech_end + padding, self.length))
+
+
+class Timeline(object):
+    """builds several aligned mono channels in memory
+
+    sections are only collected in lists while building; they are concatenated
+    once when the result is requested, so appending is independent of the
+    length of the timeline so far
+
+    attributes:
+        rate: sample rate of all channels
+        chunks: one list of sample arrays per channel
+        lengths: current length of each channel in samples
+    """
+
+    def __init__(self, channels=2, rate=DEFAULT_RATE):
+        """constructor; initializes given number of empty channels"""
+        self.rate = rate
+        self.chunks = [[] for _ in range(channels)]
+        self.lengths = [0] * channels
+
+    def add_silence(self, channel, length_secs):
+        """appends given number of seconds of silence to a channel
+
+        args:
+            channel: index of the channel
+            length_secs: number of seconds of silence to append
+        """
+        if length_secs <= 0.0:
+            return
+        length = secs_to_samples(length_secs, self.rate)
+        self.chunks[channel].append(numpy.zeros(length, dtype=numpy.int16))
+        self.lengths[channel] += length
+
+    def append(self, channel, samples, rate=None, start=None, end=None):
+        """appends given samples (or a section of them) to a channel
+
+        args:
+            channel: index of the channel
+            samples: numpy array of samples
+            rate: sample rate of the samples; resampled to the timeline's rate
+                if different (default: same as the timeline)
+            start: beginning of the section to copy in seconds (default: 0)
+            end: end of the section to copy in seconds (default: end of samples)
+        """
+        rate = rate if rate else self.rate
+        start = secs_to_samples(start, rate) if start else 0
+        end = secs_to_samples(end, rate) if end is not None else len(samples)
+        section = samples[start:end]
+        if rate != self.rate:
+            section = to_int16(resample(section, rate, self.rate))
+        self.chunks[channel].append(section)
+        self.lengths[channel] += len(section)
+
+    def append_wav(self, channel, fname, start=None, end=None):
+        """appends a wav file (or a section of it) to a channel; see append()"""
+        samples, rate = read_wav(fname)
+        self.append(channel, samples, rate, start, end)
+
+    def get_duration(self, channel):
+        """returns the current length of a channel in seconds"""
+        return self.lengths[channel] / float(self.rate)
+
+    def get_channel(self, channel):
+        """returns all samples of a channel as one int16 array"""
+        if not self.chunks[channel]:
+            return numpy.zeros(0, dtype=numpy.int16)
+        samples = numpy.concatenate(self.chunks[channel])
+        # keep a single chunk so repeated calls do not concatenate again
+        self.chunks[channel] = [samples]
+        return samples
+
+    def mix(self):
+        """returns all channels mixed down to a single channel
+
+        like 'sox -m', each channel is scaled by 1/(number of channels) and
+        shorter channels are padded with silence at the end
+        """
+        length = max(self.lengths) if self.lengths else 0
+        mixed = numpy.zeros(length, dtype=numpy.float64)
+        for channel in range(len(self.chunks)):
+            samples = self.get_channel(channel)
+            mixed[:len(samples)] += samples
+        return to_int16(mixed / max(len(self.chunks), 1))
+
+    def write_mix(self, fname):
+        """writes all channels mixed down to a single wav file; see mix()"""
+        write_wav(fname, self.mix(), self.rate)
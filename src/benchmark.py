@@ -0,0 +1,308 @@
+import remote_tts
+import features
+import switchboard
+import transcript
+import stub_tts
+import audio
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import numpy
+
+"""
+This module benchmarks the hot paths of synthesis and analysis, extending the
+hand-made tables in misc/experiments/runtime_averages: synthesis per voice and
+setting (seconds per syllable, as in those tables), feature extraction per
+backend, adapt_wav(), the repeat_until_close search and a whole
+switchboard.generate_conversation() run. By default, a local stub server (see
+stub_tts) replaces marytts so the benchmarks run offline and reproducibly;
+stages needing praat are skipped where it is not installed. Results are saved as
+json and compared against a saved baseline to flag regressions.
+"""
+
+# settings of the runtime_averages tables as (name, rate, pitch)
+SETTINGS = [('dflt', 'default', 'default'),
+            ('r+30%', '+30%', 'default'),
+            ('r-30%', '-30%', 'default'),
+            ('p+30%', 'default', '+30%'),
+            ('p-30%', 'default', '-30%'),
+            ('pr+30%', '+30%', '+30%'),
+            ('pr-30%', '-30%', '-30%')]
+# relative slowdown (of the mean) at which a benchmark counts as regression
+DEFAULT_THRESHOLD = 0.2
+
+
+def summarize(values, unit):
+    """returns a result entry with mean and standard deviation of values"""
+    return {'mean': float(numpy.mean(values)), 'std': float(numpy.std(values)),
+            'n': len(values), 'unit': unit}
+
+
+def bench_synthesize(voices, corpus, repeats=1):
+    """synthesizes all corpus lines per voice and setting
+
+    lines are run through in the outer loop (as for runtime_averages), so a
+    period of load affects all voices alike
+
+    returns:
+        dictionary of result entries (seconds per syllable), keyed by
+        'synthesize/<voice>/<setting>', and list of the synthesized files of
+        the default setting (for the other benchmarks)
+    """
+    times = {}
+    fnames = []
+    for _ in range(repeats):
+        for syll_count, text in corpus:
+            for voice in voices:
+                for name, rate, pitch in SETTINGS:
+                    start = time.perf_counter()
+                    fname = remote_tts.synthesize(
+                        remote_tts.get_ssml(text, rate, pitch), False,
+                        remote_tts.INPUT_TYPE_SSML, voice=voice,
+                        use_cache=False)
+                    secs = time.perf_counter() - start
+                    key = 'synthesize/%s/%s' % (voice, name)
+                    times.setdefault(key, []).append(secs / syll_count)
+                    if name == 'dflt' and len(fnames) < len(corpus):
+                        fnames.append(fname)
+                    else:
+                        os.remove(fname)
+    return ({key: summarize(values, 'secs/syllable')
+             for key, values in times.items()}, fnames)
+
+
+def get_backends():
+    """returns dictionary of names to available feature extraction backends"""
+    backends = {'numpy': features.BACKEND_NUMPY}
+    if features.parselmouth:
+        backends['parselmouth'] = features.BACKEND_PARSELMOUTH
+    if shutil.which('praat'):
+        backends['praat'] = features.BACKEND_PRAAT
+    return backends
+
+
+def bench_extract(fnames, backends):
+    """measures extract_feature_values() on given files per backend
+
+    returns:
+        dictionary of result entries (seconds per file)
+    """
+    results = {}
+    for name, backend in backends.items():
+        times = []
+        for fname in fnames:
+            start = time.perf_counter()
+            remote_tts.extract_feature_values(fname, 1, 1, 1, 0, backend)
+            times.append(time.perf_counter() - start)
+        results['extract_feature_values/%s' % name] = summarize(times, 'secs')
+    return results
+
+
+def bench_adapt(fnames):
+    """measures adapt_wav() adapting the intensity of given files
+
+    returns:
+        dictionary of result entries (seconds per file)
+    """
+    times = []
+    for fname in fnames:
+        out_fname = remote_tts.get_unique_fname(remote_tts.TMP_DIR + '/adapt',
+                                                '.wav')
+        start = time.perf_counter()
+        remote_tts.adapt_wav(fname, out_fname, intensity=65)
+        times.append(time.perf_counter() - start)
+        os.remove(out_fname)
+    return {'adapt_wav': summarize(times, 'secs')}
+
+
+def bench_repeat_until_close(corpus, voice, speech_rate=5.0, pitch=110.0):
+    """measures synthesize_with_features() with repeat_until_close
+
+    returns:
+        dictionary of result entries: seconds per syllable and the number of
+        synthesis round trips
+    """
+    speech_rates_dict = remote_tts.load_speech_rates_dict()
+    times = []
+    iterations = []
+    for syll_count, text in corpus:
+        stats = {}
+        start = time.perf_counter()
+        fname = remote_tts.synthesize_with_features(
+            text, speech_rate, 65, '%.1fHz' % pitch,
+            speech_rates_dict=speech_rates_dict, voice=voice,
+            repeat_until_close=True, syll_count=syll_count, stats=stats)
+        times.append((time.perf_counter() - start) / syll_count)
+        iterations.append(stats['iterations'])
+        os.remove(fname)
+    return {'repeat_until_close': summarize(times, 'secs/syllable'),
+            'repeat_until_close/iterations': summarize(iterations,
+                                                       'iterations')}
+
+
+def bench_conversation(trans_fname='../misc/switchboard/part1.text',
+                       audio_in_fname='../misc/switchboard/human.wav'):
+    """measures a whole generate_conversation() run with the first config
+
+    if the human audio is not available, noise of the same length is used
+
+    returns:
+        dictionary with one result entry (seconds per run)
+    """
+    with open('../misc/switchboard/config.json', 'r') as json_file:
+        instance = json.load(json_file)[0][0]
+    if not os.path.isfile(audio_in_fname):
+        end = max(turn.end for turn in transcript.iter_turns(trans_fname)
+                  if isinstance(turn, transcript.HumanTurn))
+        audio_in_fname = remote_tts.get_unique_fname(
+            remote_tts.TMP_DIR + '/human', '.wav')
+        audio.write_wav(audio_in_fname, numpy.random.default_rng(0).normal(
+            0, 1000, audio.secs_to_samples(end + 1.0)))
+    source = audio.Source(audio_in_fname)
+    out_fname = remote_tts.get_unique_fname(
+        remote_tts.TMP_DIR + '/conversation', '.wav')
+    start = time.perf_counter()
+    switchboard.generate_conversation(
+        trans_fname, source, out_fname,
+        *switchboard.create_entrainers(instance))
+    secs = time.perf_counter() - start
+    os.remove(out_fname)
+    return {'generate_conversation': summarize([secs], 'secs')}
+
+
+def run(voices=None, lines=20, repeats=1, use_stub=True):
+    """runs all benchmarks
+
+    args:
+        voices: mary voices to synthesize with; all MARY_VOICES if None
+        lines: number of lines of the syllable count corpus to use
+        repeats: number of times each corpus line is synthesized per setting
+        use_stub: whether to run against a local stub server (see stub_tts)
+            instead of the configured mary servers
+
+    returns:
+        dictionary with 'meta' information about the run and 'results', which
+        maps benchmark names to entries with mean, standard deviation, number
+        of measurements and unit (or the reason why a benchmark was skipped)
+    """
+    voices = voices if voices else remote_tts.MARY_VOICES
+    corpus = remote_tts.load_syllable_count_corpus()[:lines]
+    praat = shutil.which('praat') is not None
+    backends = get_backends()
+
+    # isolate the run: own scratch directory, no cache, optionally stub
+    old_state = (remote_tts.TMP_DIR, remote_tts.SYNTHESIS_CACHE_DIR,
+                 remote_tts.FEATURE_BACKEND, remote_tts.MARY_ENDPOINTS)
+    remote_tts.TMP_DIR = tempfile.mkdtemp(prefix='benchmark_')
+    remote_tts.SYNTHESIS_CACHE_DIR = None
+    if not praat:
+        remote_tts.FEATURE_BACKEND = features.get_default_backend() \
+            if features.parselmouth else features.BACKEND_NUMPY
+    server = None
+    if use_stub:
+        server = stub_tts.start_server()
+        remote_tts.configure_mary(endpoints=[server.server_address])
+
+    results = {}
+    try:
+        synth_results, fnames = bench_synthesize(voices, corpus, repeats)
+        results.update(synth_results)
+        results.update(bench_extract(fnames, backends))
+        if praat:
+            results.update(bench_adapt(fnames))
+            results.update(bench_repeat_until_close(corpus, voices[0]))
+            results.update(bench_conversation())
+        else:
+            for name in ['adapt_wav', 'repeat_until_close',
+                         'generate_conversation']:
+                results[name] = {'skipped': 'praat not installed'}
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(remote_tts.TMP_DIR, ignore_errors=True)
+        remote_tts.TMP_DIR, remote_tts.SYNTHESIS_CACHE_DIR, \
+            remote_tts.FEATURE_BACKEND, endpoints = old_state
+        remote_tts.configure_mary(endpoints=endpoints)
+
+    meta = {'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'stub': use_stub,
+            'voices': voices,
+            'lines': len(corpus),
+            'repeats': repeats,
+            'backends': sorted(backends)}
+    return {'meta': meta, 'results': results}
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """compares benchmark results to a baseline run
+
+    args:
+        results: see run()
+        baseline: earlier results of run()
+        threshold: relative increase of a mean that counts as regression
+
+    returns:
+        list of (name, baseline mean, current mean, ratio, regressed) for all
+        benchmarks measured in both runs, sorted by name
+    """
+    comparison = []
+    for name, entry in sorted(results['results'].items()):
+        base_entry = baseline['results'].get(name)
+        if 'mean' not in entry or not base_entry or 'mean' not in base_entry:
+            continue
+        ratio = entry['mean'] / base_entry['mean'] \
+            if base_entry['mean'] else float('inf')
+        comparison.append((name, base_entry['mean'], entry['mean'], ratio,
+                           ratio > 1 + threshold))
+    return comparison
+
+
+def format_comparison(comparison):
+    """returns a table of a comparison, see compare()"""
+    lines = ['%-40s %12s %12s %7s' % ('benchmark', 'baseline', 'current',
+                                      'ratio')]
+    for name, base_mean, mean, ratio, regressed in comparison:
+        lines.append('%-40s %12.6f %12.6f %7.2f%s' % (
+            name, base_mean, mean, ratio, '  REGRESSION' if regressed else ''))
+    return '\n'.join(lines)
+
+
+def main(out_fname='../tmp/benchmark.json',
+         baseline_fname='../tmp/benchmark_baseline.json', save_baseline=False,
+         threshold=DEFAULT_THRESHOLD, **kwargs):
+    """runs the benchmarks, saves the results and compares to the baseline
+
+    args:
+        out_fname: json file the results are written to
+        baseline_fname: json file of the baseline results
+        save_baseline: whether to (also) save the results as new baseline
+        threshold: see compare()
+        kwargs: passed to run()
+
+    returns:
+        list of names of regressed benchmarks
+    """
+    results = run(**kwargs)
+    with open(out_fname, 'w') as out_file:
+        json.dump(results, out_file, indent=4, sort_keys=True)
+    regressions = []
+    if os.path.isfile(baseline_fname) and not save_baseline:
+        with open(baseline_fname, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+        comparison = compare(results, baseline, threshold)
+        print(format_comparison(comparison))
+        regressions = [entry[0] for entry in comparison if entry[4]]
+    else:
+        shutil.copyfile(out_fname, baseline_fname)
+        print('saved baseline to %s' % baseline_fname)
+    return regressions
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+import remote_tts
+import requests
+import asyncio
+import json
+import numpy
+import os
+from os import remove
+from os.path import isfile
+
+"""
+This module regenerates misc/speech_rates.json and
+misc/speech_rates_inverse.json (see misc/experiments/speech_rates) for any voice
+in remote_tts.MARY_VOICES or remote_tts.FESTIVAL_VOICES. Every (voice,
+modifier, corpus line) combination is an independent job; a fixed number of
+workers take jobs from a bounded queue and run them through the asynchronous
+api of remote_tts. Each result is appended to a checkpoint file right away, so
+an interrupted calibration resumes where it stopped.
+"""
+
+TTS_NAMES = {remote_tts.TTS_TYPE_MARY: 'mary',
+             remote_tts.TTS_TYPE_FESTIVAL: 'festival'}
+
+
+def parse_modifier(modifier):
+    """returns the percentage of a rate modifier like '+5%', '5%' or '-5'"""
+    return int(str(modifier).strip().rstrip('%'))
+
+
+def normalize_modifier(modifier):
+    """returns a rate modifier in the signed form used as key ('+5%')"""
+    return '%+d%%' % parse_modifier(modifier)
+
+
+def load_checkpoint(checkpoint_fname):
+    """loads the results of all jobs finished so far
+
+    args:
+        checkpoint_fname: name of the checkpoint file (json lines)
+
+    returns:
+        dictionary mapping (tts name, voice, modifier, line index) to the
+        measured speech rate (None if synthesis failed)
+    """
+    results = {}
+    if not isfile(checkpoint_fname):
+        return results
+    with open(checkpoint_fname, 'r') as checkpoint_file:
+        for line in checkpoint_file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # last line may be incomplete if the run was killed
+                continue
+            results[(record['tts'], record['voice'],
+                     normalize_modifier(record['modifier']),
+                     record['line'])] = record['rate']
+    return results
+
+
+async def measure_job(tts_type, voice, modifier, syll_count, text):
+    """synthesizes one corpus line with one modifier and returns its speech
+    rate in syllables per second (None if the tts returned an error)"""
+    if tts_type == remote_tts.TTS_TYPE_MARY:
+        in_str = remote_tts.get_ssml(text, modifier)
+        input_type = remote_tts.INPUT_TYPE_SSML
+    else:
+        in_str = remote_tts.get_sable(text, modifier)
+        input_type = remote_tts.INPUT_TYPE_SABLE
+    out_fname = remote_tts.get_unique_fname(
+        remote_tts.TMP_DIR + '/calibration', '.wav')
+    try:
+        await remote_tts.synthesize_async(in_str, False, input_type, out_fname,
+                                          tts_type, None, None, voice)
+        # 'main_duration' counts everything except silence at the end
+        feat_val_dict = await remote_tts.extract_feature_values_async(
+            out_fname, 0, 0, 1, 0)
+    except requests.exceptions.HTTPError:
+        return None
+    finally:
+        if isfile(out_fname):
+            remove(out_fname)
+    return syll_count / float(feat_val_dict['main_duration'])
+
+
+async def run_jobs_async(tts_type, voices, modifiers, checkpoint_fname,
+                         workers=None):
+    """runs all jobs not in the checkpoint yet, appending results to it
+
+    args:
+        workers: number of jobs run at a time; remote_tts.ASYNC_CONCURRENCY if
+            None given
+        (for other parameters see calibrate())
+
+    returns:
+        see load_checkpoint(), including the new results
+    """
+    tts_name = TTS_NAMES[tts_type]
+    corpus = remote_tts.load_syllable_count_corpus()
+    results = load_checkpoint(checkpoint_fname)
+    workers = workers if workers else remote_tts.ASYNC_CONCURRENCY
+    # bounded, so only a few jobs exist at a time instead of one coroutine per
+    # (voice, modifier, line) combination
+    queue = asyncio.Queue(maxsize=2 * workers)
+
+    with open(checkpoint_fname, 'a') as checkpoint_file:
+        async def produce():
+            for voice in voices:
+                for modifier in modifiers:
+                    for line_index in range(len(corpus)):
+                        if (tts_name, voice, modifier, line_index) \
+                                not in results:
+                            await queue.put((voice, modifier, line_index))
+            for _ in range(workers):
+                await queue.put(None)
+
+        async def work():
+            while True:
+                job = await queue.get()
+                if job is None:
+                    return
+                voice, modifier, line_index = job
+                syll_count, text = corpus[line_index]
+                rate = await measure_job(tts_type, voice, modifier,
+                                         syll_count, text)
+                results[(tts_name, voice, modifier, line_index)] = rate
+                # all jobs run in the same thread, so lines are never
+                # interleaved
+                checkpoint_file.write(json.dumps(
+                    {'tts': tts_name, 'voice': voice, 'modifier': modifier,
+                     'line': line_index, 'rate': rate}) + '\n')
+                checkpoint_file.flush()
+
+        await asyncio.gather(produce(), *[work() for _ in range(workers)])
+    return results
+
+
+def aggregate(results, tts_name, voices, modifiers):
+    """computes mean and standard deviation of the speech rate per modifier
+
+    returns:
+        dictionary like misc/speech_rates.json: [tts][voice][modifier] =
+        [mean, standard deviation]
+    """
+    grouped = {}
+    for (tts, voice, modifier, _), rate in results.items():
+        if tts == tts_name and rate is not None:
+            grouped.setdefault((voice, modifier), []).append(rate)
+    rates_dict = {tts_name: {}}
+    for voice in voices:
+        rates_dict[tts_name][voice] = {}
+        for modifier in modifiers:
+            rates = grouped.get((voice, modifier))
+            if rates:
+                rates_dict[tts_name][voice][modifier] = [
+                    float(numpy.mean(rates)), float(numpy.std(rates))]
+    return rates_dict
+
+
+def invert(rates_dict, min_rate=3.0, max_rate=8.0):
+    """computes the best modifier for every target rate (in steps of 0.1)
+
+    the measured rates are made monotonic in the modifier, then the modifier
+    for each target rate is linearly interpolated and the closest measured
+    modifier is chosen
+
+    args:
+        rates_dict: see aggregate(); modifiers may be given without sign
+            (e.g. '5%' for '+5%')
+
+    returns:
+        dictionary like misc/speech_rates_inverse.json: [tts][voice][rate] =
+        modifier
+    """
+    inverse_dict = {}
+    for tts_name, voices in rates_dict.items():
+        inverse_dict[tts_name] = {}
+        for voice, modifiers in voices.items():
+            if not modifiers:
+                continue
+            means_by_pct = {parse_modifier(modifier): value[0]
+                            for modifier, value in modifiers.items()}
+            pcts = sorted(means_by_pct)
+            means = numpy.maximum.accumulate(
+                [means_by_pct[pct] for pct in pcts])
+            inverse_dict[tts_name][voice] = {}
+            for target in numpy.arange(min_rate, max_rate + 0.05, 0.1):
+                pct = numpy.interp(target, means, pcts)
+                closest = min(pcts, key=lambda p: abs(p - pct))
+                inverse_dict[tts_name][voice]['%.1f' % target] = \
+                    '%+d%%' % closest
+    return inverse_dict
+
+
+def update_json(fname, new_dict):
+    """replaces the voices in new_dict in given json file (keeps others and
+    the order of the keys already in the file)"""
+    old_dict = {}
+    if isfile(fname):
+        with open(fname, 'r') as json_file:
+            old_dict = json.load(json_file)
+    for tts_name, voices in new_dict.items():
+        old_dict.setdefault(tts_name, {}).update(voices)
+    tmp_fname = fname + '.tmp'
+    with open(tmp_fname, 'w') as json_file:
+        json.dump(old_dict, json_file, indent=4)
+    os.replace(tmp_fname, fname)
+
+
+def calibrate(tts_type, voices, modifiers=None,
+              checkpoint_fname='../tmp/speech_rates_checkpoint.jsonl',
+              rates_fname='../misc/speech_rates.json',
+              inverse_fname='../misc/speech_rates_inverse.json',
+              concurrency=None):
+    """measures speech rates and regenerates the speech rate json files
+
+    args:
+        tts_type: one of the remote_tts.TTS_TYPE_* constants
+        voices: voices of that tts to calibrate
+        modifiers: rate modifiers to measure (with or without sign, e.g. '+5%'
+            or '5%'); -75% to +100% if none given
+        checkpoint_fname: file recording every finished job; reused to resume
+        rates_fname: json file of speech rates per modifier to update
+        inverse_fname: json file of modifiers per speech rate to update
+        concurrency: number of jobs run at a time (each sends one request
+            at a time); remote_tts.ASYNC_CONCURRENCY if None given, which
+            also bounds the requests of all jobs together
+
+    returns:
+        the inverse dictionary for the given voices; see invert()
+    """
+    modifiers = [normalize_modifier(modifier) for modifier in modifiers] \
+        if modifiers else ['%+d%%' % pct for pct in range(-75, 101)]
+    results = remote_tts.run_coroutine(run_jobs_async(
+        tts_type, voices, modifiers, checkpoint_fname, concurrency))
+    rates_dict = aggregate(results, TTS_NAMES[tts_type], voices, modifiers)
+    inverse_dict = invert(rates_dict)
+    update_json(rates_fname, rates_dict)
+    update_json(inverse_fname, inverse_dict)
+    return inverse_dict
+
+
+def main():
+    """recalibrates all mary voices"""
+    calibrate(remote_tts.TTS_TYPE_MARY, remote_tts.MARY_VOICES)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,244 +3,255 @@ import random
 import pyaudio
 import wave
 import sys
-from os import remove
 import remote_tts
+import audio
+import features
+import results
+import json
 import time
+import numpy
 from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
 import select
 
 
-def generate_response(in_str):
+# rules of generate_response(); see ResponseRules for the format
+RULES_FNAME = '../misc/eliza_rules.json'
+WORD_PATTERN = re.compile(r"\w+")
+
+# rules loaded from RULES_FNAME on first use; see get_rules()
+_rules = None
+
+
+class ResponseRules(object):
+    """rules of generate_response(), loaded from a json file and compiled once
+
+    keyword rules are indexed by their keywords: a rule is only matched
+    against an input that contains one of its keywords, so responding takes a
+    few dictionary lookups per word of the input rather than one match per
+    rule; among candidates, rules keep the priority of their order in the file
+
+    the json file contains a dictionary with the keys of the attributes below
+    ('substitutions' as a list of [phrase, replacement] pairs, 'rules' as a
+    list of dictionaries with 'keywords', 'pattern' and 'responses')
+
+    attributes:
+        empty_responses: responses to empty inputs
+        question_words: words that make an input a question if it starts with
+            one of them
+        question_responses: responses to questions
+        standard_responses: responses given regardless of the input
+        standard_response_odds: a standard response is given to one in this
+            many inputs (randomly)
+        substitutions: list of (phrase, replacement) tuples for swapping
+            pronouns in order of priority, see substitute()
+        rules: list of (compiled pattern, responses) tuples in order of
+            priority; a pattern must match from the start of the input and
+            responses may refer to its groups
+        index: dictionary mapping words to ascending indices into rules; a
+            rule is listed under the first word of each of its keywords, of
+            which an input must contain at least one for its pattern to match
+    """
+
+    def __init__(self, fname=RULES_FNAME):
+        """constructor; loads and compiles the rules in given json file
+
+        raises:
+            ValueError: a keyword does not start with a word character
+        """
+        with open(fname, 'r') as rules_file:
+            data = json.load(rules_file)
+        self.empty_responses = data['empty_responses']
+        self.question_words = data['question_words']
+        self.question_responses = data['question_responses']
+        self.standard_responses = data['standard_responses']
+        self.standard_response_odds = data['standard_response_odds']
+        self.substitutions = [(phrase, replacement)
+                              for phrase, replacement in data['substitutions']]
+        self.rules = []
+        self.index = {}
+        for i, rule in enumerate(data['rules']):
+            self.rules.append((re.compile(rule['pattern']), rule['responses']))
+            for keyword in rule['keywords']:
+                word = WORD_PATTERN.match(keyword)
+                if not word:
+                    raise ValueError('keyword must start with a word '
+                                     'character: %s' % keyword)
+                indices = self.index.setdefault(word.group(0), [])
+                if not indices or indices[-1] != i:
+                    indices.append(i)
+
+        self._question_prefixes = tuple(
+            word + ' ' for word in self.question_words)
+        # one pattern for all phrases; alternatives are tried in order, so an
+        # earlier phrase takes precedence at the same position
+        self._replacements = dict(self.substitutions)
+        self._substitution_pattern = re.compile(r'\b(?:%s)\b' % '|'.join(
+            re.escape(phrase) for phrase, _ in self.substitutions)) \
+            if self.substitutions else None
+
+    def is_question(self, in_str):
+        """returns whether given input starts with a question word"""
+        return in_str.startswith(self._question_prefixes)
+
+    def substitute(self, in_str):
+        """returns input with all phrases of substitutions replaced
+
+        all phrases are replaced in a single pass over the input, replacements
+        are not substituted again
+        """
+        if not self._substitution_pattern:
+            return in_str
+        return self._substitution_pattern.sub(
+            lambda match: self._replacements[match.group(0)], in_str)
+
+    def match(self, in_str):
+        """returns tuple of the match object and responses of the first rule
+        whose pattern matches given input; None if there is none"""
+        candidates = set()
+        for word in set(WORD_PATTERN.findall(in_str)):
+            candidates.update(self.index.get(word, ()))
+        for i in sorted(candidates):
+            pattern, responses = self.rules[i]
+            match = pattern.match(in_str)
+            if match:
+                return match, responses
+        return None
+
+
+def get_rules():
+    """returns the rules from RULES_FNAME, loading them on first use"""
+    global _rules
+    if not _rules:
+        _rules = ResponseRules(RULES_FNAME)
+    return _rules
+
+
+def generate_response(in_str, rules=None):
     """returns a standard phrase or keyword response to a user utterance
 
     args:
         in_str: user input after pronoun substitution
+        rules: ResponseRules to respond with; see get_rules() if None
 
     returns: system response string based on keywords in user input or unchanged
         input (except for pronouns) if no keyword is found
     """
+    rules = rules if rules else get_rules()
     if not in_str:
         # give a standard response to empty inputs
-        empty_responses = [
-            r"i can only help you if you speak to me.",
-            r"sorry, i could not hear you. could you repeat that?",
-            r"please speak to me so i can help you"
-        ]
-        choice = random.randint(0, len(empty_responses) - 1)
-        out_str = empty_responses[choice]
-    elif(in_str.find("how ") == 0 or in_str.find("what ") == 0 or
-         in_str.find("where ") == 0 or in_str.find("when ") == 0 or
-         in_str.find("why ") == 0 or in_str.find("who ") == 0 or
-         in_str.find("which ") == 0 or in_str.find("whose ") == 0):
+        choice = random.randint(0, len(rules.empty_responses) - 1)
+        out_str = rules.empty_responses[choice]
+    elif rules.is_question(in_str):
         # give a standard response to inputs that start with a question word
-        question_responses = [
-            r"i do not want to answer questions. let us talk about you.",
-            r"please do not ask questions. i am more interested in you.",
-            r"sorry, i cannot answer any questions. let us talk about you."
-        ]
-        choice = random.randint(0, len(question_responses) - 1)
-        out_str = question_responses[choice]
-    elif random.randint(1, 5) == 1:
+        choice = random.randint(0, len(rules.question_responses) - 1)
+        out_str = rules.question_responses[choice]
+    elif random.randint(1, rules.standard_response_odds) == 1:
         # sometimes give a standard response without even considering the input
-        standard_responses = [
-            r"i see. can you tell me more?",
-            r"please tell me more.",
-            r"please go on.",
-            r"can you elaborate on that?",
-            r"please continue"
-        ]
-        choice = random.randint(0, len(standard_responses) - 1)
-        out_str = standard_responses[choice]
+        choice = random.randint(0, len(rules.standard_responses) - 1)
+        out_str = rules.standard_responses[choice]
     else:
         # otherwise, fully process the input; first make everything upper case
-        out_str = in_str.upper()
-        # replace occurrences of "I", "YOU" etc. with "you", "i" etc.
-        substitutions = [
-            (r"\b(I'M|I AM)\b", "you are"),
-            (r"[A-Z]\b(AM)\b", " are"),
-            (r"\b(I'VE)\b", "you have"),
-            (r"\b(I WAS)\b", "you were"),
-            (r"\b(I|ME)\b", "you"),
-            (r"\b(MY)\b", "your"),
-            (r"\b(MYSELF)\b", "yourself"),
-            (r"\b(MINE)\b", "yours"),
-            (r"\b(YOU'RE|YOU ARE)\b", "i am"),
-            (r"\b(YOU'VE)\b", "i have"),
-            (r"\b(YOU WERE)\b", "i was"),
-            # this does not work well for "YOU" to "me"
-            (r"\b(YOU)\b", "i"),
-            (r"\b(YOUR)\b", "my"),
-            (r"\b(YOURSELF)\b", "myself"),
-            (r"\b(YOURS)\b", "mine")
-        ]
-        for regex, subst_str in substitutions:
-            out_str = re.sub(regex, subst_str, out_str)
+        # and replace occurrences of "I", "YOU" etc. with "you", "i" etc.
+        out_str = rules.substitute(in_str.upper())
 
         # lastly, look for keywords and respond appropriately
-        responses = [
-            (
-                r".*\b(ALWAYS|ALL|(EVERY TIME)|(EACH TIME)|EVERYONE|"
-                r"(EVERY PERSON)|EVERYBODY|EVERYWHERE)\b.*",
-                [
-                    r"can you think of an example?",
-                    r"really \1?"
-                ]
-            ),
-            (
-                r".*\b(NOONE|NOBODY|NEVER|(NOT EVER)|(NOT ONCE)|NOWHERE)\b.*",
-                [
-                    r"really \1? i am sure you can think of a counterexample",
-                    r"really \1? why do you think that is?"
-                ]
-            ),
-            (
-                r".*\byou (LOVE|ADORE|LIKE|MISS|HATE|LOATHE|DETEST|DESPISE|" +
-                r"DISLIKE) (.+)",
-                [
-                    r"tell me what you \1 about \2",
-                    r"what else do you \1?"
-                ]
-            ),
-            (
-                r".*\bare NOT (.+)",
-                [
-                    r"why are you not \1?"
-                ]
-            ),
-            (
-                r".*\byou (CAN'T|CANNOT) (.+)",
-                [
-                    r"why can you not \2?",
-                    r"would you like to be able to \2?"
-                ]
-            ),
-            (
-                r".*\bare (SAD|TIRED|EXHAUSTED|UNHAPPY|DEPRESSED|MISERABLE|" +
-                r"HEARTBROKEN|SICK|ILL|HURT|INJURED|NAUSEOUS)\b.*",
-                [
-                    r"i am sorry to hear you are \1. "
-                    r"is that why you want to talk?",
-                    r"what made you \1?",
-                    r"are you often \1?",
-                    r"have you been \1 for long?"
-                ]
-            ),
-            (
-                r".*\bare (HAPPY|CHEERFUL|JOYFUL|JOYOUS|CONTENT|DELIGHTED)" +
-                r"\b.*",
-                [
-                    r"i am happy to hear you are \1",
-                    r"what made you \1?",
-                    r"are you often \1?",
-                    r"how long have you been \1?"
-                ]
-            ),
-            (
-                r".*\byou (DON'T|(DO NOT)) (.+)",
-                [
-                    r"why do you not \3?"
-                ]
-            ),
-            (
-                r".*\bi (am|DO|DON'T|CAN'T|CANNOT) (.+)",
-                [
-                    r"why do you think i \1 \2?",
-                    r"what makes you say i \1 \2?"
-                ]
-            ),
-            (
-                r".*\b(FAMILY|FRIENDS?|RELATIVES?|PARENTS?|FATHER|DAD|MOTHER|"
-                r"MOM)\b.*",
-                [
-                    r"do you like spending time with your \1?",
-                    r"do you spend a lot of time with your \1?",
-                    r"what do you like to do when you spend time with your \1?",
-                    r"does it make you sad if you cannot see your \1 for a "
-                    r"while?"
-                ]
-            ),
-            (
-                r".*\byour (BOYFRIEND|GIRLFRIEND|FIANCEE?|WIFE|HUSBAND|" +
-                r"SPOUSE|PARTNER|KIDS?|CHILD(REN)?|SONS?|DAUGHTERS?)\b.*",
-                [
-                    r"how does being with your \1 make you feel?",
-                    r"how does not being with your \1 make you feel?",
-                    r"do you love your \1?"
-                ]
-            )
-        ]
-
-        # start with the input string and loop over all patterns and responses
-        for pat, res in responses:
-            if re.match(pat, out_str):
-                # pattern match was found; randomly choose a response, then stop
-                choice = random.randint(0, len(res) - 1)
-                out_str = re.sub(pat, res[choice], out_str)
-                break
+        result = rules.match(out_str)
+        if result:
+            # pattern match was found; randomly choose a response
+            match, responses = result
+            choice = random.randint(0, len(responses) - 1)
+            out_str = match.expand(responses[choice])
         # note: if no keyword is found out_str will be mostly the same as in_str
 
     return out_str
 
 
-def record_audio(out_fname):
-    """records audio until timeout occurs or enter is hit by the user
+def record_audio(out_fname=None, trailing_silence_secs=0.7,
+                 record_timeout_secs=10):
+    """records audio until the user stops speaking, hits enter or timeout occurs
+
+    the end of speaking is detected while recording (see audio.Endpointer);
+    silence before and after the speech is trimmed off the recording
 
     args:
-        out_fname: file name for the wav file of the recording
+        out_fname: optional file name for a wav file of the recording
+        trailing_silence_secs: seconds of silence after speech that stop the
+            recording
+        record_timeout_secs: maximum length of the recording in seconds
+
+    returns:
+        tuple of an audio.AudioBuffer with the recording, the
+        time.perf_counter() value of the end of the user's speech (or of the
+        recording if no end was detected) and the beginning and end in seconds
+        of the speech in the untrimmed recording (None if no speech was
+        detected, the recording is not trimmed then)
     """
 
     # allowing termination of the recording both by user input and by timeout
     # faces the problem that waiting for user input normally blocks the process;
     # here, this was solved by running the recording in a separate thread that
-    # communicates with the main process through a shared variable
+    # communicates with the main process through shared variables
     recording_stopped = False
-    record_timeout_secs = 10
+    stop_time = None
+    rate = 16000
+    frames = []
+    endpointer = audio.Endpointer(rate, trailing_silence_secs)
 
-    def thread_rec(wav_fname):
-        wav_format = pyaudio.paInt16
-        channels = 1
-        rate = 16000
+    def thread_rec():
         chunk = 1024
-        nonlocal recording_stopped, record_timeout_secs
+        nonlocal recording_stopped, stop_time
 
-        audio = pyaudio.PyAudio()
-        stream = audio.open(format=wav_format, channels=channels, rate=rate,
-                            input=True, frames_per_buffer=chunk)
-        print('recording (hit enter to stop)...')
-        frames = []
+        p = pyaudio.PyAudio()
+        stream = p.open(format=pyaudio.paInt16, channels=1, rate=rate,
+                        input=True, frames_per_buffer=chunk)
+        print('recording (pause or hit enter to stop)...')
         for x in range(0, int(rate / chunk * record_timeout_secs)):
             if recording_stopped:
                 break
             else:
                 data = stream.read(chunk)
                 frames.append(data)
+                if endpointer.process(numpy.frombuffer(data, dtype='<i2')):
+                    # the speech ended before the silence just recorded
+                    stop_time = time.perf_counter() - (
+                        len(frames) * chunk - endpointer.speech_end) / rate
+                    break
         print('finished recording')
 
         stream.stop_stream()
         stream.close()
-        audio.terminate()
-
-        wav_file = wave.open(wav_fname, 'wb')
-        wav_file.setnchannels(channels)
-        wav_file.setsampwidth(audio.get_sample_size(wav_format))
-        wav_file.setframerate(rate)
-        wav_file.writeframes(b''.join(frames))
-        wav_file.close()
+        p.terminate()
 
-    thread = Thread(target=thread_rec, args=(out_fname,))
+    thread = Thread(target=thread_rec)
     thread.start()
 
-    # noinspection PyUnusedLocal
-    # read 'enter' this way to facilitate timeout
-    i, o, e = select.select([sys.stdin], [], [], record_timeout_secs)
-    if i:
-        # need to flush input, otherwise it triggers the next recording
-        sys.stdin.readline()
+    # read 'enter' this way to facilitate stopping by the recording thread
+    while thread.is_alive():
+        # noinspection PyUnusedLocal
+        i, o, e = select.select([sys.stdin], [], [], 0.05)
+        if i:
+            # need to flush input, otherwise it triggers the next recording
+            sys.stdin.readline()
+            break
     # communicate to recording thread that the user stopped the recording
     recording_stopped = True
-    # wait for the recording thread to finish writing the wav file
+    if stop_time is None:
+        stop_time = time.perf_counter()
+    # wait for the recording thread to finish reading from the sound card
     thread.join()
 
+    samples = numpy.frombuffer(b''.join(frames), dtype='<i2')
+    segment = endpointer.get_segment()
+    if segment:
+        samples = samples[segment[0]:segment[1]]
+        segment = (endpointer.speech_start / float(rate),
+                   endpointer.speech_end / float(rate))
+    buffer = audio.AudioBuffer(samples, rate)
+    if out_fname:
+        buffer.write_wav(out_fname)
+    return buffer, stop_time, segment
+
 
 def play_audio(in_fname):
     """plays audio from a given file
@@ -268,8 +279,195 @@ def play_audio(in_fname):
     p.terminate()
 
 
-def main():
+def play_stream(chunks, gain=1.0, stats=None):
+    """plays a wav file while it is still arriving in chunks
+
+    args:
+        chunks: iterable of bytes of a 16-bit pcm wav file, e.g. from
+            remote_tts.synthesize_stream()
+        gain: factor by which all samples are scaled (clipped to 16 bits)
+        stats: optional dictionary; 'first_chunk' and 'playback_start' are set
+            to the time.perf_counter() values at which the first bytes arrived
+            and the first samples were passed to the sound card
+
+    returns:
+        tuple of a numpy int16 array with the received (first channel's)
+        samples, before scaling, and their sample rate
+    """
+    p = pyaudio.PyAudio()
+    stream = None
+    data = b''
+    header = None
+    received = []
+    try:
+        for chunk in chunks:
+            if stats is not None and 'first_chunk' not in stats:
+                stats['first_chunk'] = time.perf_counter()
+            data += chunk
+            if header is None:
+                header = audio.parse_wav_header(data)
+                if header is None:
+                    continue
+                data = data[header[2]:]
+                stream = p.open(format=pyaudio.paInt16, channels=header[0],
+                                rate=header[1], output=True)
+            # only whole frames can be played, keep the rest for later
+            frame_bytes = len(data) - len(data) % (2 * header[0])
+            if not frame_bytes:
+                continue
+            samples = numpy.frombuffer(data[:frame_bytes], dtype='<i2')
+            data = data[frame_bytes:]
+            received.append(samples)
+            if gain != 1.0:
+                samples = audio.to_int16(samples * gain)
+            if stats is not None and 'playback_start' not in stats:
+                stats['playback_start'] = time.perf_counter()
+            stream.write(samples.astype('<i2').tobytes())
+        if header is None:
+            raise ValueError('stream ended before the first sample')
+        if stream.is_active():
+            # wait a little at the end, otherwise stop_stream() can cut off
+            # audio
+            time.sleep(0.2)
+    finally:
+        if stream:
+            stream.stop_stream()
+            stream.close()
+        p.terminate()
+
+    samples = numpy.concatenate(received) if received \
+        else numpy.zeros(0, dtype=numpy.int16)
+    return samples[::header[0]], header[1]
+
+
+class IntensityCalibration(object):
+    """estimates the gain that brings synthesized speech to a target intensity
+
+    streamed audio is played before it is complete, so it cannot be adapted by
+    praat like in remote_tts.synthesize_with_features(); instead, it is scaled
+    by a gain computed from the intensity that unscaled synthesized speech had
+    in earlier turns (scaling by a factor changes the mean intensity by 20 *
+    log10(factor) decibel)
+
+    attributes:
+        intensity: mean intensity of unscaled synthesized speech in decibel,
+            averaged over all measurements; None before the first one
+        count: number of measurements
+    """
+
+    def __init__(self):
+        """constructor"""
+        self.intensity = None
+        self.count = 0
+
+    def get_gain(self, intensity):
+        """returns the gain for given target intensity in decibel; 1.0 if the
+        target is not a number or nothing was measured yet"""
+        if self.intensity is None or numpy.isnan(intensity):
+            return 1.0
+        return 10 ** ((intensity - self.intensity) / 20.0)
+
+    def update(self, samples, rate):
+        """measures the intensity of given unscaled samples and adds it to the
+        mean; silent samples are ignored"""
+        intensity = float(features.extract_samples(
+            samples, rate, 1, 0, 0, 0)['intensity_mean'])
+        if numpy.isnan(intensity) or numpy.isinf(intensity):
+            return
+        self.count += 1
+        if self.intensity is None:
+            self.intensity = intensity
+        else:
+            self.intensity += (intensity - self.intensity) / self.count
+
+
+def respond(buffer, stop_time, executor, calibration, rates_dict,
+            voice=None):
+    """transcribes a recorded user turn, then synthesizes and plays a response
+
+    the user audio is measured while it is transcribed and the response is
+    played while it is still being synthesized (see play_stream()), which
+    minimizes the time between the end of the user's speech and the start of
+    the system's; as in remote_tts.synthesize_alike(), the response matches the
+    speech rate, intensity and pitch of the user turn
+
+    args:
+        buffer: audio.AudioBuffer with the user turn
+        stop_time: time.perf_counter() value of the end of the user's speech
+        executor: thread pool to measure the user audio in
+        calibration: IntensityCalibration for the voice, updated here
+        rates_dict: see remote_tts.get_rate_modifier()
+        voice: mary voice to respond with; default voice if None
+
+    returns:
+        dictionary with the transcript ('in_str'), the response ('out_str')
+        and the seconds spent per stage; see format_latency()
+    """
+    feat_future = executor.submit(remote_tts.extract_feature_values,
+                                  buffer, 1, 1, 1, 0)
+    turn = {}
+
+    start = time.perf_counter()
+    turn['in_str'] = remote_tts.transcribe_buffer(buffer)
+    print('you: %s' % turn['in_str'])
+    turn['transcribe_secs'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    turn['out_str'] = generate_response(turn['in_str']).lower()
+    print('me: %s' % turn['out_str'])
+    syll_count = remote_tts.count_syllables_text(turn['out_str'])
+    turn['respond_secs'] = time.perf_counter() - start
+
+    # only the part of the measurement that took longer than the above counts
+    start = time.perf_counter()
+    feat_val_dict = feat_future.result()
+    turn['features_secs'] = time.perf_counter() - start
+
+    speech_duration = float(feat_val_dict['speech_duration'])
+    rate_modifier = remote_tts.get_rate_modifier(
+        rates_dict, syll_count / speech_duration) if speech_duration > 0 \
+        else 'default'
+    try:
+        pitch = float(feat_val_dict['pitch_mean'])
+    except ValueError:
+        # praat reports '--undefined--' if there is no voiced audio
+        pitch = float('nan')
+    pitch = '%.1fHz' % pitch if numpy.isfinite(pitch) else 'default'
+    try:
+        intensity = float(feat_val_dict['intensity_mean'])
+    except ValueError:
+        intensity = float('nan')
+
+    stats = {}
+    start = time.perf_counter()
+    samples, rate = play_stream(
+        remote_tts.synthesize_stream(
+            remote_tts.get_ssml(turn['out_str'], rate_modifier, pitch),
+            remote_tts.INPUT_TYPE_SSML, voice=voice),
+        calibration.get_gain(intensity), stats)
+    turn['tts_secs'] = stats['first_chunk'] - start
+    turn['playback_secs'] = stats['playback_start'] - stats['first_chunk']
+    turn['latency_secs'] = stats['playback_start'] - stop_time
+    calibration.update(samples, rate)
+    return turn
+
+
+def format_latency(turn):
+    """returns a line summarizing the latency of a turn, see respond()"""
+    return ('latency: %.2fs (transcription %.2f, response %.2f, features '
+            '+%.2f, synthesis %.2f, playback %.2f)' % (
+                turn['latency_secs'], turn['transcribe_secs'],
+                turn['respond_secs'], turn['features_secs'],
+                turn['tts_secs'], turn['playback_secs']))
+
+
+def main(latency_fname=None, voice=None):
     """main function called if the module is run directly and not just imported
+
+    args:
+        latency_fname: optional JSON Lines file (see results) to which the
+            latency breakdown of every turn is appended
+        voice: mary voice to speak with; default voice if None
     """
     print('this is an interactive dialog system using speech input and output.'
           '\nit is based on the eliza system, which means its '
@@ -280,36 +478,43 @@ def main():
           'ignore them.\nhit enter now to start.')
     sys.stdin.read(1)
 
-    tmp_fname = remote_tts.get_unique_fname('../tmp/%s_eliza_in', '.wav')
     in_str = 'hello, i am a psychotherapist. please tell me about your ' \
              'problems.'
-
-    remote_tts.synthesize(in_str, out_fname=tmp_fname)
+    # load everything needed for a turn before the first one
+    get_rules()
+    remote_tts.start_asr()
+    remote_tts.get_feature_backend()
+    rates_dict = remote_tts.load_speech_rates_dict()['mary'][
+        voice if voice else remote_tts.DEFAULT_VOICE_MARY]
+    calibration = IntensityCalibration()
+    writer = results.ResultsWriter(latency_fname) if latency_fname else None
 
     print('me: %s' % in_str)
-    play_audio(tmp_fname)
-    remove(tmp_fname)
-
-    # loop indefinitely, only stop if the user requests it
-    while True:
-        in_fname = remote_tts.get_unique_fname('../tmp/%s_eliza_in', '.wav')
-        out_fname = remote_tts.get_unique_fname('../tmp/%s_eliza_out', '.wav')
-
-        print('please hit enter and say your response or type "stop" to stop')
-        written_input = input()
-        if written_input == 'stop':
-            break
+    # the greeting is not scaled, so it serves as first calibration
+    calibration.update(*play_stream(remote_tts.synthesize_stream(
+        in_str, voice=voice)))
+
+    with ThreadPoolExecutor(1) as executor:
+        # loop indefinitely, only stop if the user requests it
+        turn_index = 0
+        while True:
+            print('please hit enter and say your response or type "stop" to '
+                  'stop')
+            written_input = input()
+            if written_input == 'stop':
+                break
 
-        record_audio(in_fname)
-        in_str = remote_tts.transcribe_wav(in_fname)
-        print('you: %s' % in_str)
+            buffer, stop_time, _ = record_audio()
+            turn = respond(buffer, stop_time, executor, calibration,
+                           rates_dict, voice)
+            print(format_latency(turn))
+            if writer:
+                record = {key: value for key, value in turn.items()
+                          if key.endswith('_secs')}
+                record['turn'] = turn_index
+                writer.append([record])
+            turn_index += 1
 
-        out_str = generate_response(in_str).lower()
-        print('me: %s' % out_str)
-        remote_tts.synthesize_alike(out_str, in_fname, out_fname=out_fname)
-        play_audio(out_fname)
-        remove(in_fname)
-        remove(out_fname)
 
 if __name__ == "__main__":
     main()
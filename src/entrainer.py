@@ -1,6 +1,19 @@
+import array
+import math
+import sys
+import numpy
+
+# whether the builtin sum() uses compensated summation for floats
+COMPENSATED_SUM = sys.version_info >= (3, 12)
+
+
 class Entrainer(object):
     """    note: currently assumes user goes first and values are means
 
+    all operations take constant time: instead of summing the turn history for
+    every proposal, running sums over finished turns are kept (results are
+    identical to summing the history, see RunningSum)
+
     attributes:
         default_val: default output value without any entrainment
         glo_weight: global entrainment weight
@@ -8,13 +21,26 @@ class Entrainer(object):
         glo_conv: global convergence summand (added to glo_weight each turn)
         loc_conv: local convergence summand (added to loc_weight each turn)
         first_k: number of user turns k to use for average calculation
+        user_count: number of user turns so far
+        system_count: number of system turns so far
+        user_history: TurnHistory of (up to max_history) user turns
+        system_history: TurnHistory of (up to max_history) system turns
     """
+    __slots__ = ('def_val', 'glo_weight', 'loc_weight', 'glo_weight_tmp',
+                 'loc_weight_tmp', 'glo_conv', 'loc_conv', 'first_k',
+                 'def_weight', 'user_count', 'system_count', 'user_history',
+                 'system_history', '_k_sum', '_out_sum', '_user_last',
+                 '_system_last')
 
     def __init__(self, def_val, init_glo_weight, init_loc_weight,
-                 glo_conv, loc_conv, first_k):
+                 glo_conv, loc_conv, first_k, max_history=None):
         """constructor; initializes instance; args, see class
 
         applies some basic sanity checks to the input
+
+        args:
+            max_history: number of most recent turns to retain per speaker
+                (None: all); only affects user_turns and system_turns
         """
         self.def_val = def_val
         self.glo_weight = max(init_glo_weight, 0)
@@ -31,8 +57,17 @@ class Entrainer(object):
         self.first_k = max(first_k, 1)
         self.def_weight = 1 - self.glo_weight - self.loc_weight
         # track the values of user and system turns
-        self.user_turns = []
-        self.system_turns = []
+        self.user_count = 0
+        self.system_count = 0
+        self.user_history = TurnHistory(max_history)
+        self.system_history = TurnHistory(max_history)
+        # sum of finished user turns among the first k and of finished system
+        # turns; the last turn of each is kept separately since it can still
+        # change (see register_input)
+        self._k_sum = RunningSum()
+        self._out_sum = RunningSum()
+        self._user_last = None
+        self._system_last = None
 
     def __str__(self):
         """returns string representation of the current configuration"""
@@ -40,6 +75,16 @@ class Entrainer(object):
                 str(self.loc_weight) + ' ' + str(self.glo_conv) + ' ' +
                 str(self.loc_conv) + ' ' + str(self.first_k))
 
+    @property
+    def user_turns(self):
+        """list of retained user turns as [value, length] pairs"""
+        return self.user_history.to_list()
+
+    @property
+    def system_turns(self):
+        """list of retained system turns as [value, length] pairs"""
+        return self.system_history.to_list()
+
     def register_input(self, val, len_s):
         """stores latest user input value
 
@@ -51,41 +96,58 @@ class Entrainer(object):
             val: input value
             len_s: length of the input in seconds
         """
-        if len(self.user_turns) == len(self.system_turns):
-            self.user_turns.append([val, len_s])
+        if self.user_count == self.system_count:
+            if self.user_count and self.user_count - 1 < self.first_k:
+                # previous turn is finished and among the first k
+                self._k_sum.add(self._user_last[0])
+            self._user_last = [val, len_s]
+            self.user_count += 1
+            self.user_history.append(val, len_s)
         else:
-            last = self.user_turns.pop()
+            last = self._user_last
             average_val = (last[0] * last[1] + val * len_s) / (last[1] + len_s)
-            self.user_turns.append([average_val, last[1] + len_s])
+            self._user_last = [average_val, last[1] + len_s]
+            self.user_history.set_last(average_val, last[1] + len_s)
 
     def register_output(self, val, len_s):
         """analogous to register_input, with input/output reversed
 
         tracks actual output value (proposed value might not have been realized)
         """
-        if len(self.system_turns) < len(self.user_turns):
-            self.system_turns.append([val, len_s])
+        if self.system_count < self.user_count:
+            if self.system_count:
+                self._out_sum.add(self._system_last[0])
+            self._system_last = [val, len_s]
+            self.system_count += 1
+            self.system_history.append(val, len_s)
         else:
-            last = self.system_turns.pop()
+            last = self._system_last
             average_val = (last[0] * last[1] + val * len_s) / (last[1] + len_s)
-            self.system_turns.append([average_val, last[1] + len_s])
+            self._system_last = [average_val, last[1] + len_s]
+            self.system_history.set_last(average_val, last[1] + len_s)
 
     def propose_output(self):
 
-        if len(self.system_turns) < len(self.user_turns):
+        if self.system_count < self.user_count:
             # global component
             # 1) average of up to first_k user turns
-            k = min(len(self.user_turns), self.first_k)
-            k_average = sum(val[0] for val in self.user_turns[0:k]) / k
+            k = min(self.user_count, self.first_k)
+            if self.user_count <= self.first_k:
+                k_average = self._k_sum.get_value(self._user_last[0]) / k
+            else:
+                k_average = self._k_sum.get_value() / k
             # 2) sum of outputs so far
-            out_sum = sum(val[0] for val in self.system_turns)
+            if self.system_count:
+                out_sum = self._out_sum.get_value(self._system_last[0])
+            else:
+                out_sum = self._out_sum.get_value()
             # 3) necessary value to match average
-            glo = len(self.user_turns) * k_average - out_sum
+            glo = self.user_count * k_average - out_sum
             # 4) weighted by global entrainment weight
             glo *= self.glo_weight
 
             # local component
-            loc = self.loc_weight * self.user_turns[-1][0]
+            loc = self.loc_weight * self._user_last[0]
 
             proposed_val = self.def_weight * self.def_val + glo + loc
 
@@ -102,9 +164,267 @@ class Entrainer(object):
                 self.loc_weight = self.loc_weight_tmp
             self.def_weight = 1 - self.glo_weight - self.loc_weight
         else:
-            proposed_val = self.system_turns[-1][0]
+            proposed_val = self._system_last[0]
         return proposed_val
 
+
+class RunningSum(object):
+    """incremental equivalent of the builtin sum() over a growing sequence
+
+    from python 3.12 on, sum() adds floats with neumaier compensation; this is
+    replicated so that running sums are bit-identical to summing the sequence
+    """
+    __slots__ = ('total', 'compensation')
+
+    def __init__(self):
+        """constructor; starts like sum() with the integer 0"""
+        self.total = 0
+        self.compensation = 0.0
+
+    def _add(self, total, compensation, val):
+        """returns total and compensation after adding val"""
+        if not COMPENSATED_SUM:
+            return total + val, compensation
+        new_total = total + val
+        if abs(total) >= abs(val):
+            compensation += (total - new_total) + val
+        else:
+            compensation += (val - new_total) + total
+        return new_total, compensation
+
+    def add(self, val):
+        """adds val to the sum"""
+        self.total, self.compensation = self._add(self.total,
+                                                  self.compensation, val)
+
+    def get_value(self, last=None):
+        """returns the sum, optionally with one more value added temporarily"""
+        total, compensation = self.total, self.compensation
+        if last is not None:
+            total, compensation = self._add(total, compensation, last)
+        if compensation and math.isfinite(compensation):
+            total += compensation
+        return total
+
+
+class TurnHistory(object):
+    """compact history of (value, length) turns in a flat array of doubles
+
+    with a maximum length, the array is used as a ring buffer, so old turns are
+    dropped in constant time
+    """
+    __slots__ = ('max_turns', 'turns', 'start', 'count')
+
+    def __init__(self, max_turns=None):
+        """constructor; max_turns: turns to retain (None: unlimited)"""
+        self.max_turns = max_turns
+        if max_turns is None:
+            self.turns = array.array('d')
+        else:
+            self.turns = array.array('d', [0.0]) * (2 * max_turns)
+        self.start = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, val, len_s):
+        """adds a turn, dropping the oldest one if the maximum is reached"""
+        if self.max_turns is None:
+            self.turns.append(val)
+            self.turns.append(len_s)
+            self.count += 1
+        elif self.max_turns > 0:
+            index = 2 * ((self.start + self.count) % self.max_turns)
+            self.turns[index] = val
+            self.turns[index + 1] = len_s
+            if self.count < self.max_turns:
+                self.count += 1
+            else:
+                self.start = (self.start + 1) % self.max_turns
+
+    def set_last(self, val, len_s):
+        """replaces the most recent turn"""
+        if self.count:
+            if self.max_turns is None:
+                index = 2 * (self.count - 1)
+            else:
+                index = 2 * ((self.start + self.count - 1) % self.max_turns)
+            self.turns[index] = val
+            self.turns[index + 1] = len_s
+
+    def to_list(self):
+        """returns list of retained turns as [value, length], oldest first"""
+        turns = []
+        for i in range(self.count):
+            if self.max_turns is None:
+                index = 2 * i
+            else:
+                index = 2 * ((self.start + i) % self.max_turns)
+            turns.append([self.turns[index], self.turns[index + 1]])
+        return turns
+
+
+def add_compensated(total, compensation, val):
+    """vectorized RunningSum.add(); returns new total and compensation arrays"""
+    if not COMPENSATED_SUM:
+        return total + val, compensation
+    new_total = total + val
+    compensation = compensation + numpy.where(
+        numpy.abs(total) >= numpy.abs(val), (total - new_total) + val,
+        (val - new_total) + total)
+    return new_total, compensation
+
+
+def get_compensated(total, compensation):
+    """vectorized RunningSum.get_value()"""
+    if not COMPENSATED_SUM:
+        return total
+    return numpy.where((compensation != 0) & numpy.isfinite(compensation),
+                       total + compensation, total)
+
+
+class BatchEntrainer(object):
+    """vectorized equivalent of many Entrainer instances fed the same turns
+
+    holds the state of any number of configurations (and features) in numpy
+    arrays of a common shape, e.g. (configurations, features); all entrainers
+    see the same sequence of register/propose calls, but values may differ per
+    element; history is not stored, running sums are kept instead, so every
+    call is independent of the number of turns so far
+
+    attributes:
+        see Entrainer; all are numpy arrays except the turn counters
+        user_count: number of user turns so far
+        system_count: number of system turns so far
+    """
+
+    def __init__(self, def_val, init_glo_weight, init_loc_weight,
+                 glo_conv, loc_conv, first_k):
+        """constructor; args are array-like (broadcast to a common shape), see
+        Entrainer for their meaning and the applied sanity checks"""
+        def_val, init_glo_weight, init_loc_weight, glo_conv, loc_conv, \
+            first_k = numpy.broadcast_arrays(
+                *[numpy.asarray(arg, dtype=numpy.float64) for arg in
+                  [def_val, init_glo_weight, init_loc_weight, glo_conv,
+                   loc_conv, first_k]])
+        self.def_val = def_val.copy()
+        self.glo_weight = numpy.maximum(init_glo_weight, 0)
+        self.loc_weight = numpy.maximum(init_loc_weight, 0)
+        self.glo_weight_tmp = self.glo_weight.copy()
+        self.loc_weight_tmp = self.loc_weight.copy()
+        # normalized exactly like Entrainer, i.e. loc_weight is divided by the
+        # sum of the already normalized glo_weight and loc_weight
+        over = self.glo_weight + self.loc_weight > 1
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            self.glo_weight = numpy.where(
+                over, self.glo_weight / (self.glo_weight + self.loc_weight),
+                self.glo_weight)
+            self.loc_weight = numpy.where(
+                over, self.loc_weight / (self.glo_weight + self.loc_weight),
+                self.loc_weight)
+        self.glo_conv = glo_conv.copy()
+        self.loc_conv = loc_conv.copy()
+        self.first_k = numpy.maximum(first_k, 1)
+        self.def_weight = 1 - self.glo_weight - self.loc_weight
+        # running state instead of turn history: sums over finished turns
+        # (summed in the same order as Entrainer sums its history) and the
+        # values of the last, possibly still growing, turns
+        self.user_count = 0
+        self.system_count = 0
+        zeros = numpy.zeros(self.def_val.shape)
+        self.k_sum = zeros.copy()
+        self.k_comp = zeros.copy()
+        self.out_sum = zeros.copy()
+        self.out_comp = zeros.copy()
+        self.user_last = zeros.copy()
+        self.user_last_len = zeros.copy()
+        self.system_last = zeros.copy()
+        self.system_last_len = zeros.copy()
+
+    def register_input(self, val, len_s):
+        """stores latest user input values; see Entrainer.register_input()
+
+        args:
+            val: input values, array-like broadcastable to the state's shape
+            len_s: length of the input in seconds
+        """
+        val = numpy.broadcast_to(numpy.asarray(val, dtype=numpy.float64),
+                                 self.def_val.shape)
+        if self.user_count == self.system_count:
+            if self.user_count > 0:
+                # previous user turn is finished; add it if among first k
+                self.k_sum, self.k_comp = add_compensated(
+                    self.k_sum, self.k_comp, numpy.where(
+                        self.user_count - 1 < self.first_k, self.user_last,
+                        0.0))
+            self.user_last = val.copy()
+            self.user_last_len = numpy.full(val.shape, float(len_s))
+            self.user_count += 1
+        else:
+            self.user_last = ((self.user_last * self.user_last_len +
+                               val * len_s) / (self.user_last_len + len_s))
+            self.user_last_len = self.user_last_len + len_s
+
+    def register_output(self, val, len_s):
+        """stores actual output values; see Entrainer.register_output()"""
+        val = numpy.broadcast_to(numpy.asarray(val, dtype=numpy.float64),
+                                 self.def_val.shape)
+        if self.system_count < self.user_count:
+            if self.system_count > 0:
+                self.out_sum, self.out_comp = add_compensated(
+                    self.out_sum, self.out_comp, self.system_last)
+            self.system_last = val.copy()
+            self.system_last_len = numpy.full(val.shape, float(len_s))
+            self.system_count += 1
+        else:
+            self.system_last = ((self.system_last * self.system_last_len +
+                                 val * len_s) /
+                                (self.system_last_len + len_s))
+            self.system_last_len = self.system_last_len + len_s
+
+    def propose_output(self):
+        """returns array of proposed values; see Entrainer.propose_output()"""
+        if self.system_count < self.user_count:
+            # global component (see Entrainer.propose_output())
+            k = numpy.minimum(self.user_count, self.first_k)
+            k_sum = get_compensated(*add_compensated(
+                self.k_sum, self.k_comp, numpy.where(
+                    self.user_count - 1 < self.first_k, self.user_last, 0.0)))
+            k_average = k_sum / k
+            if self.system_count > 0:
+                out_sum = get_compensated(*add_compensated(
+                    self.out_sum, self.out_comp, self.system_last))
+            else:
+                out_sum = get_compensated(self.out_sum, self.out_comp)
+            glo = self.user_count * k_average - out_sum
+            glo *= self.glo_weight
+
+            # local component
+            loc = self.loc_weight * self.user_last
+
+            proposed_val = self.def_weight * self.def_val + glo + loc
+
+            # update weights with convergence summands
+            self.glo_weight_tmp = numpy.maximum(
+                self.glo_weight_tmp + self.glo_conv, 0)
+            self.loc_weight_tmp = numpy.maximum(
+                self.loc_weight_tmp + self.loc_conv, 0)
+            weight_sum = self.glo_weight_tmp + self.loc_weight_tmp
+            over = weight_sum > 1
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                self.glo_weight = numpy.where(
+                    over, self.glo_weight_tmp / weight_sum,
+                    self.glo_weight_tmp)
+                self.loc_weight = numpy.where(
+                    over, self.loc_weight_tmp / weight_sum,
+                    self.loc_weight_tmp)
+            self.def_weight = 1 - self.glo_weight - self.loc_weight
+        else:
+            proposed_val = self.system_last.copy()
+        return proposed_val
+
+
 if __name__ == "__main__":
     pitches = [164, 127, 133, 125, 117, 139, 107, 99, 108, 110]
     entrainer = Entrainer(94, 0.3, 0.2, 0.1, 0.3, 12)
@@ -0,0 +1,570 @@
+import subprocess
+import warnings
+import numpy
+import audio
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import parselmouth
+    from parselmouth.praat import call
+except ImportError:
+    parselmouth = None
+
+"""
+This module contains the backends that measure feature values of wav files for
+remote_tts.extract_feature_values(). All backends return a dictionary with the
+same keys as misc/extract_features.praat (intensity_mean, pitch_mean,
+main_duration, ...) and string values, as written by praat.
+"""
+
+# run misc/extract_features.praat in a new praat process for every call
+BACKEND_PRAAT = 1
+# run the same praat commands in-process through the parselmouth library, which
+# stays loaded for the lifetime of the python process (no startup per call)
+BACKEND_PARSELMOUTH = 2
+# measure directly on the samples with numpy (re-implementation of the praat
+# algorithms; see extract_samples() for differences, jitter and shimmer are nan)
+BACKEND_NUMPY = 3
+
+# whether get_default_backend() warned about the missing parselmouth
+_fallback_warned = False
+
+
+def get_default_backend():
+    """returns the persistent parselmouth backend if available, else praat
+
+    parselmouth is a dependency (see requirements.txt); falling back to praat
+    is warned about (once) since it starts a new process per measurement
+    """
+    global _fallback_warned
+    if parselmouth:
+        return BACKEND_PARSELMOUTH
+    if not _fallback_warned:
+        _fallback_warned = True
+        warnings.warn('praat-parselmouth is not installed, feature extraction '
+                      'falls back to starting a praat process per file',
+                      RuntimeWarning)
+    return BACKEND_PRAAT
+
+
+def extract(in_fname, extract_intensity=1, extract_pitch=1,
+            extract_durations=1, extract_jitter_shimmer=1, backend=None):
+    """measures feature values of a wav file with the given backend
+
+    args:
+        in_fname: name of the wav file which should be analyzed
+        extract_*: whether to measure the respective group of features
+        backend: one of the BACKEND_* constants; see get_default_backend() for
+            the default
+
+    returns:
+        a dictionary containing several feature values, like intensity_mean
+
+    raises:
+        subprocess.CalledProcessError: praat call did not return with code 0
+        ValueError: the given backend is not supported or not installed
+    """
+    backend = backend if backend else get_default_backend()
+    if backend == BACKEND_PRAAT:
+        return extract_praat(in_fname, extract_intensity, extract_pitch,
+                             extract_durations, extract_jitter_shimmer)
+    elif backend == BACKEND_NUMPY:
+        samples, rate = audio.read_wav(in_fname)
+        return extract_samples(samples, rate, extract_intensity, extract_pitch,
+                               extract_durations, extract_jitter_shimmer)
+    elif backend == BACKEND_PARSELMOUTH:
+        if not parselmouth:
+            raise ValueError('parselmouth backend requires praat-parselmouth')
+        return extract_parselmouth(parselmouth.Sound(in_fname),
+                                   extract_intensity, extract_pitch,
+                                   extract_durations, extract_jitter_shimmer)
+    else:
+        raise ValueError('given feature backend not supported')
+
+
+def extract_buffer(buffer, extract_intensity=1, extract_pitch=1,
+                   extract_durations=1, extract_jitter_shimmer=1, backend=None):
+    """measures feature values of an audio.AudioBuffer without a file
+
+    args:
+        buffer: audio.AudioBuffer to analyze
+        backend: BACKEND_PARSELMOUTH or BACKEND_NUMPY; see
+            get_default_backend() for the default
+        (for details on other parameters see extract())
+
+    returns:
+        see extract()
+
+    raises:
+        ValueError: the given backend is not supported or not installed (the
+            praat backend needs a file)
+    """
+    backend = backend if backend else get_default_backend()
+    if backend == BACKEND_NUMPY:
+        return extract_samples(buffer.samples, buffer.rate, extract_intensity,
+                               extract_pitch, extract_durations,
+                               extract_jitter_shimmer)
+    elif backend == BACKEND_PARSELMOUTH:
+        if not parselmouth:
+            raise ValueError('parselmouth backend requires praat-parselmouth')
+        # praat represents 16-bit samples as values between -1 and 1
+        sound = parselmouth.Sound(buffer.samples / 32768.0,
+                                  sampling_frequency=buffer.rate)
+        return extract_parselmouth(sound, extract_intensity, extract_pitch,
+                                   extract_durations, extract_jitter_shimmer)
+    else:
+        raise ValueError('given feature backend not supported for buffers')
+
+
+def extract_praat(in_fname, extract_intensity=1, extract_pitch=1,
+                  extract_durations=1, extract_jitter_shimmer=1):
+    """runs a praat script to extract a given wav file's feature values
+
+    the script prints its results to stdout, which is read through a pipe
+
+    args and returns:
+        see extract()
+    """
+    comp_proc = subprocess.run(
+        get_praat_args(in_fname, extract_intensity, extract_pitch,
+                       extract_durations, extract_jitter_shimmer),
+        stdout=subprocess.PIPE, universal_newlines=True, check=True)
+    return parse_praat_output(comp_proc.stdout)
+
+
+def get_praat_args(in_fname, extract_intensity=1, extract_pitch=1,
+                   extract_durations=1, extract_jitter_shimmer=1):
+    """returns the command line of extract_praat(); see extract() for args"""
+    return ['praat', '--run', '../misc/extract_features.praat', in_fname, '-',
+            str(extract_intensity), str(extract_pitch), str(extract_durations),
+            str(extract_jitter_shimmer)]
+
+
+def parse_praat_output(output):
+    """returns dictionary of the comma-separated key value pairs in output"""
+    feat_val_dict = {}
+    for line in output.split('\n'):
+        if line:
+            key, val = line.split(',')
+            feat_val_dict[key] = val
+    return feat_val_dict
+
+
+def extract_parselmouth(sound, extract_intensity=1, extract_pitch=1,
+                        extract_durations=1, extract_jitter_shimmer=1):
+    """measures feature values of a parselmouth sound in-process
+
+    issues the same praat commands as misc/extract_features.praat
+
+    args:
+        sound: parselmouth.Sound to analyze
+        (for details on other parameters see extract())
+
+    returns:
+        see extract()
+    """
+    feat_vals = []
+
+    if extract_intensity == 1:
+        intensity = call(sound, 'To Intensity', 75, 0, 'yes')
+        feat_vals.append(('intensity_mean',
+                          call(intensity, 'Get mean', 0, 0, 'energy')))
+        feat_vals.append(('intensity_max',
+                          call(intensity, 'Get maximum', 0, 0, 'Parabolic')))
+        feat_vals.append(('intensity_min',
+                          call(intensity, 'Get minimum', 0, 0, 'Parabolic')))
+
+    if extract_pitch == 1:
+        pitch = call(sound, 'To Pitch', 0, 50, 500)
+        feat_vals.append(('pitch_mean',
+                          call(pitch, 'Get mean', 0, 0, 'Hertz')))
+        feat_vals.append(('pitch_max', call(pitch, 'Get maximum', 0, 0,
+                                            'Hertz', 'Parabolic')))
+        feat_vals.append(('pitch_min', call(pitch, 'Get minimum', 0, 0,
+                                            'Hertz', 'Parabolic')))
+
+    if extract_durations == 1:
+        total_duration = call(sound, 'Get total duration')
+        text_grid = call(sound, 'To TextGrid (silences)', 75, 0, -35, 0.05,
+                         0.05, 'silent', 'sounding')
+        interval_count = call(text_grid, 'Get number of intervals', 1)
+        start_point = 0.0
+        end_point = 0.0
+        silence_duration = 0.0
+        end_silence_duration = 0.0
+        for interval in range(1, interval_count + 1):
+            start_point = end_point
+            end_point = call(text_grid, 'Get end point', 1, interval)
+            if call(text_grid, 'Get label of interval', 1,
+                    interval) == 'silent':
+                silence_duration += end_point - start_point
+                if interval == interval_count:
+                    end_silence_duration = end_point - start_point
+        feat_vals.append(('total_duration', total_duration))
+        feat_vals.append(('speech_duration',
+                          total_duration - silence_duration))
+        feat_vals.append(('silence_duration', silence_duration))
+        feat_vals.append(('main_duration',
+                          total_duration - end_silence_duration))
+
+    if extract_jitter_shimmer == 1:
+        pitch = call(sound, 'To Pitch (cc)', 0, 75, 15, 'no', 0.03, 0.45,
+                     0.01, 0.35, 0.14, 600)
+        point_process = call([sound, pitch], 'To PointProcess (cc)')
+        feat_vals.append(('jitter_local', call(
+            point_process, 'Get jitter (local)', 0, 0, 0.0001, 0.02, 1.3)))
+        feat_vals.append(('shimmer_local', call(
+            [sound, point_process], 'Get shimmer (local)',
+            0, 0, 0.0001, 0.02, 1.3, 1.6)))
+
+    return dict((key, repr(float(val))) for key, val in feat_vals)
+
+
+def extract_batch(inputs, extract_intensity=1, extract_pitch=1,
+                  extract_durations=1, extract_jitter_shimmer=1, backend=None,
+                  workers=4):
+    """measures feature values of many wav files or sample arrays at once
+
+    args:
+        inputs: list of wav file names or (samples, sample rate) tuples; tuples
+            are measured in memory (see extract_buffer(), the praat backend
+            does not support them)
+        workers: number of threads measuring in parallel (numpy and praat both
+            release the interpreter lock for most of their work)
+        (for details on other parameters see extract())
+
+    returns:
+        list of dictionaries (see extract()), in the order of inputs
+    """
+    def extract_one(item):
+        if isinstance(item, tuple):
+            return extract_buffer(audio.AudioBuffer(item[0], item[1]),
+                                  extract_intensity, extract_pitch,
+                                  extract_durations, extract_jitter_shimmer,
+                                  backend)
+        return extract(item, extract_intensity, extract_pitch,
+                       extract_durations, extract_jitter_shimmer, backend)
+
+    with ThreadPoolExecutor(max(workers, 1)) as executor:
+        return list(executor.map(extract_one, inputs))
+
+
+def extract_samples(samples, rate, extract_intensity=1, extract_pitch=1,
+                    extract_durations=1, extract_jitter_shimmer=1):
+    """measures feature values of in-memory samples with numpy
+
+    re-implements the praat commands in misc/extract_features.praat: intensity
+    as in "To Intensity... 75 0 yes" (energy mean), pitch as in "To Pitch...
+    0 50 500" (autocorrelation with hanning window and viterbi path finder) and
+    silences as in "To TextGrid (silences)... 75 0 -35 0.05 0.05"; peaks are
+    refined by parabolic instead of sinc interpolation, so values differ
+    slightly from praat's (see check_conformance()); jitter and shimmer are
+    not implemented and reported as nan, so callers written for the other
+    backends keep working
+
+    args:
+        samples: numpy array of 16-bit samples (or floats in the same range)
+        rate: sample rate of the samples
+        (for details on other parameters see extract())
+
+    returns:
+        see extract()
+    """
+    # praat represents 16-bit samples as values between -1 and 1
+    samples = numpy.asarray(samples, dtype=numpy.float64) / 32768.0
+    feat_vals = []
+
+    if extract_intensity == 1:
+        intensities = _get_intensity(samples, rate, 75.0, True)
+        if len(intensities):
+            # energy mean: average of the power values, not of the decibels
+            mean = 10 * numpy.log10(numpy.mean(10 ** (intensities / 10)))
+            maximum = _get_parabolic_extremum(intensities, numpy.argmax)
+            minimum = _get_parabolic_extremum(intensities, numpy.argmin)
+        else:
+            mean = maximum = minimum = float('nan')
+        feat_vals.append(('intensity_mean', mean))
+        feat_vals.append(('intensity_max', maximum))
+        feat_vals.append(('intensity_min', minimum))
+
+    if extract_pitch == 1:
+        pitches = _get_pitch(samples, rate, 50.0, 500.0)
+        voiced = pitches[pitches > 0]
+        if len(voiced):
+            feat_vals.append(('pitch_mean', numpy.mean(voiced)))
+            feat_vals.append(('pitch_max', numpy.max(voiced)))
+            feat_vals.append(('pitch_min', numpy.min(voiced)))
+        else:
+            feat_vals.extend([('pitch_mean', float('nan')),
+                              ('pitch_max', float('nan')),
+                              ('pitch_min', float('nan'))])
+
+    if extract_durations == 1:
+        total_duration = len(samples) / float(rate)
+        intervals = _get_silences(samples, rate, 75.0, -35.0, 0.05, 0.05)
+        silence_duration = 0.0
+        end_silence_duration = 0.0
+        for start_point, end_point, silent in intervals:
+            if silent:
+                silence_duration += end_point - start_point
+        if intervals and intervals[-1][2]:
+            end_silence_duration = intervals[-1][1] - intervals[-1][0]
+        feat_vals.append(('total_duration', total_duration))
+        feat_vals.append(('speech_duration',
+                          total_duration - silence_duration))
+        feat_vals.append(('silence_duration', silence_duration))
+        feat_vals.append(('main_duration',
+                          total_duration - end_silence_duration))
+
+    if extract_jitter_shimmer == 1:
+        feat_vals.append(('jitter_local', float('nan')))
+        feat_vals.append(('shimmer_local', float('nan')))
+
+    return dict((key, repr(float(val))) for key, val in feat_vals)
+
+
+def check_conformance(in_fnames, reference_backend=None, tolerances=None):
+    """compares the numpy backend to a praat backend on given wav files
+
+    args:
+        in_fnames: names of the wav files to compare on
+        reference_backend: backend to compare against (default see extract())
+        tolerances: dictionary of maximum absolute difference per feature;
+            defaults to 0.5 db, 2 hz and 0.02 seconds
+
+    returns:
+        list of (file name, feature, numpy value, reference value) tuples for
+        all differences exceeding the tolerance; empty if all conform
+    """
+    tolerances = tolerances if tolerances else {
+        'intensity_mean': 0.5, 'pitch_mean': 2.0, 'main_duration': 0.02,
+        'speech_duration': 0.02}
+    deviations = []
+    numpy_vals = extract_batch(in_fnames, 1, 1, 1, 0, BACKEND_NUMPY)
+    ref_vals = extract_batch(in_fnames, 1, 1, 1, 0, reference_backend)
+    for in_fname, numpy_dict, ref_dict in zip(in_fnames, numpy_vals,
+                                              ref_vals):
+        for key, tolerance in tolerances.items():
+            if not abs(float(numpy_dict[key]) - float(ref_dict[key])) <= \
+                    tolerance:
+                deviations.append((in_fname, key, float(numpy_dict[key]),
+                                   float(ref_dict[key])))
+    return deviations
+
+
+def _get_frame_times(duration, rate, window_secs, step_secs):
+    """returns center times of analysis frames as placed by praat"""
+    frame_count = int(numpy.floor((duration - window_secs) / step_secs)) + 1
+    if frame_count < 1:
+        return numpy.zeros(0)
+    first_time = 0.5 * duration - 0.5 * frame_count * step_secs + \
+        0.5 * step_secs
+    return first_time + step_secs * numpy.arange(frame_count)
+
+
+def _get_frames(samples, rate, times, half_len):
+    """returns matrix of windows of 2 * half_len + 1 samples around times
+
+    samples outside the signal are returned as nan
+    """
+    centers = numpy.round(times * rate - 0.5).astype(numpy.int64)
+    indices = centers[:, None] + numpy.arange(-half_len, half_len + 1)
+    valid = (indices >= 0) & (indices < len(samples))
+    frames = numpy.where(valid, samples[numpy.clip(indices, 0,
+                                                   len(samples) - 1)],
+                         numpy.nan)
+    return frames
+
+
+def _get_intensity(samples, rate, min_pitch, subtract_mean):
+    """returns praat-like intensity contour in db (one value per frame)"""
+    window_secs = 6.4 / min_pitch
+    step_secs = 0.8 / min_pitch
+    times = _get_frame_times(len(samples) / float(rate), rate, window_secs,
+                             step_secs)
+    if not len(times):
+        return numpy.zeros(0)
+    half_len = int(0.5 * window_secs * rate)
+    # gaussian-like kaiser window, as in praat
+    x = numpy.arange(-half_len, half_len + 1) / float(half_len + 1)
+    window = numpy.i0((2 * numpy.pi ** 2 + 0.5) * numpy.sqrt(1 - x ** 2))
+    frames = _get_frames(samples, rate, times, half_len)
+    if subtract_mean:
+        frames = frames - numpy.nanmean(frames, axis=1)[:, None]
+    weights = numpy.where(numpy.isnan(frames), 0.0, window)
+    frames = numpy.nan_to_num(frames)
+    power = (frames ** 2 * weights).sum(axis=1) / weights.sum(axis=1)
+    # relative to the auditory threshold of 2e-5 pa
+    power = power / 4e-10
+    return numpy.where(power < 1e-30, -300.0,
+                       10 * numpy.log10(numpy.maximum(power, 1e-30)))
+
+
+def _get_parabolic_extremum(values, arg_function):
+    """returns extremum of values, refined by parabolic interpolation"""
+    i = int(arg_function(values))
+    if i == 0 or i == len(values) - 1:
+        return values[i]
+    y0, y1, y2 = values[i - 1], values[i], values[i + 1]
+    denominator = y0 - 2 * y1 + y2
+    if denominator == 0:
+        return y1
+    return y1 - 0.125 * (y0 - y2) ** 2 / denominator
+
+
+def _get_pitch(samples, rate, floor, ceiling, max_candidates=15,
+               silence_threshold=0.03, voicing_threshold=0.45,
+               octave_cost=0.01, octave_jump_cost=0.35,
+               voiced_unvoiced_cost=0.14):
+    """returns praat-like pitch contour in hz (one value per frame, 0 if
+    unvoiced), following praat's autocorrelation method ("To Pitch (ac)")"""
+    periods_per_window = 3.0
+    window_secs = periods_per_window / floor
+    step_secs = 0.25 * window_secs
+    times = _get_frame_times(len(samples) / float(rate), rate, window_secs,
+                             step_secs)
+    if not len(times):
+        return numpy.zeros(0)
+    half_len = int(0.5 * window_secs * rate) - 1
+    window_len = 2 * half_len + 1
+    period_len = int(rate / floor)
+    max_lag = min(int(window_len / periods_per_window) + 2, window_len - 1)
+    fft_len = 1
+    while fft_len < window_len * 1.5:
+        fft_len *= 2
+
+    frames = _get_frames(samples, rate, times, half_len)
+    frames = frames - numpy.nanmean(frames, axis=1)[:, None]
+    frames = numpy.nan_to_num(frames)
+    global_peak = numpy.max(numpy.abs(samples - numpy.mean(samples)))
+    center = slice(max(half_len - period_len // 2, 0),
+                   half_len + period_len // 2 + 1)
+    local_peaks = numpy.max(numpy.abs(frames[:, center]), axis=1)
+
+    # normalized autocorrelation, corrected for the hanning window's own
+    window = 0.5 - 0.5 * numpy.cos(
+        2 * numpy.pi * numpy.arange(1, window_len + 1) / (window_len + 1))
+    window_ac = numpy.fft.irfft(
+        numpy.abs(numpy.fft.rfft(window, fft_len)) ** 2, fft_len)[:max_lag + 2]
+    window_ac = window_ac / window_ac[0]
+    frames_ac = numpy.fft.irfft(
+        numpy.abs(numpy.fft.rfft(frames * window, fft_len, axis=1)) ** 2,
+        fft_len, axis=1)[:, :max_lag + 2]
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        r = frames_ac / frames_ac[:, :1] / window_ac
+    r = numpy.nan_to_num(r)
+
+    # collect candidates per frame: (frequency, strength), first is unvoiced
+    candidates = []
+    min_lag = max(int(rate / ceiling), 2)
+    for frame_index in range(len(times)):
+        frame_r = r[frame_index]
+        if global_peak > 0:
+            intensity = local_peaks[frame_index] / global_peak
+        else:
+            intensity = 0.0
+        unvoiced_strength = voicing_threshold + max(
+            0.0, 2.0 - intensity / (silence_threshold /
+                                    (1.0 + voicing_threshold)))
+        frame_candidates = [(0.0, unvoiced_strength)]
+        voiced = []
+        lags = numpy.arange(min_lag, max_lag)
+        peaks = lags[(frame_r[lags] > 0.5 * voicing_threshold) &
+                     (frame_r[lags] > frame_r[lags - 1]) &
+                     (frame_r[lags] >= frame_r[lags + 1])]
+        for lag in peaks:
+            dr = 0.5 * (frame_r[lag + 1] - frame_r[lag - 1])
+            d2r = 2 * frame_r[lag] - frame_r[lag - 1] - frame_r[lag + 1]
+            offset = dr / d2r if d2r > 0 else 0.0
+            frequency = rate / (lag + offset)
+            if not floor <= frequency <= ceiling:
+                continue
+            strength = frame_r[lag] + 0.5 * dr * offset
+            if strength > 1.0:
+                strength = 1.0 / strength
+            voiced.append((frequency, strength))
+        # keep the strongest, favoring higher frequencies like praat does
+        voiced.sort(key=lambda cand: cand[1] - octave_cost *
+                    numpy.log2(floor / cand[0]), reverse=True)
+        for frequency, strength in voiced[:max_candidates - 1]:
+            frame_candidates.append(
+                (frequency,
+                 strength - octave_cost * numpy.log2(ceiling / frequency)))
+        candidates.append(frame_candidates)
+
+    # viterbi path finder; costs are scaled to praat's 10 ms reference step
+    time_step_correction = 0.01 / step_secs
+    octave_jump_cost *= time_step_correction
+    voiced_unvoiced_cost *= time_step_correction
+    scores = numpy.array([cand[1] for cand in candidates[0]])
+    back_pointers = []
+    for frame_index in range(1, len(candidates)):
+        prev_freqs = numpy.array([cand[0] for cand in
+                                  candidates[frame_index - 1]])
+        freqs = numpy.array([cand[0] for cand in candidates[frame_index]])
+        strengths = numpy.array([cand[1] for cand in candidates[frame_index]])
+        prev_voiced = prev_freqs[:, None] > 0
+        cur_voiced = freqs[None, :] > 0
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            jumps = numpy.abs(numpy.log2(prev_freqs[:, None] / freqs[None, :]))
+        costs = numpy.where(prev_voiced & cur_voiced,
+                            octave_jump_cost * numpy.nan_to_num(jumps),
+                            numpy.where(prev_voiced ^ cur_voiced,
+                                        voiced_unvoiced_cost, 0.0))
+        totals = scores[:, None] - costs
+        best = numpy.argmax(totals, axis=0)
+        back_pointers.append(best)
+        scores = totals[best, numpy.arange(len(freqs))] + strengths
+
+    pitches = numpy.zeros(len(candidates))
+    place = int(numpy.argmax(scores))
+    for frame_index in range(len(candidates) - 1, -1, -1):
+        pitches[frame_index] = candidates[frame_index][place][0]
+        if frame_index > 0:
+            place = int(back_pointers[frame_index - 1][place])
+    return pitches
+
+
+def _get_silences(samples, rate, min_pitch, silence_threshold,
+                  min_silent_secs, min_sounding_secs):
+    """returns silent and sounding intervals like "To TextGrid (silences)"
+
+    returns:
+        list of (start, end, is_silent) tuples covering the whole signal
+    """
+    duration = len(samples) / float(rate)
+    intensities = _get_intensity(samples, rate, min_pitch, False)
+    if not len(intensities):
+        return [(0.0, duration, False)]
+    step_secs = 0.8 / min_pitch
+    times = _get_frame_times(duration, rate, 6.4 / min_pitch, step_secs)
+    max_db = _get_parabolic_extremum(intensities, numpy.argmax)
+    min_db = _get_parabolic_extremum(intensities, numpy.argmin)
+    threshold = max(max_db + silence_threshold, min_db)
+
+    # boundaries lie halfway between frames where the classification changes
+    silent = intensities < threshold
+    intervals = []
+    start = 0.0
+    for i in range(1, len(silent)):
+        if silent[i] != silent[i - 1]:
+            end = times[i] - 0.5 * step_secs
+            intervals.append([start, end, bool(silent[i - 1])])
+            start = end
+    intervals.append([start, duration, bool(silent[-1])])
+
+    # relabel too short silences, then too short sounding parts, merging
+    # adjacent intervals of the same kind after each step
+    for label, min_secs in [(True, min_silent_secs),
+                            (False, min_sounding_secs)]:
+        for interval in intervals:
+            if interval[2] == label and interval[1] - interval[0] < min_secs \
+                    and len(intervals) > 1:
+                interval[2] = not label
+        merged = [intervals[0]]
+        for interval in intervals[1:]:
+            if interval[2] == merged[-1][2]:
+                merged[-1][1] = interval[1]
+            else:
+                merged.append(interval)
+        intervals = merged
+    return [tuple(interval) for interval in intervals]
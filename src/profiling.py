@@ -0,0 +1,246 @@
+import functools
+import math
+import os
+import threading
+import time
+
+"""
+This module offers timing instrumentation for the synthesis pipeline. Timers
+(the timer() context manager and the timed() decorator) report the seconds
+spent in a named stage to a sink; sinks keep an in-memory histogram, append to
+a CSV file or write a Prometheus-style text file. Profiling is off by default:
+as long as no sink is set, timers do nothing but check for one.
+
+example:
+    sink = profiling.HistogramSink()
+    profiling.set_sink(sink)
+    switchboard.main2()
+    print(sink)
+"""
+
+# default upper bounds (seconds) of the histogram buckets
+DEFAULT_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 25.0, 60.0]
+
+# sink receiving all timings of this process; None disables profiling
+_sink = None
+
+
+def set_sink(sink):
+    """sets the sink for all timers of this process (None: profiling off)
+
+    returns:
+        the previous sink
+    """
+    global _sink
+    previous = _sink
+    _sink = sink
+    return previous
+
+
+def get_sink():
+    """returns the current sink (None if profiling is off)"""
+    return _sink
+
+
+class _Timer(object):
+    """context manager reporting the time spent inside to the sink"""
+    __slots__ = ('name', 'sink', 'start')
+
+    def __init__(self, name, sink):
+        self.name = name
+        self.sink = sink
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # failed calls are timed as well; they cost time all the same
+        self.sink.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer(object):
+    """context manager doing nothing; used while profiling is off"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name):
+    """returns a context manager timing its block as stage name"""
+    sink = _sink
+    if sink is None:
+        return _NULL_TIMER
+    return _Timer(name, sink)
+
+
+def timed(name=None):
+    """decorator timing every call of a function
+
+    args:
+        name: name of the stage; '<module>.<function>' if None
+    """
+    def decorator(function):
+        stage = name if name else '%s.%s' % (function.__module__,
+                                             function.__qualname__)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            sink = _sink
+            if sink is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                sink.record(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class HistogramSink(object):
+    """keeps count, sum, minimum, maximum and a histogram per stage in memory
+
+    attributes:
+        buckets: sorted upper bounds of the histogram buckets in seconds
+        stages: dictionary mapping stage names to lists of count, sum,
+            minimum, maximum and bucket counts (last bucket: above all bounds)
+    """
+
+    def __init__(self, buckets=None):
+        """constructor; see DEFAULT_BUCKETS for the default buckets"""
+        self.buckets = sorted(buckets if buckets else DEFAULT_BUCKETS)
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        """returns a table of count, total, mean, minimum and maximum"""
+        lines = ['%-45s %7s %10s %10s %10s %10s' %
+                 ('stage', 'count', 'total', 'mean', 'min', 'max')]
+        for name, summary in sorted(self.summary().items()):
+            lines.append('%-45s %7d %10.4f %10.4f %10.4f %10.4f' %
+                         ((name,) + summary))
+        return '\n'.join(lines)
+
+    def record(self, name, secs):
+        """adds the duration of one call of a stage"""
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = [0, 0.0, math.inf, 0.0] + [0] * (len(self.buckets) + 1)
+                self.stages[name] = stage
+            stage[0] += 1
+            stage[1] += secs
+            stage[2] = min(stage[2], secs)
+            stage[3] = max(stage[3], secs)
+            for i, bound in enumerate(self.buckets):
+                if secs <= bound:
+                    stage[4 + i] += 1
+                    break
+            else:
+                stage[-1] += 1
+
+    def summary(self):
+        """returns dictionary of stage names to tuples of count, total, mean,
+        minimum and maximum in seconds"""
+        with self._lock:
+            return {name: (stage[0], stage[1], stage[1] / stage[0], stage[2],
+                           stage[3])
+                    for name, stage in self.stages.items()}
+
+    def reset(self):
+        """forgets all recorded timings"""
+        with self._lock:
+            self.stages = {}
+
+
+class CsvSink(object):
+    """appends one line per timed call to a csv file
+
+    columns are wall clock time at the end of the call, process id, stage name
+    and duration in seconds; every line is a single write to a file opened in
+    append mode, so processes can share the file
+
+    attributes:
+        fname: name of the csv file
+    """
+
+    def __init__(self, fname):
+        """constructor; writes the header if the file is new"""
+        self.fname = fname
+        self._fd = os.open(fname, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                           0o644)
+        if os.fstat(self._fd).st_size == 0:
+            os.write(self._fd, b'time,pid,stage,secs\n')
+
+    def record(self, name, secs):
+        """appends the duration of one call of a stage"""
+        os.write(self._fd, ('%.6f,%d,%s,%.6f\n' % (
+            time.time(), os.getpid(), name, secs)).encode('utf-8'))
+
+    def close(self):
+        """closes the file; no more calls may be recorded afterwards"""
+        os.close(self._fd)
+
+
+class PrometheusSink(HistogramSink):
+    """histogram sink that writes its state as a Prometheus-style text file
+
+    the file is rewritten (atomically) at most every interval seconds while
+    recording and whenever write() is called; it can be collected by the node
+    exporter's textfile collector, for example
+
+    attributes:
+        fname: name of the text file
+        metric: name of the histogram metric; stages are its 'stage' label
+        interval: minimum number of seconds between automatic rewrites
+    """
+
+    def __init__(self, fname, metric='entrainment_stage_seconds',
+                 interval=10.0, buckets=None):
+        """constructor; see HistogramSink for buckets"""
+        HistogramSink.__init__(self, buckets)
+        self.fname = fname
+        self.metric = metric
+        self.interval = interval
+        self._last_write = time.monotonic()
+
+    def record(self, name, secs):
+        """adds the duration of one call; rewrites the file if it is due"""
+        HistogramSink.record(self, name, secs)
+        if time.monotonic() - self._last_write >= self.interval:
+            self.write()
+
+    def write(self):
+        """writes all histograms to the text file"""
+        lines = ['# HELP %s Seconds spent per call of a pipeline stage.' %
+                 self.metric,
+                 '# TYPE %s histogram' % self.metric]
+        with self._lock:
+            self._last_write = time.monotonic()
+            for name, stage in sorted(self.stages.items()):
+                cumulative = 0
+                for i, bound in enumerate(self.buckets + [math.inf]):
+                    cumulative += stage[4 + i]
+                    lines.append('%s_bucket{stage="%s",le="%s"} %d' % (
+                        self.metric, name,
+                        '+Inf' if math.isinf(bound) else repr(bound),
+                        cumulative))
+                lines.append('%s_sum{stage="%s"} %r' %
+                             (self.metric, name, stage[1]))
+                lines.append('%s_count{stage="%s"} %d' %
+                             (self.metric, name, stage[0]))
+        tmp_fname = '%s.%d.tmp' % (self.fname, os.getpid())
+        with open(tmp_fname, 'w') as prom_file:
+            prom_file.write('\n'.join(lines) + '\n')
+        os.replace(tmp_fname, self.fname)
@@ -1,12 +1,29 @@
 import requests
+import requests.adapters
+from urllib3.util.retry import Retry
 import subprocess
 from os import remove
 from os import getpid
 import numpy
-import xml.dom.minidom
+import xml.etree.ElementTree as ElementTree
+import io
+import re
+import os
 import threading
 import json
 import time
+import itertools
+import asyncio
+import concurrent.futures
+import functools
+import weakref
+import contextlib
+from os.path import isfile
+import asr
+import audio
+import features
+import profiling
+from synthesis_cache import SynthesisCache
 
 TTS_TYPE_MARY = 1
 TTS_TYPE_FESTIVAL = 2
@@ -21,20 +38,196 @@ DEFAULT_VOICE_FESTIVAL = 'kal_diphone'
 INPUT_TYPE_TEXT = 'TEXT'  # value matters, used directly as parameter for mary
 INPUT_TYPE_SSML = 'SSML'  # value matters, used directly as parameter for mary
 INPUT_TYPE_SABLE = 'SABLE'
+# directory for intermediate files; can be changed to give concurrently running
+# processes separate scratch directories
+TMP_DIR = '../tmp'
+# directory for files that are only written because an external tool (praat,
+# pocketsphinx) needs a file; a ram-backed file system keeps them off the disk;
+# TMP_DIR is used if None or not available; see scratch_wav()
+SCRATCH_DIR = '/dev/shm'
+# backend for extract_feature_values(); see features.get_default_backend()
+FEATURE_BACKEND = None
+
+# speech recognizer of recognize_buffer(), one of the asr.DECODER_* constants;
+# see asr.get_default_decoder() if None; ASR_CONFIG holds keyword arguments for
+# the decoder (e.g. model paths for pocketsphinx, see asr.PocketsphinxDecoder)
+ASR_DECODER = None
+ASR_CONFIG = None
+
+# on-disk cache of synthesized audio used by synthesize(); shared by all
+# processes using the same directory; set to None to disable caching
+SYNTHESIS_CACHE_DIR = '../tmp/synthesis_cache'
+SYNTHESIS_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# syllable counts of words (and texts) already sent to mary; see
+# count_syllables_texts(); set to None to keep the counts in memory only
+SYLLABLE_CACHE_FNAME = '../tmp/syllable_counts.json'
+# phones counted as syllables in mary's phoneme output (en_US)
+MARY_VOWELS = ['A', 'O', 'u', 'i', '{', 'V', 'E', 'I', 'U', '@', 'r=', 'aU',
+               'OI', '@U', 'EI', 'AI']
+# words as sent to mary; apostrophes belong to the word (e.g. "don't")
+WORD_PATTERN = re.compile(r"\w+(?:'\w+)*")
+
+# mary servers used if no ip address is given; requests are distributed over
+# them round-robin; see configure_mary()
+MARY_ENDPOINTS = [('127.0.0.1', 59125)]
+MARY_TIMEOUT = (3.05, 120.0)  # seconds for connecting and reading
+MARY_RETRIES = 2
+MARY_POOL_SIZE = 10
+# bytes per chunk when reading streamed responses; see synthesize_stream()
+MARY_STREAM_CHUNK_BYTES = 4096
+
+# makes names from get_unique_fname() unique within a process
+_fname_counter = itertools.count()
+_mary_session = None
+_mary_endpoint_cycle = None
+_mary_lock = threading.Lock()
+_synthesis_cache = None
+_synthesis_cache_lock = threading.Lock()
+_syllable_cache = None
+_syllable_cache_lock = threading.Lock()
 
 
 def get_unique_fname(name, ftype=None):
     """makes a file name more unique by adding a process id and timestamp to it
 
+    a counter is added as well, so names created by the same process within the
+    same second are still unique
+
     args:
         name: file name including path, excluding file type
         ftype: file type including '.'
     """
-    return '%s_%s_%d%s' % (name, time.strftime('%Y%m%d%H%M%S'), getpid(), ftype)
+    return '%s_%s_%d_%d%s' % (name, time.strftime('%Y%m%d%H%M%S'), getpid(),
+                              next(_fname_counter), ftype)
+
+
+def configure_mary(endpoints=None, timeout=None, retries=None,
+                   pool_size=None):
+    """sets up the connection pool shared by all requests to mary
+
+    parameters which are not given keep their current value (see the MARY_*
+    constants at the beginning of this module); existing connections are closed
+
+    args:
+        endpoints: list of (ip address, port) tuples of mary servers
+        timeout: seconds to wait for a connection and for a response, either a
+            single number or a tuple of both
+        retries: number of retries after connection errors and after
+            responses with status 502, 503 or 504
+        pool_size: maximum number of kept-alive connections per server
+    """
+    global MARY_ENDPOINTS, MARY_TIMEOUT, MARY_RETRIES, MARY_POOL_SIZE
+    global _mary_session, _mary_endpoint_cycle
+    with _mary_lock:
+        MARY_ENDPOINTS = list(endpoints) if endpoints else MARY_ENDPOINTS
+        MARY_TIMEOUT = timeout if timeout else MARY_TIMEOUT
+        MARY_RETRIES = retries if retries is not None else MARY_RETRIES
+        MARY_POOL_SIZE = pool_size if pool_size else MARY_POOL_SIZE
+        if _mary_session:
+            _mary_session.close()
+        _mary_session = None
+        _mary_endpoint_cycle = None
+
+
+def get_mary_session():
+    """returns the requests session with the pooled connections to mary"""
+    global _mary_session, _mary_endpoint_cycle
+    with _mary_lock:
+        if not _mary_session:
+            retry_args = {
+                'total': MARY_RETRIES,
+                'backoff_factor': 0.1,
+                'status_forcelist': (502, 503, 504),
+                # the final response is checked by the caller
+                'raise_on_status': False
+            }
+            # urllib3 does not retry post requests by default; renamed in 1.26
+            try:
+                retry = Retry(allowed_methods=frozenset(['POST']),
+                              **retry_args)
+            except TypeError:
+                retry = Retry(method_whitelist=frozenset(['POST']),
+                              **retry_args)
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=max(len(MARY_ENDPOINTS), 1),
+                pool_maxsize=MARY_POOL_SIZE, max_retries=retry)
+            _mary_session = requests.Session()
+            _mary_session.mount('http://', adapter)
+            _mary_endpoint_cycle = itertools.cycle(MARY_ENDPOINTS)
+        return _mary_session
+
+
+def post_mary(params, ip_addr=None, port=None, stream=False):
+    """sends a request to the /process endpoint of mary and reads the response
+
+    uses the shared connection pool (see configure_mary()); without ip_addr,
+    the next server in MARY_ENDPOINTS is used and the others are tried in turn
+    if a connection cannot be established
+
+    args:
+        params: dictionary of mary request parameters
+        ip_addr: ip address of a specific mary server
+        port: port of the mary server, 59125 if none given
+        stream: whether to return as soon as the response headers arrived
+            instead of reading the whole content; timed as stage
+            'remote_tts.post_mary.headers' instead of 'remote_tts.post_mary'
+
+    returns:
+        response content as bytes; if stream is True, an iterator over chunks
+        of the content (MARY_STREAM_CHUNK_BYTES each) as they arrive
+
+    raises:
+        requests.exceptions.RequestException: the connection failed or the
+            server did not return an ok status
+    """
+    # a streaming call returns once the headers arrived, so it is timed as a
+    # stage of its own rather than mixed with calls reading the whole content
+    stage = 'remote_tts.post_mary.headers' if stream else 'remote_tts.post_mary'
+    with profiling.timer(stage):
+        session = get_mary_session()
+        if ip_addr:
+            endpoints = [(ip_addr, port if port else 59125)]
+        else:
+            with _mary_lock:
+                endpoints = [next(_mary_endpoint_cycle)
+                             for _ in range(len(MARY_ENDPOINTS))]
+        for i, (endpoint_ip_addr, endpoint_port) in enumerate(endpoints):
+            try:
+                resp = session.post(
+                    'http://%s:%d/process' % (endpoint_ip_addr, endpoint_port),
+                    data=params, timeout=MARY_TIMEOUT, stream=stream)
+                break
+            except requests.exceptions.ConnectionError:
+                if i == len(endpoints) - 1:
+                    raise
+        resp.raise_for_status()
+        if stream:
+            return resp.iter_content(MARY_STREAM_CHUNK_BYTES)
+        return resp.content
 
 
+def get_synthesis_cache():
+    """returns the synthesis cache used by synthesize(), None if disabled
+
+    the cache is created on first use from SYNTHESIS_CACHE_DIR and
+    SYNTHESIS_CACHE_MAX_BYTES; its hits and misses attributes count requests
+    """
+    global _synthesis_cache
+    if not SYNTHESIS_CACHE_DIR:
+        return None
+    with _synthesis_cache_lock:
+        if not _synthesis_cache or \
+                _synthesis_cache.cache_dir != SYNTHESIS_CACHE_DIR:
+            _synthesis_cache = SynthesisCache(SYNTHESIS_CACHE_DIR,
+                                              SYNTHESIS_CACHE_MAX_BYTES)
+    return _synthesis_cache
+
+
+@profiling.timed()
 def synthesize(in_str, in_str_is_fname=False, input_type=None, out_fname=None,
-               tts_type=None, ip_addr=None, port=None, voice=None):
+               tts_type=None, ip_addr=None, port=None, voice=None,
+               use_cache=True):
     """sends given string to a tts server and writes response to a file
 
     args:
@@ -48,12 +241,15 @@ def synthesize(in_str, in_str_is_fname=False, input_type=None, out_fname=None,
         out_fname: server response is written to this file location; if the
             return status is not ok, this contains additional info; if no name
             is given, a default will be used and returned by this function
-        ip_addr: ip address of the tts server, localhost is used if none given
+        ip_addr: ip address of the tts server; if none given, localhost is used
+            for festival and the configured MARY_ENDPOINTS for mary
         port: port of the tts server, default for tts is used if none given
         tts_type: tts software to use; specified by one of the TTS_TYPE_*
             constants at the beginning of this module (only those tts are
             supported); marytts is used if none given
         voice: name of the voice to use; default for tts is used if none given
+        use_cache: whether to answer identical requests from the synthesis
+            cache (see get_synthesis_cache()) instead of the tts server
 
     returns:
         name of the output file, same as out_fname if that was given
@@ -71,9 +267,12 @@ def synthesize(in_str, in_str_is_fname=False, input_type=None, out_fname=None,
     # set defaults for missing parameters
     input_type = input_type if input_type else INPUT_TYPE_TEXT
     tts_type = tts_type if tts_type else TTS_TYPE_MARY
+    # mary uses the configured endpoints if no address is given
+    mary_ip_addr = ip_addr
+    mary_port = port
     ip_addr = ip_addr if ip_addr else '127.0.0.1'
     out_fname = out_fname if out_fname \
-        else get_unique_fname('../tmp/synthesis', '.wav')
+        else get_unique_fname(TMP_DIR + '/synthesis', '.wav')
     if tts_type == TTS_TYPE_MARY:
         port = port if port else 59125
         voice = voice if voice else DEFAULT_VOICE_MARY
@@ -81,6 +280,13 @@ def synthesize(in_str, in_str_is_fname=False, input_type=None, out_fname=None,
         port = port if port else 1314
         voice = voice if voice else DEFAULT_VOICE_FESTIVAL
 
+    # identical requests result in identical audio, so try the cache first
+    cache = get_synthesis_cache() if use_cache else None
+    if cache:
+        cache_key = cache.get_key(tts_type, voice, input_type, in_str)
+        if cache.fetch(cache_key, out_fname):
+            return out_fname
+
     # communicate with tts server in individually appropriate way
     if tts_type == TTS_TYPE_MARY:
         if input_type != INPUT_TYPE_TEXT and input_type != INPUT_TYPE_SSML:
@@ -94,22 +300,24 @@ def synthesize(in_str, in_str_is_fname=False, input_type=None, out_fname=None,
             'AUDIO': 'WAVE_FILE',
             'VOICE': voice
         }
-        resp = requests.post('http://%s:%d/process' % (ip_addr, port),
-                             data=params, stream=True)
+        try:
+            content = post_mary(params, mary_ip_addr, mary_port)
+        except requests.exceptions.HTTPError as e:
+            # write failure response to the output file so it is logged
+            # TODO: write to different file (txt, not wav) and include note?
+            with open(out_fname, 'wb') as out_file:
+                out_file.write(e.response.content)
+            raise
         with open(out_fname, 'wb') as out_file:
-            for chunk in resp.iter_content(8192):
-                out_file.write(chunk)
-        # raise exception if http request came back with an error; do this only
-        # after writing output so failure response is logged
-        # TODO: write to different file (txt, not wav) and include note in msg?
-        resp.raise_for_status()
+            out_file.write(content)
     elif tts_type == TTS_TYPE_FESTIVAL:
         args = ['festival_client', '--server', ip_addr, '--port', str(port),
                 '--ttw', '--otype', 'wav', '--output', out_fname]
         prolog_fname = None
         if input_type == INPUT_TYPE_TEXT:
             # for plain text input, voice must be specified in prolog file
-            prolog_fname = get_unique_fname('../tmp/festival_prolog', '.wav')
+            prolog_fname = get_unique_fname(TMP_DIR + '/festival_prolog',
+                                            '.wav')
             with open(prolog_fname, 'wb') as prolog_file:
                 prolog_file.write(('(%s)' % voice).encode('utf-8'))
             args.append('--prolog')
@@ -124,7 +332,7 @@ def synthesize(in_str, in_str_is_fname=False, input_type=None, out_fname=None,
         else:
             raise ValueError('given input_type not supported for festivaltts')
 
-        in_fname = get_unique_fname('../tmp/festival_input')
+        in_fname = get_unique_fname(TMP_DIR + '/festival_input')
         with open(in_fname, 'wb') as tmp_file:
             tmp_file.write(in_str.encode('utf-8'))
         args.append(in_fname)
@@ -136,15 +344,81 @@ def synthesize(in_str, in_str_is_fname=False, input_type=None, out_fname=None,
     else:
         raise ValueError('given tts_type not supported')
 
+    if cache:
+        cache.store(cache_key, out_fname)
     return out_fname
 
 
+def synthesize_stream(in_str, input_type=None, out_fname=None, ip_addr=None,
+                      port=None, voice=None, use_cache=True):
+    """synthesizes given string with mary, yielding the audio as it arrives
+
+    unlike with synthesize(), playback can start with the first chunk instead
+    of after the whole response; the complete response is kept in memory and
+    stored in the synthesis cache, which is shared with synthesize(), so no
+    file is written unless out_fname is given
+
+    args:
+        out_fname: file the complete response is written to, if any
+        (for details on other parameters see synthesize(); only marytts is
+        supported)
+
+    yields:
+        chunks of the wav file as bytes, beginning with its header
+
+    raises:
+        see synthesize() (on iteration)
+    """
+    input_type = input_type if input_type else INPUT_TYPE_TEXT
+    if input_type != INPUT_TYPE_TEXT and input_type != INPUT_TYPE_SSML:
+        raise ValueError('given input_type not supported for marytts')
+    voice = voice if voice else DEFAULT_VOICE_MARY
+
+    cache = get_synthesis_cache() if use_cache else None
+    if cache:
+        cache_key = cache.get_key(TTS_TYPE_MARY, voice, input_type, in_str)
+        data = cache.read(cache_key)
+        if data is not None:
+            for i in range(0, len(data), MARY_STREAM_CHUNK_BYTES):
+                yield data[i:i + MARY_STREAM_CHUNK_BYTES]
+            if out_fname:
+                with open(out_fname, 'wb') as out_file:
+                    out_file.write(data)
+            return
+
+    params = {
+        'INPUT_TEXT': in_str,
+        'INPUT_TYPE': input_type,
+        'OUTPUT_TYPE': 'AUDIO',
+        'LOCALE': 'en_US',
+        'AUDIO': 'WAVE_FILE',
+        'VOICE': voice
+    }
+    chunks = []
+    for chunk in post_mary(params, ip_addr, port, stream=True):
+        chunks.append(chunk)
+        yield chunk
+    # only complete responses get here (iteration might be stopped)
+    data = b''.join(chunks)
+    if cache:
+        cache.store_data(cache_key, data)
+    if out_fname:
+        with open(out_fname, 'wb') as out_file:
+            out_file.write(data)
+
+
+@profiling.timed()
 def extract_feature_values(in_fname, extract_intensity=1, extract_pitch=1,
-                           extract_durations=1, extract_jitter_shimmer=1):
-    """runs a praat script to extract a given wav file's feature values
+                           extract_durations=1, extract_jitter_shimmer=1,
+                           backend=None):
+    """measures a given wav file's feature values with praat
 
     args:
-        in_fname: name of the wav file which should be analyzed
+        in_fname: name of the wav file which should be analyzed, or an
+            audio.AudioBuffer; buffers are measured in memory unless the
+            backend is praat, which reads them from a scratch file
+        backend: one of the features.BACKEND_* constants; see
+            get_feature_backend() if none given
 
     returns:
         a dictionary containing several feature values, like intensity_mean
@@ -152,24 +426,31 @@ def extract_feature_values(in_fname, extract_intensity=1, extract_pitch=1,
     raises:
         subprocess.CalledProcessError: script call did not return with code 0
     """
-    tmp_fname = get_unique_fname('../tmp/features', '.txt')
-    subprocess.check_call(['praat', '--run', '../misc/extract_features.praat',
-                           in_fname, tmp_fname, str(extract_intensity),
-                           str(extract_pitch), str(extract_durations),
-                           str(extract_jitter_shimmer)])
-
-    # extract comma-separated key value pairs from output file, then delete it
-    with open(tmp_fname, 'r') as out_file:
-        lines = out_file.readlines()
-        feat_val_dict = {}
-        for line in lines:
-            key, val = line.replace('\n', '').split(',')
-            feat_val_dict[key] = val
-    remove(tmp_fname)
-
-    return feat_val_dict
+    backend = backend if backend else get_feature_backend()
+    if isinstance(in_fname, audio.AudioBuffer):
+        if backend != features.BACKEND_PRAAT:
+            return features.extract_buffer(
+                in_fname, extract_intensity, extract_pitch, extract_durations,
+                extract_jitter_shimmer, backend)
+        with scratch_wav(in_fname) as fname:
+            return features.extract(fname, extract_intensity, extract_pitch,
+                                    extract_durations, extract_jitter_shimmer,
+                                    backend)
+    return features.extract(in_fname, extract_intensity, extract_pitch,
+                            extract_durations, extract_jitter_shimmer, backend)
+
+
+def get_feature_backend():
+    """returns FEATURE_BACKEND, or features.get_default_backend() if it is None
+
+    entry points call this at startup, so a missing parselmouth is warned
+    about before the first measurement
+    """
+    return FEATURE_BACKEND if FEATURE_BACKEND else \
+        features.get_default_backend()
 
 
+@profiling.timed()
 def count_syllables_wav(in_fname):
     """counts number of syllables in a given wav file using autobi
 
@@ -209,17 +490,19 @@ def count_syllables_wav(in_fname):
     return syll_count
 
 
-def count_syllables_text(in_str, ip_addr=None, port=None):
+@profiling.timed()
+def count_syllables_text(in_str, ip_addr=None, port=None, use_cache=True):
     """counts number of syllables in a given string
 
     sends the string to marytts for a phoneme computation and determines the
     number of syllables based on the number of vowels in the response (works
-    only for 'en_US')
+    only for 'en_US'); see count_syllables_texts() for the cache
 
     args:
         in_str: text whose syllable count should be determined
-        ip_addr: ip address of the mary tts server
+        ip_addr: ip address of the mary tts server (see post_mary())
         port: port of the mary tts server
+        use_cache: whether to use (and extend) the syllable cache
 
     returns:
         non-negative integer, estimated number of syllables in the given string
@@ -228,45 +511,188 @@ def count_syllables_text(in_str, ip_addr=None, port=None):
         requests.exceptions.RequestException: the connection failed or the
             server did not return an ok status
     """
-    ip_addr = ip_addr if ip_addr else '127.0.0.1'
-    port = port if port else 59125
+    return count_syllables_texts([in_str], ip_addr, port, use_cache)[0]
+
+
+def count_syllables_texts(in_strs, ip_addr=None, port=None, use_cache=True):
+    """counts number of syllables in each of the given strings
+
+    syllable counts are cached per word (see get_syllable_cache()), so only
+    words that were never counted before are sent to marytts, usually in a
+    single request (see request_word_counts()); texts with words that cannot
+    be aligned with mary's tokens (e.g. numbers, which mary expands) are
+    counted as a whole and cached as such
+
+    args:
+        in_strs: list of texts whose syllable counts should be determined
+        use_cache: whether to use (and extend) the syllable cache; without
+            cache, every text is sent to mary on its own
+        (for details on other parameters see count_syllables_text())
+
+    returns:
+        list of non-negative integers, one per text
+
+    raises:
+        see count_syllables_text()
+    """
+    if not use_cache:
+        return [sum(count for _, count in
+                    parse_phonemes(request_phonemes(in_str, ip_addr, port)))
+                for in_str in in_strs]
+    cache = get_syllable_cache()
+    with _syllable_cache_lock:
+        words = cache['words']
+        texts = cache['texts']
+        unseen = []
+        for in_str in in_strs:
+            if in_str not in texts:
+                unseen.extend(word for word in get_words(in_str)
+                              if word not in words and word not in unseen)
+    new_words = request_word_counts(unseen, ip_addr, port) if unseen else {}
+    syll_counts = []
+    new_texts = {}
+    for in_str in in_strs:
+        with _syllable_cache_lock:
+            syll_count = texts.get(in_str)
+            if syll_count is None:
+                try:
+                    syll_count = sum(
+                        words[word] if word in words else new_words[word]
+                        for word in get_words(in_str))
+                except KeyError:
+                    pass
+        if syll_count is None:
+            # words could not be aligned; fall back to counting the text
+            syll_count = sum(count for _, count in parse_phonemes(
+                request_phonemes(in_str, ip_addr, port)))
+            new_texts[in_str] = syll_count
+        syll_counts.append(syll_count)
+    if new_words or new_texts:
+        update_syllable_cache(new_words, new_texts)
+    return syll_counts
+
+
+def request_word_counts(words, ip_addr=None, port=None):
+    """requests syllable counts of words from marytts, all at once if possible
+
+    mary's tokens are only accepted if they correspond to the requested words
+    one to one; otherwise the words are split around the first one that does
+    not correspond (e.g. a number, which mary expands into several tokens) and
+    the words before it, the word itself and the words after it are requested
+    again, so one such word costs a few more requests rather than the counts
+    of all others
+
+    args:
+        words: list of distinct lowercase words (see get_words())
+        (for details on other parameters see count_syllables_text())
 
-    # send text to mary for phoneme computation
+    returns:
+        dictionary mapping words to syllable counts; words that mary does not
+        keep as a single token are left out
+    """
+    word_counts = {}
+    batches = [words]
+    while batches:
+        batch = batches.pop()
+        tokens = [(text.lower(), count) for text, count in parse_phonemes(
+            request_phonemes(' '.join(batch), ip_addr, port))
+            if WORD_PATTERN.search(text)]
+        if [text for text, _ in tokens] == batch:
+            word_counts.update(tokens)
+        elif len(batch) > 1:
+            # mary changed the word at the first mismatch, or one before it
+            # (if its expansion starts with the word itself); either way, the
+            # changed word ends up in a batch that does not align again
+            index = 0
+            while index < min(len(batch) - 1, len(tokens)) and \
+                    tokens[index][0] == batch[index]:
+                index += 1
+            batches.extend(part for part in [batch[:index], [batch[index]],
+                                             batch[index + 1:]] if part)
+    return word_counts
+
+
+def get_words(in_str):
+    """returns the lowercase words of a text in the order they occur"""
+    return [word.lower() for word in WORD_PATTERN.findall(in_str)]
+
+
+def request_phonemes(in_str, ip_addr=None, port=None):
+    """sends text to marytts for phoneme computation; returns the response"""
     params = {
         'INPUT_TEXT': in_str,
         'INPUT_TYPE': 'TEXT',
         'OUTPUT_TYPE': 'PHONEMES',
         'LOCALE': 'en_US'
     }
-    resp = requests.post('http://%s:%d/process' % (ip_addr, port),
-                         data=params, stream=True)
-    resp_xml = ''
-    for chunk in resp.iter_content(8192):
-        resp_xml += chunk.decode('utf-8')
-    resp.raise_for_status()
-
-    # parse response and count (english) vowels
-    vowels = ['A', 'O', 'u', 'i', '{', 'V', 'E', 'I', 'U', '@', 'r=', 'aU',
-              'OI', '@U', 'EI', 'AI']
-    syll_count = 0
-    dom_tree = xml.dom.minidom.parseString(resp_xml)
-    collection = dom_tree.documentElement
-    tokens = collection.getElementsByTagName('t')
-    for token in tokens:
-        if token.hasAttribute('ph'):
-            ph = token.getAttribute('ph')
-            for phone in ph.split():
-                if phone in vowels:
-                    syll_count += 1
+    return post_mary(params, ip_addr, port)
 
-    return syll_count
+
+def parse_phonemes(resp_xml):
+    """parses a mary PHONEMES response without building a document tree
+
+    args:
+        resp_xml: response content as bytes
+
+    yields:
+        tuples of the text of each token and its number of (english) vowels
+    """
+    for _, element in ElementTree.iterparse(io.BytesIO(resp_xml)):
+        # tags carry the maryxml namespace
+        if element.tag == 't' or element.tag.endswith('}t'):
+            syll_count = sum(1 for phone in element.get('ph', '').split()
+                             if phone in MARY_VOWELS)
+            yield (element.text or '').strip(), syll_count
+            element.clear()
 
 
+def get_syllable_cache():
+    """returns the syllable cache used by count_syllables_texts()
+
+    the cache is a dictionary with the syllable counts of single words
+    ('words') and of texts that could not be split into words ('texts'); it is
+    loaded from SYLLABLE_CACHE_FNAME on first use (if set)
+    """
+    global _syllable_cache
+    with _syllable_cache_lock:
+        if _syllable_cache is None:
+            _syllable_cache = {'words': {}, 'texts': {}}
+            if SYLLABLE_CACHE_FNAME and isfile(SYLLABLE_CACHE_FNAME):
+                with open(SYLLABLE_CACHE_FNAME, 'r') as cache_file:
+                    _syllable_cache.update(json.load(cache_file))
+    return _syllable_cache
+
+
+def update_syllable_cache(new_words, new_texts):
+    """adds syllable counts to the cache and saves it (if a file is set)
+
+    the file is re-read before saving, so counts added by other processes in
+    the meantime are kept
+    """
+    cache = get_syllable_cache()
+    with _syllable_cache_lock:
+        if SYLLABLE_CACHE_FNAME and isfile(SYLLABLE_CACHE_FNAME):
+            with open(SYLLABLE_CACHE_FNAME, 'r') as cache_file:
+                saved = json.load(cache_file)
+            for key in cache:
+                cache[key].update(saved.get(key, {}))
+        cache['words'].update(new_words)
+        cache['texts'].update(new_texts)
+        if SYLLABLE_CACHE_FNAME:
+            tmp_fname = '%s.%d.tmp' % (SYLLABLE_CACHE_FNAME, getpid())
+            with open(tmp_fname, 'w') as cache_file:
+                json.dump(cache, cache_file, sort_keys=True)
+            os.replace(tmp_fname, SYLLABLE_CACHE_FNAME)
+
+
+@profiling.timed()
 def synthesize_with_features(in_str, speech_rate=None, intensity=None,
                              pitch=None, in_str_is_fname=False, out_fname=None,
                              tts_type=None, ip_addr=None, port=None, voice=None,
                              speech_rates_dict=None, repeat_until_close=False,
-                             syll_count=None):
+                             syll_count=None, rate_tolerance=0.05,
+                             pitch_tolerance=1.0, max_iterations=8,
+                             stats=None):
     """generates wav from plain text with given speech rate, intensity and pitch
 
     args:
@@ -280,9 +706,19 @@ def synthesize_with_features(in_str, speech_rate=None, intensity=None,
             function if none given
         repeat_until_close: whether to resynthesize until rate and pitch are as
             close to the requested value as possible (only done if neither is
-            'default' or None)
+            'default' or None); see search_rate_and_pitch()
         syll_count: number of syllables in the input string to be used if
             repeat_until_close is True; estimated internally if None given
+        rate_tolerance: speech rate error (syllables per second) at which the
+            search for a better rate modifier stops; must be positive
+        pitch_tolerance: pitch error (hertz) at which the search stops; must
+            be positive
+        max_iterations: maximum number of synthesis round trips, including the
+            first synthesis
+        stats: optional dictionary; 'iterations' is set to the number of
+            synthesis round trips that were needed; the seconds spent waiting
+            for the tts, measuring candidates and adapting are added to
+            'tts_secs', 'praat_secs' and 'adapt_secs' (see add_time())
         (for details on other parameters see synthesize())
 
     returns and raises:
@@ -296,108 +732,197 @@ def synthesize_with_features(in_str, speech_rate=None, intensity=None,
     if in_str_is_fname:
         with open(in_str, 'r') as in_file:
             in_str = ''.join(in_file.readlines())
-    # store input for later before it is surrounded with markup
-    in_str_orig = in_str
 
     speech_rates_dict = (speech_rates_dict if speech_rates_dict
                          else load_speech_rates_dict())
     pitch = pitch if pitch else 'default'
 
-    # store original target speech rate
-    speech_rate_orig = speech_rate
-    # adjust target speech rate to be within supported (speech_rates_dict) range
-    if speech_rate < 3.0:
-        speech_rate = 3.0
-    elif speech_rate > 8.0:
-        speech_rate = 8.0
-    speech_rate = speech_rate if speech_rate else 'default'
-
     # generate appropriate markup from plain text; only speech rate and pitch
     # are adjusted that way, intensity through praat (this combination is most
     # efficient and accurate)
     if not tts_type or tts_type == TTS_TYPE_MARY:
         input_type = INPUT_TYPE_SSML
         voice = voice if voice else DEFAULT_VOICE_MARY
-        rate_modifier = speech_rate if speech_rate == 'default' else \
-            speech_rates_dict['mary'][voice][str(round(speech_rate, 1))]
+        rates_dict = speech_rates_dict['mary'][voice]
         markup_function = get_ssml
     elif tts_type == TTS_TYPE_FESTIVAL:
         input_type = INPUT_TYPE_SABLE
         voice = voice if voice else DEFAULT_VOICE_MARY
-        rate_modifier = speech_rate if speech_rate == 'default' else \
-            speech_rates_dict['festival'][voice][round(speech_rate, 1)]
+        rates_dict = speech_rates_dict['festival'][voice]
         markup_function = get_sable
     else:
         raise ValueError('given tts_type not supported')
-    in_str = markup_function(in_str, rate_modifier, pitch)
+    rate_modifier = get_rate_modifier(rates_dict, speech_rate) \
+        if speech_rate else 'default'
 
     #############
     # SYNTHESIS #
     #############
-    # basic synthesis with best estimate of necessary rate modifier
-    tmp_fname = synthesize(in_str, False, input_type, None, tts_type,
-                           ip_addr, port, voice)
-
-    if repeat_until_close and speech_rate != 'default' and pitch != 'default':
-        speech_rate = speech_rate_orig
+    def synthesize_candidate(cand_rate_modifier, cand_pitch, cand_fname=None):
+        start = time.perf_counter()
+        try:
+            return synthesize(markup_function(in_str, cand_rate_modifier,
+                                              cand_pitch),
+                              False, input_type, cand_fname, tts_type, ip_addr,
+                              port, voice)
+        finally:
+            add_time(stats, 'tts_secs', start)
+
+    if repeat_until_close and speech_rate and pitch != 'default':
         # estimate number of syllables if not given
         syll_count = syll_count if syll_count else count_syllables_text(in_str)
+        tmp_fname, iterations = search_rate_and_pitch(
+            synthesize_candidate, rates_dict, syll_count, speech_rate,
+            float(pitch[:-2]), rate_tolerance, pitch_tolerance, max_iterations,
+            stats)
+    else:
+        # basic synthesis with best estimate of necessary rate modifier
+        tmp_fname = synthesize_candidate(rate_modifier, pitch)
+        iterations = 1
+    if stats is not None:
+        stats['iterations'] = iterations
 
-        feat_val_dict = extract_feature_values(tmp_fname, 0, 1, 1, 0)
-        act_speech_rate = syll_count / float(feat_val_dict['main_duration'])
-        act_pitch = float(feat_val_dict['pitch_mean'])
-        best_rate = [rate_modifier, abs(speech_rate - act_speech_rate)]
-        pct = int(rate_modifier[:-1])
-        tgt_pitch = float(pitch[:-2])
-        best_pitch = [pitch, abs(tgt_pitch - act_pitch)]
-        while True:
-            pct += 1 if speech_rate > act_speech_rate else -1
-            rate_modifier = '+%d%%' % pct if pct >= 0 else '-%d%%' % pct
-            # request pitch as much higher or lower as it was off by before
-            pitch = str(float(pitch[:-2]) + tgt_pitch - act_pitch) + 'Hz'
-            in_str = markup_function(in_str_orig, rate_modifier, pitch)
-            synthesize(in_str, False, input_type, tmp_fname, tts_type,
-                       ip_addr, port, voice)
-            feat_val_dict = extract_feature_values(tmp_fname, 0, 1, 1, 0)
-            act_speech_rate = syll_count / float(feat_val_dict['main_duration'])
-            act_pitch = float(feat_val_dict['pitch_mean'])
-
-            if abs(tgt_pitch - act_pitch) < best_pitch[1]:
-                best_pitch[0] = pitch
-                best_pitch[1] = abs(tgt_pitch - act_pitch)
-            if abs(speech_rate - act_speech_rate) > best_rate[1]:
-                # rate is as close as possible, now optimize pitch as well
-                while True:
-                    pitch = str(float(pitch[:-2]) + tgt_pitch - act_pitch) + \
-                            'Hz'
-                    in_str = markup_function(in_str_orig, best_rate[0], pitch)
-                    synthesize(in_str, False, input_type, tmp_fname, tts_type,
-                               ip_addr, port, voice)
-                    act_pitch = float(extract_feature_values(
-                        tmp_fname, 0, 1, 0, 0)['pitch_mean'])
-                    if abs(tgt_pitch - act_pitch) > best_pitch[1]:
-                        break
-                    else:
-                        best_pitch[0] = pitch
-                        best_pitch[1] = abs(tgt_pitch - act_pitch)
-                break
-            else:
-                best_rate[0] = rate_modifier
-                best_rate[1] = abs(speech_rate - act_speech_rate)
-        if not tts_type or tts_type == TTS_TYPE_MARY:
-            in_str = get_ssml(in_str_orig, best_rate[0], best_pitch[0])
-        else:  # tts_type == TTS_TYPE_FESTIVAL
-            in_str = get_sable(in_str_orig, best_rate[0], best_pitch[0])
-        synthesize(in_str, False, input_type, tmp_fname, tts_type,
-                   ip_addr, port, voice)
     out_fname = out_fname if out_fname \
-        else get_unique_fname('../tmp/synthesis_final', '.wav')
+        else get_unique_fname(TMP_DIR + '/synthesis_final', '.wav')
 
+    start = time.perf_counter()
     adapt_wav(tmp_fname, out_fname, intensity=intensity)
+    add_time(stats, 'adapt_secs', start)
     remove(tmp_fname)
     return out_fname
 
 
+def add_time(stats, key, start):
+    """adds the seconds since start (a time.perf_counter() value) to
+    stats[key]; does nothing if stats is None"""
+    if stats is not None:
+        stats[key] = stats.get(key, 0.0) + time.perf_counter() - start
+
+
+def get_rate_modifier(rates_dict, speech_rate):
+    """returns best rate modifier for a target rate from the inverse rates dict
+
+    args:
+        rates_dict: [target_rate] level of load_speech_rates_dict() for one tts
+            and voice
+        speech_rate: target speech rate; moved into the supported range of
+            3.0 to 8.0 syllables per second
+    """
+    speech_rate = min(max(speech_rate, 3.0), 8.0)
+    return rates_dict['%.1f' % speech_rate]
+
+
+def search_rate_and_pitch(synthesize_candidate, rates_dict, syll_count,
+                          speech_rate, pitch, rate_tolerance=0.05,
+                          pitch_tolerance=1.0, max_iterations=8, stats=None):
+    """searches rate modifier and pitch request that realize given targets
+
+    the rate modifier (in percent) is searched with the secant method, seeded
+    from the inverse speech rates dict; once candidates above and below the
+    target rate are known, steps stay inside that bracket (regula falsi). with
+    every step, the requested pitch is corrected by the last pitch error. each
+    candidate is synthesized into its own file, so the best one never needs to
+    be synthesized again
+
+    args:
+        synthesize_candidate: function synthesizing given rate modifier and
+            pitch request into a new file; returns the file name
+        rates_dict: see get_rate_modifier()
+        syll_count: number of syllables in the synthesized text
+        speech_rate: target speech rate in syllables per second
+        pitch: target pitch in hertz
+        rate_tolerance, pitch_tolerance, max_iterations: see
+            synthesize_with_features()
+        stats: optional dictionary; measuring time is added to 'praat_secs'
+
+    returns:
+        tuple of the file name of the best candidate and the number of
+        synthesis round trips
+
+    raises:
+        ValueError: a tolerance is not positive (errors are measured in
+            multiples of the tolerances)
+    """
+    if rate_tolerance <= 0 or pitch_tolerance <= 0:
+        raise ValueError('rate_tolerance and pitch_tolerance must be positive')
+    pct = int(get_rate_modifier(rates_dict, speech_rate)[:-1])
+    pitch_req = pitch
+    # measured candidates as (percent, speech rate, pitch, file name)
+    tried = []
+    best = None
+    best_err = None
+    below = None  # closest candidate with a rate below the target
+    above = None  # closest candidate with a rate above the target
+    while True:
+        fname = synthesize_candidate('%+d%%' % pct, '%.2fHz' % pitch_req)
+        start = time.perf_counter()
+        feat_val_dict = extract_feature_values(fname, 0, 1, 1, 0)
+        add_time(stats, 'praat_secs', start)
+        act_rate = syll_count / float(feat_val_dict['main_duration'])
+        act_pitch = float(feat_val_dict['pitch_mean'])
+        tried.append((pct, act_rate, act_pitch, fname))
+
+        # keep the file of the best candidate so far (errors in tolerances)
+        rate_err = abs(speech_rate - act_rate)
+        pitch_err = abs(pitch - act_pitch)
+        err = max(rate_err / rate_tolerance, pitch_err / pitch_tolerance)
+        if best is None or err < best_err:
+            if best is not None:
+                remove(best[3])
+            best = tried[-1]
+            best_err = err
+        else:
+            remove(fname)
+        if err <= 1.0 or len(tried) >= max_iterations:
+            break
+
+        # next rate modifier
+        if act_rate < speech_rate:
+            below = tried[-1] if below is None or act_rate > below[1] \
+                else below
+        else:
+            above = tried[-1] if above is None or act_rate < above[1] \
+                else above
+        if len(tried) == 1:
+            # no slope known yet; ask the dict for the rate that would have
+            # compensated the error
+            next_pct = int(get_rate_modifier(
+                rates_dict, 2 * speech_rate - act_rate)[:-1])
+        elif below and above:
+            # regula falsi inside the bracket
+            next_pct = below[0] + (speech_rate - below[1]) * \
+                (above[0] - below[0]) / (above[1] - below[1])
+        else:
+            # secant through the last two candidates with different rates
+            prev = tried[-2]
+            if act_rate != prev[1]:
+                next_pct = pct + (speech_rate - act_rate) * \
+                    (pct - prev[0]) / (act_rate - prev[1])
+            else:
+                next_pct = pct + (1 if speech_rate > act_rate else -1)
+        next_pct = int(round(next_pct))
+        bracket_closed = False
+        if below and above:
+            lower = min(below[0], above[0])
+            upper = max(below[0], above[0])
+            next_pct = min(max(next_pct, lower), upper)
+            # no integer modifier between neighbors can improve the rate
+            bracket_closed = upper - lower <= 1
+        if rate_err <= rate_tolerance:
+            # rate is close enough already; only correct the pitch
+            next_pct = pct
+        elif bracket_closed:
+            next_pct = best[0]
+        elif next_pct == pct:
+            next_pct += 1 if speech_rate > act_rate else -1
+        pct = next_pct
+
+        # request pitch as much higher or lower as it was off by before
+        pitch_req += pitch - act_pitch
+    return best[3], len(tried)
+
+
+@profiling.timed()
 def adapt_wav(in_fname, out_fname, syll_count=None, speech_rate=None,
               intensity=None, pitch=None):
     """runs praat script to adapt given wav's speech rate, intensity, pitch
@@ -437,26 +962,10 @@ def synthesize_alike(in_str, in_fname, in_str_is_fname=False,
     returns and raises:
         see synthesize()
     """
-    syllable_count = 0
-    feat_val_dict = {}
-
-    def thread_extract_syllables_text(input_str):
-        nonlocal syllable_count
-        syllable_count = count_syllables_text(input_str)
-
-    def thread_extract_feature_values(input_fname):
-        nonlocal feat_val_dict
-        feat_val_dict = extract_feature_values(input_fname)
-
-    thread1 = threading.Thread(target=thread_extract_syllables_text,
-                               args=(in_str,))
-    thread1.start()
-    thread2 = threading.Thread(target=thread_extract_feature_values,
-                               args=(in_fname,))
-    thread2.start()
-
-    thread1.join()
-    thread2.join()
+    # count syllables and measure the wav concurrently
+    syllable_count, feat_val_dict = run_coroutine(gather_async(
+        count_syllables_text_async(in_str, ip_addr, port),
+        extract_feature_values_async(in_fname, 1, 1, 1, 0)))
 
     out_fname = synthesize_with_features(
         in_str, syllable_count / float(feat_val_dict['speech_duration']),
@@ -465,6 +974,7 @@ def synthesize_alike(in_str, in_fname, in_str_is_fname=False,
     return out_fname
 
 
+@profiling.timed()
 def transcribe_wav(in_fname):
     """generates transcription of a given wav file
 
@@ -474,23 +984,99 @@ def transcribe_wav(in_fname):
     returns:
         transcription of the wav file
     """
-    tmp_fname1 = get_unique_fname('../tmp/extended', '.wav')
-    tmp_fname2 = get_unique_fname('../tmp/transcribe', '.log')
+    return transcribe_buffer(audio.AudioBuffer.from_wav(in_fname))
 
-    # prepend some silence (first bit of speech might else be treated as noise)
-    subprocess.check_call(['praat', '--run', '../misc/prepend_silence.praat',
-                           in_fname, tmp_fname1])
 
-    # run pocketsphinx (printing to log so only transcript is written to stdout)
-    comp_proc = subprocess.run(
-        ['pocketsphinx_continuous',
-         '-infile', tmp_fname1, '-logfn', tmp_fname2],
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+def transcribe_buffer(buffer):
+    """generates transcription of audio in memory
+
+    args:
+        buffer: audio.AudioBuffer with 16 kHz speech
+
+    returns:
+        transcription of the audio
+    """
+    return recognize_buffer(buffer).text
+
 
-    remove(tmp_fname1)
-    remove(tmp_fname2)
+@profiling.timed()
+def recognize_buffer(buffer, decoder=None):
+    """transcribes audio in memory, with word timings if the decoder has them
 
-    return comp_proc.stdout.decode("utf-8").replace('\n', '').replace('\r', '')
+    persistent decoders keep their models loaded in a server process (see
+    asr.get_client()); asr.DECODER_CONTINUOUS instead starts a new
+    pocketsphinx_continuous process, which can only read files, so the audio is
+    passed through a scratch file (see scratch_wav())
+
+    args:
+        buffer: audio.AudioBuffer with 16 kHz speech
+        decoder: one of the asr.DECODER_* constants; ASR_DECODER if None
+
+    returns:
+        asr.Transcription; word timings are relative to the start of buffer,
+        words is None for asr.DECODER_CONTINUOUS
+
+    raises:
+        subprocess.CalledProcessError: the decoder process failed
+        RuntimeError: a persistent decoder failed on the given audio
+    """
+    decoder = decoder if decoder else ASR_DECODER
+    decoder = decoder if decoder else asr.get_default_decoder()
+    # prepend some silence (first bit of speech might else be treated as noise)
+    silence_secs = 0.05
+    buffer = buffer.prepend_silence(silence_secs)
+
+    if decoder != asr.DECODER_CONTINUOUS:
+        transcription = asr.get_client(decoder, ASR_CONFIG).transcribe(buffer)
+        return asr.Transcription(transcription.text, [
+            asr.Word(word.word, max(word.start - silence_secs, 0.0),
+                     max(word.end - silence_secs, 0.0))
+            for word in transcription.words])
+
+    with scratch_wav(buffer) as fname:
+        # run pocketsphinx (discarding the log so only transcript is written
+        # to stdout)
+        comp_proc = subprocess.run(
+            ['pocketsphinx_continuous', '-infile', fname, '-logfn', os.devnull],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return asr.Transcription(
+        comp_proc.stdout.decode("utf-8").replace('\n', '').replace('\r', ''),
+        None)
+
+
+def start_asr(decoder=None):
+    """starts the persistent decoder of recognize_buffer(), if it uses one, so
+    its models are loaded before the first request; see recognize_buffer()"""
+    decoder = decoder if decoder else ASR_DECODER
+    decoder = decoder if decoder else asr.get_default_decoder()
+    if decoder != asr.DECODER_CONTINUOUS:
+        asr.get_client(decoder, ASR_CONFIG).start()
+
+
+def get_scratch_dir():
+    """returns SCRATCH_DIR if it exists, else TMP_DIR"""
+    if SCRATCH_DIR and os.path.isdir(SCRATCH_DIR):
+        return SCRATCH_DIR
+    return TMP_DIR
+
+
+@contextlib.contextmanager
+def scratch_wav(buffer):
+    """writes an audio buffer to a wav file in the scratch directory that
+    exists for the duration of a with block
+
+    args:
+        buffer: audio.AudioBuffer to write
+
+    yields:
+        name of the wav file
+    """
+    fname = get_unique_fname(get_scratch_dir() + '/scratch', '.wav')
+    buffer.write_wav(fname)
+    try:
+        yield fname
+    finally:
+        remove(fname)
 
 
 def get_ssml(in_str, rate='default', pitch='default', volume='default'):
@@ -590,25 +1176,123 @@ def detect_tts_speech_rate(tts_type, voice, rate_modifier,
     returns:
         mean speech rate and standard deviation, in syllables per second
     """
-    syll_rates = []
-    corpus = load_syllable_count_corpus()
-    # synthesize every line in the corpus, measuring the speech rate for each
-    for line in corpus:
+    return run_coroutine(detect_tts_speech_rate_async(
+        tts_type, voice, rate_modifier, ip_addr, port))
+
+
+####################
+# ASYNCHRONOUS API #
+####################
+# the functions below are awaitable versions of the blocking functions above;
+# requests are run concurrently, at most ASYNC_CONCURRENCY at a time per loop
+ASYNC_CONCURRENCY = 8
+_async_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_async_semaphore():
+    """returns the semaphore bounding concurrent requests in the running loop"""
+    loop = asyncio.get_running_loop()
+    if loop not in _async_semaphores:
+        _async_semaphores[loop] = asyncio.Semaphore(ASYNC_CONCURRENCY)
+    return _async_semaphores[loop]
+
+
+def run_coroutine(coroutine):
+    """runs a coroutine to completion from blocking code and returns its result
+
+    asyncio.run() fails if an event loop is already running in this thread
+    (e.g. when a blocking function of this module is called from a coroutine
+    or a notebook); the coroutine then runs in a new loop on a worker thread
+    while this thread waits. coroutines should rather await the *_async
+    functions, as waiting blocks their loop
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+async def gather_async(*aws):
+    """returns results of given awaitables, run concurrently (asyncio.gather)
+    """
+    return await asyncio.gather(*aws)
+
+
+async def run_blocking_async(function, *args, **kwargs):
+    """runs a blocking function in the default thread pool, bounded by the
+    semaphore (see get_async_semaphore())"""
+    async with get_async_semaphore():
+        return await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(function, *args, **kwargs))
+
+
+async def synthesize_async(*args, **kwargs):
+    """awaitable version of synthesize(); same args, returns and raises"""
+    return await run_blocking_async(synthesize, *args, **kwargs)
+
+
+async def count_syllables_text_async(in_str, ip_addr=None, port=None):
+    """awaitable version of count_syllables_text(); same args and returns"""
+    return await run_blocking_async(count_syllables_text, in_str, ip_addr,
+                                    port)
+
+
+async def extract_feature_values_async(in_fname, extract_intensity=1,
+                                       extract_pitch=1, extract_durations=1,
+                                       extract_jitter_shimmer=1, backend=None):
+    """awaitable version of extract_feature_values(); same args and returns
+
+    the praat backend runs as an asyncio subprocess on files; in-process
+    backends and audio buffers run in the default thread pool
+    """
+    backend = backend if backend else get_feature_backend()
+    if backend != features.BACKEND_PRAAT or \
+            isinstance(in_fname, audio.AudioBuffer):
+        return await run_blocking_async(
+            extract_feature_values, in_fname, extract_intensity,
+            extract_pitch, extract_durations, extract_jitter_shimmer, backend)
+    args = features.get_praat_args(in_fname, extract_intensity, extract_pitch,
+                                   extract_durations, extract_jitter_shimmer)
+    async with get_async_semaphore():
+        with profiling.timer('remote_tts.extract_feature_values'):
+            proc = await asyncio.create_subprocess_exec(
+                *args, stdout=asyncio.subprocess.PIPE)
+            stdout, _ = await proc.communicate()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, args)
+    return features.parse_praat_output(stdout.decode('utf-8'))
+
+
+async def detect_tts_speech_rate_async(tts_type, voice, rate_modifier,
+                                       ip_addr=None, port=None):
+    """awaitable version of detect_tts_speech_rate(); corpus lines are
+    synthesized and measured concurrently; same args and returns"""
+    async def measure_line(syll_count, text):
         if tts_type == TTS_TYPE_MARY:
-            in_str = get_ssml(line[1], rate_modifier)
+            in_str = get_ssml(text, rate_modifier)
             input_type = INPUT_TYPE_SSML
         else:
-            in_str = get_sable(line[1], rate_modifier)
+            in_str = get_sable(text, rate_modifier)
             input_type = INPUT_TYPE_SABLE
-        out_fname = get_unique_fname('../tmp/speech_rate', '.wav')
+        out_fname = get_unique_fname(TMP_DIR + '/speech_rate', '.wav')
         try:
-            synthesize(in_str, False, input_type, out_fname, tts_type,
-                       ip_addr, port, voice)
+            await synthesize_async(in_str, False, input_type, out_fname,
+                                   tts_type, ip_addr, port, voice)
+            # 'main_duration' counts everything except silence at the end
+            feat_val_dict = await extract_feature_values_async(
+                out_fname, 0, 0, 1, 0)
         except requests.exceptions.HTTPError:
-            continue
-        # 'main_duration' counts everything except silence at the end
-        duration = float(extract_feature_values(out_fname, 0, 0, 1, 0)
-                         ['main_duration'])
-        syll_rates.append(line[0]/duration)
-        remove(out_fname)
+            return None
+        finally:
+            if isfile(out_fname):
+                remove(out_fname)
+        return syll_count / float(feat_val_dict['main_duration'])
+
+    # synthesize every line in the corpus, measuring the speech rate for each
+    syll_rates = await asyncio.gather(
+        *[measure_line(line[0], line[1])
+          for line in load_syllable_count_corpus()])
+    syll_rates = [rate for rate in syll_rates if rate is not None]
     return sum(syll_rates) / len(syll_rates), numpy.std(syll_rates)
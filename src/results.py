@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+import numpy
+
+"""
+This module stores per-turn results of switchboard runs (target and actual
+feature values, synthesis iterations and time spent per stage) as JSON Lines:
+one record per synthesized turn and line. Records are only ever appended, in a
+single write per batch, so several threads and processes can add to the same
+file at once. load() turns a results file into one numpy array per field.
+"""
+
+# fields of a turn record in the order they are written; loaders accept
+# records with missing or additional fields
+FIELDS = ['id', 'turn', 'syllables',
+          'p_tgt', 'p_act', 'r_tgt', 'r_act', 'i_tgt', 'i_act',
+          'duration', 'iterations',
+          'tts_secs', 'praat_secs', 'adapt_secs', 'splice_secs']
+# fields that are not numeric
+TEXT_FIELDS = ['id']
+
+
+class ResultsWriter(object):
+    """appends turn records to a JSON Lines file
+
+    every call of append() issues a single write on a file opened in append
+    mode, which the operating system does not interleave with writes of other
+    processes; a lock additionally serializes threads of this process
+
+    attributes:
+        fname: name of the results file
+    """
+
+    def __init__(self, fname):
+        """constructor; the file is created on the first append()"""
+        self.fname = fname
+        self._lock = threading.Lock()
+
+    def append(self, records):
+        """appends records (dictionaries with keys from FIELDS) to the file"""
+        if not records:
+            return
+        data = ''.join(json.dumps(record, sort_keys=True) + '\n'
+                       for record in records).encode('utf-8')
+        with self._lock:
+            fd = os.open(self.fname, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                         0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+
+
+def read_records(fname):
+    """reads all records from a results file
+
+    args:
+        fname: name of the results file
+
+    returns:
+        list of record dictionaries in file order; a last line that is
+        incomplete (e.g. the writing process was killed) is skipped
+    """
+    records = []
+    with open(fname, 'r') as results_file:
+        for line in results_file:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def load(fname, fields=None):
+    """loads a results file into columns for analysis
+
+    args:
+        fname: name of the results file
+        fields: fields to load; all of FIELDS plus any others found if None
+
+    returns:
+        dictionary mapping each field to a numpy array with one element per
+        record; numeric fields are float arrays (nan where a record lacks the
+        field), text fields are string arrays
+    """
+    records = read_records(fname)
+    if fields is None:
+        fields = list(FIELDS)
+        for record in records:
+            fields.extend(key for key in record if key not in fields)
+    columns = {}
+    for field in fields:
+        if field in TEXT_FIELDS:
+            columns[field] = numpy.array(
+                [str(record.get(field, '')) for record in records])
+        else:
+            columns[field] = numpy.array(
+                [record.get(field, numpy.nan) for record in records],
+                dtype=numpy.float64)
+    return columns
@@ -0,0 +1,224 @@
+import switchboard
+import transcript
+import json
+import numpy
+
+"""
+This module simulates the entrainment of switchboard.generate_conversation()
+without synthesis: transcripts are replayed through the entrainers only and the
+realized output values are drawn from an error model instead of being measured
+on synthesized audio. The result is a log in the format of features.log, so
+configurations (see misc/switchboard/config.json) can be compared within
+milliseconds before spending hours on synthesis.
+"""
+
+# order of the features in all arrays of this module (see
+# switchboard.create_batch_entrainer())
+FEATURES = ['pitch', 'rate', 'intensity']
+# prefixes of the features in the log
+LOG_PREFIXES = ['p', 'r', 'i']
+
+
+class NoErrorModel(object):
+    """error model of a tts that realizes every target value exactly"""
+
+    def realize(self, targets, rng):
+        """returns the realized values for given targets
+
+        args:
+            targets: numpy array of target values; the last axis holds pitch,
+                rate and intensity (see FEATURES)
+            rng: numpy.random.Generator to draw errors from
+
+        returns:
+            numpy array of realized values of the same shape as targets
+        """
+        return numpy.array(targets, dtype=numpy.float64)
+
+
+class GaussianErrorModel(NoErrorModel):
+    """error model adding normally distributed errors to the target values
+
+    attributes:
+        means: numpy array of the mean error (actual - target) per feature
+        stds: numpy array of the standard deviation of the error per feature
+    """
+
+    def __init__(self, means, stds):
+        """constructor; means and stds are sequences in FEATURES order"""
+        self.means = numpy.array(means, dtype=numpy.float64)
+        self.stds = numpy.array(stds, dtype=numpy.float64)
+
+    def __str__(self):
+        """returns string representation of the error parameters"""
+        return ' '.join('%s: %.3f +- %.3f' % (feature, mean, std)
+                        for feature, mean, std
+                        in zip(FEATURES, self.means, self.stds))
+
+    @classmethod
+    def fit(cls, log_fname):
+        """estimates the error distribution from a features.log
+
+        args:
+            log_fname: name of a log written by switchboard.main()
+
+        returns:
+            GaussianErrorModel with mean and standard deviation of the
+            differences between all _act and _tgt values per feature
+        """
+        errors = [[] for _ in FEATURES]
+        for block in read_log(log_fname):
+            for i, prefix in enumerate(LOG_PREFIXES):
+                tgt = block.get(prefix + '_tgt', [])
+                act = block.get(prefix + '_act', [])
+                errors[i].extend(a - t for t, a in zip(tgt, act))
+        means = [numpy.mean(errs) if errs else 0.0 for errs in errors]
+        stds = [numpy.std(errs) if errs else 0.0 for errs in errors]
+        return cls(means, stds)
+
+    def realize(self, targets, rng):
+        """returns targets plus random errors; see NoErrorModel.realize()"""
+        targets = numpy.asarray(targets, dtype=numpy.float64)
+        return targets + rng.normal(self.means, self.stds, targets.shape)
+
+
+def read_log(log_fname):
+    """reads a log in the format of features.log
+
+    args:
+        log_fname: name of the log file
+
+    returns:
+        list of dictionaries, one per block, mapping the line prefixes of
+        target and actual values (e.g. 'p_tgt') to lists of floats and all
+        other prefixes (e.g. 'id') to strings
+    """
+    blocks = []
+    block = None
+    with open(log_fname, 'r') as log_file:
+        for line in log_file:
+            if ':' not in line:
+                continue
+            key, values = line.split(':', 1)
+            if key == 'id':
+                block = {'id': values.strip()}
+                blocks.append(block)
+            elif block is not None and key.endswith(('_tgt', '_act')):
+                block[key] = [float(value) for value in values.split()]
+            elif block is not None:
+                # configurations and other annotations (e.g. 'cfg: custom')
+                block[key] = values.strip()
+    return blocks
+
+
+def simulate_turns(trans_fname, entrainer, error_model, rng):
+    """replays a transcript through an entrainer, realizing its proposals with
+    an error model
+
+    args:
+        trans_fname: name of the file containing annotated transcription (same
+            format as for switchboard.generate_conversation())
+        entrainer: entrainer.BatchEntrainer whose last axis holds pitch, rate
+            and intensity (see switchboard.create_batch_entrainer())
+        error_model: object with a realize() method, see NoErrorModel
+        rng: numpy.random.Generator passed to the error model
+
+    returns:
+        tuple of two numpy arrays of target and realized values with the
+        synthesized turns along the first axis, followed by the entrainer's axes
+
+    raises:
+        ValueError: the transcription is malformed; see transcript.iter_turns()
+    """
+    targets = []
+    actuals = []
+    for turn in transcript.iter_turns(trans_fname):
+        if isinstance(turn, transcript.HumanTurn):
+            # register values in the same way and order as
+            # generate_conversation() (pitch, rate, intensity)
+            entrainer.register_input(
+                [turn.pitch, turn.speech_rate, turn.intensity], turn.duration)
+        elif isinstance(turn, transcript.SynthTurn):
+            # realized values replace measurements
+            target = entrainer.propose_output()
+            actual = error_model.realize(target, rng)
+            entrainer.register_output(actual, 1)
+            targets.append(target)
+            actuals.append(actual)
+    shape = (len(targets),) + entrainer.def_val.shape
+    return (numpy.array(targets).reshape(shape),
+            numpy.array(actuals).reshape(shape))
+
+
+def format_log(inst_id, entrainers, targets, actuals):
+    """returns a log block like the one of switchboard.generate_instance()
+
+    args:
+        inst_id: id of the instance, including the part letter
+        entrainers: pitch, rate and intensity entrainer.Entrainer instances as
+            configured (only used for their string representation)
+        targets: numpy array of target values of shape (turns, 3)
+        actuals: numpy array of realized values of shape (turns, 3)
+    """
+    out_str = 'id: ' + inst_id + '\n'
+    for prefix, entr in zip(LOG_PREFIXES, entrainers):
+        out_str += prefix + '_cfg: ' + str(entr) + '\n'
+    for i, prefix in enumerate(LOG_PREFIXES):
+        out_str += (prefix + '_tgt: ' +
+                    ' '.join('%.2f' % val for val in targets[:, i]) + '\n' +
+                    prefix + '_act: ' +
+                    ' '.join('%.2f' % val for val in actuals[:, i]) + '\n')
+    return out_str
+
+
+def simulate_grid(instances, error_model=None, parts=(1, 2),
+                  trans_pattern='../misc/switchboard/part%d.text', seed=0):
+    """simulates many config.json instances at once
+
+    all instances are run through a single entrainer.BatchEntrainer, which
+    proposes the same values as separate entrainer.Entrainer instances
+
+    args:
+        instances: list of dictionaries of instances in config.json
+        error_model: see simulate_turns(); no errors if None
+        parts: numbers of the transcript parts to simulate
+        trans_pattern: file name of the transcripts with a placeholder for the
+            part number
+        seed: seed of the random number generator (one per part)
+
+    returns:
+        log string for all instances and parts in the format of features.log
+    """
+    error_model = error_model if error_model else NoErrorModel()
+    blocks = {}
+    for part in parts:
+        rng = numpy.random.default_rng([seed, part])
+        batch_entrainer = switchboard.create_batch_entrainer(instances)
+        targets, actuals = simulate_turns(
+            trans_pattern % part, batch_entrainer, error_model, rng)
+        for i, instance in enumerate(instances):
+            blocks[(i, part)] = format_log(
+                instance['id'] + chr(64 + part),
+                switchboard.create_entrainers(instance),
+                targets[:, i], actuals[:, i])
+    # same order as switchboard.main()
+    return ''.join(blocks[(i, part)] + '\n'
+                   for i in range(len(instances)) for part in parts)
+
+
+def main(config_fname='../misc/switchboard/config.json',
+         log_fname='../misc/switchboard/features.log',
+         out_fname='../tmp/simulated_features.log', seed=0):
+    """simulates all config.json conditions with errors fitted to a real log"""
+    with open(config_fname, 'r') as json_file:
+        conditions = json.load(json_file)
+    error_model = GaussianErrorModel.fit(log_fname)
+    print(error_model)
+    instances = [instance for condition in conditions
+                 for instance in condition]
+    with open(out_fname, 'w') as out_file:
+        out_file.write(simulate_grid(instances, error_model, seed=seed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+import audio
+import io
+import re
+import threading
+import time
+import urllib.parse
+import xml.sax.saxutils
+import zlib
+import numpy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+"""
+This module contains a local stand-in for the /process endpoint of a marytts
+server, so code using remote_tts can run and be load-tested without a tts
+installation (e.g. benchmarks). It answers OUTPUT_TYPE=AUDIO and PHONEMES.
+
+Audio is not speech but a sequence of harmonic "syllables" (one per vowel group
+of the text). Speech rate and pitch follow the prosody element of ssml as
+produced by remote_tts.get_ssml(), starting from a base rate and pitch per
+voice, so rate modifiers and pitch requests have the expected effect on the
+measured features. Output is deterministic: the same request always results in
+the same audio. Latency (fixed and per second of generated audio) and the
+number of requests processed at once can be configured to mimic a real server.
+"""
+
+# base speech rate (syllables per second) and pitch (hertz) per voice
+VOICES = {'cmu-bdl-hsmm': (5.1, 105.0),
+          'cmu-rms-hsmm': (4.2, 95.0),
+          'cmu-slt-hsmm': (5.1, 175.0)}
+DEFAULT_VOICE = (5.0, 120.0)
+# exponent of the rate change for relative modifiers; like mary, a change of x
+# percent changes the measured rate by less than x percent
+RATE_EXPONENT = 0.7
+# named values of ssml prosody
+RATE_NAMES = {'x-slow': 0.5, 'slow': 0.75, 'medium': 1.0, 'default': 1.0,
+              'fast': 1.25, 'x-fast': 1.5}
+PITCH_NAMES = {'x-low': 0.7, 'low': 0.85, 'medium': 1.0, 'default': 1.0,
+               'high': 1.15, 'x-high': 1.3}
+# share of each syllable that is voiced; the rest is a short pause
+VOICED_SHARE = 0.75
+LEADING_SECS = 0.05
+TRAILING_SECS = 0.2
+
+# groups of vowel letters, each counted as one syllable
+VOWEL_GROUP_PATTERN = re.compile(r'[aeiouy]+', re.IGNORECASE)
+PROSODY_PATTERN = re.compile(r'<prosody\b([^>]*)>', re.IGNORECASE)
+ATTRIBUTE_PATTERN = re.compile(r'(\w+)\s*=\s*"([^"]*)"')
+# vowels written into the phoneme output, in turn
+PHONEME_VOWELS = ['A', 'i', '@', 'E', 'I', 'u', 'V', 'O']
+
+
+def get_text(in_str):
+    """returns the plain text of a mary request (markup is removed)"""
+    return re.sub(r'<[^>]*>', ' ', in_str)
+
+
+def get_prosody(in_str):
+    """returns the rate and pitch attributes of the first prosody element of a
+    request (None for attributes that are not given)"""
+    match = PROSODY_PATTERN.search(in_str)
+    if not match:
+        return None, None
+    attributes = dict(ATTRIBUTE_PATTERN.findall(match.group(1)))
+    return attributes.get('rate'), attributes.get('pitch')
+
+
+def parse_rate(rate, base_rate):
+    """returns the speech rate in syllables per second for an ssml rate value
+
+    args:
+        rate: ssml value like '+20%', '-15%', '1.2', 'fast' or None
+        base_rate: rate of the voice without modification
+    """
+    rate = rate.strip() if rate else 'default'
+    if rate in RATE_NAMES:
+        return base_rate * RATE_NAMES[rate]
+    try:
+        if rate.endswith('%'):
+            factor = 1 + float(rate[:-1]) / 100
+        else:
+            factor = float(rate)
+    except ValueError:
+        return base_rate
+    return base_rate * max(factor, 0.1) ** RATE_EXPONENT
+
+
+def parse_pitch(pitch, base_pitch):
+    """returns the pitch in hertz for an ssml pitch value
+
+    args:
+        pitch: ssml value like '120Hz', '+10Hz', '-20%', '+2st', 'high' or
+            None
+        base_pitch: pitch of the voice without modification
+    """
+    pitch = pitch.strip() if pitch else 'default'
+    if pitch in PITCH_NAMES:
+        return base_pitch * PITCH_NAMES[pitch]
+    try:
+        if pitch.endswith('%'):
+            return base_pitch * max(1 + float(pitch[:-1]) / 100, 0.1)
+        if pitch.lower().endswith('hz'):
+            value = float(pitch[:-2])
+            if pitch[0] in '+-':
+                return max(base_pitch + value, 20.0)
+            return max(value, 20.0)
+        if pitch.lower().endswith('st'):
+            return base_pitch * 2 ** (float(pitch[:-2]) / 12)
+    except ValueError:
+        pass
+    return base_pitch
+
+
+def count_syllables_word(word):
+    """estimates the number of syllables of a word from its vowel groups"""
+    if not re.search(r'\w', word):
+        return 0
+    return max(len(VOWEL_GROUP_PATTERN.findall(word)), 1)
+
+
+def generate_audio(syll_count, speech_rate, pitch, seed=0,
+                   rate=audio.DEFAULT_RATE):
+    """generates deterministic speech-like audio
+
+    every syllable is a harmonic tone with a smooth envelope followed by a
+    pause; durations, loudness and pitch vary slightly from syllable to
+    syllable, and pitch declines over the utterance, but the mean speech rate
+    (excluding trailing silence) and the mean pitch match the given ones
+
+    args:
+        syll_count: number of syllables
+        speech_rate: syllables per second
+        pitch: mean pitch in hertz
+        seed: seed of the variation (same seed, same audio)
+        rate: sample rate
+
+    returns:
+        numpy int16 array of the samples
+    """
+    rng = numpy.random.default_rng(seed)
+    leading = numpy.zeros(audio.secs_to_samples(LEADING_SECS, rate))
+    trailing = numpy.zeros(audio.secs_to_samples(TRAILING_SECS, rate))
+    if syll_count <= 0:
+        return audio.to_int16(numpy.concatenate([leading, trailing]))
+    # syllable durations vary by up to 10%, but add up to the requested rate
+    durations = rng.uniform(0.9, 1.1, syll_count)
+    durations *= syll_count / (speech_rate * durations.sum())
+    # declining pitch (+-10%) with some jitter; scaled to the requested mean
+    contour = numpy.linspace(1.1, 0.9, syll_count) * \
+        rng.uniform(0.98, 1.02, syll_count)
+    contour *= pitch / contour.mean()
+    chunks = [leading]
+    for duration, f0 in zip(durations, contour):
+        voiced_len = audio.secs_to_samples(duration * VOICED_SHARE, rate)
+        times = numpy.arange(voiced_len) / float(rate)
+        syllable = sum(numpy.sin(2 * numpy.pi * f0 * harmonic * times) /
+                       harmonic for harmonic in range(1, 6))
+        syllable *= numpy.hanning(voiced_len) * rng.uniform(6000, 9000)
+        chunks.append(syllable)
+        chunks.append(numpy.zeros(audio.secs_to_samples(
+            duration * (1 - VOICED_SHARE), rate)))
+    chunks.append(trailing)
+    return audio.to_int16(numpy.concatenate(chunks))
+
+
+def get_wav_bytes(samples, rate=audio.DEFAULT_RATE):
+    """returns the content of a 16-bit mono wav file with given samples"""
+    wav_buffer = io.BytesIO()
+    audio.write_wav(wav_buffer, samples, rate)
+    return wav_buffer.getvalue()
+
+
+def get_phonemes_xml(words):
+    """returns a mary PHONEMES response with one vowel per syllable"""
+    tokens = []
+    vowel_index = 0
+    for word in words:
+        phones = []
+        for _ in range(count_syllables_word(word)):
+            phones.extend(['t', PHONEME_VOWELS[vowel_index %
+                                               len(PHONEME_VOWELS)]])
+            vowel_index += 1
+        tokens.append('<t ph="%s">%s</t>' % (' '.join(phones),
+                                             xml.sax.saxutils.escape(word)))
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<maryxml xmlns="http://mary.dfki.de/2002/MaryXML" version="0.5" '
+            'xml:lang="en-US"><p><s>%s</s></p></maryxml>' % ''.join(tokens))
+
+
+def synthesize(in_str, voice=None, rate=audio.DEFAULT_RATE):
+    """generates the audio for a mary request
+
+    args:
+        in_str: plain text or ssml (see remote_tts.get_ssml())
+        voice: name of the voice; see VOICES
+
+    returns:
+        numpy int16 array of the samples
+    """
+    base_rate, base_pitch = VOICES.get(voice, DEFAULT_VOICE)
+    rate_value, pitch_value = get_prosody(in_str)
+    syll_count = sum(count_syllables_word(word)
+                     for word in get_text(in_str).split())
+    seed = zlib.crc32(('%s\n%s' % (voice, in_str)).encode('utf-8'))
+    return generate_audio(syll_count, parse_rate(rate_value, base_rate),
+                          parse_pitch(pitch_value, base_pitch), seed, rate)
+
+
+class StubMaryServer(ThreadingHTTPServer):
+    """http server answering mary requests; see StubMaryHandler
+
+    attributes:
+        latency: seconds each request takes at least
+        latency_per_sec: additional seconds per second of generated audio
+        max_concurrent: number of requests processed at once (None:
+            unlimited); others wait
+        max_queue: number of requests that may wait (None: unlimited); more
+            are rejected with status 503, as by an overloaded server
+        stats: dictionary with the number of 'requests', 'rejected' requests,
+            requests currently 'in_flight', the highest number of requests in
+            flight at once ('max_in_flight') and the seconds spent processing
+            ('busy_secs')
+    """
+    daemon_threads = True
+
+    def __init__(self, server_address, latency=0.0, latency_per_sec=0.0,
+                 max_concurrent=None, max_queue=None):
+        """constructor; see class for args"""
+        ThreadingHTTPServer.__init__(self, server_address, StubMaryHandler)
+        self.latency = latency
+        self.latency_per_sec = latency_per_sec
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.stats = {'requests': 0, 'rejected': 0, 'in_flight': 0,
+                      'max_in_flight': 0, 'busy_secs': 0.0}
+        self._stats_lock = threading.Lock()
+        self._slots = threading.Semaphore(max_concurrent) \
+            if max_concurrent else None
+
+    def acquire(self):
+        """waits for a processing slot; returns False if the request has to
+        be rejected because too many are waiting"""
+        with self._stats_lock:
+            self.stats['requests'] += 1
+            if self.max_concurrent and self.max_queue is not None and \
+                    self.stats['in_flight'] >= \
+                    self.max_concurrent + self.max_queue:
+                self.stats['rejected'] += 1
+                return False
+            self.stats['in_flight'] += 1
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'],
+                                              self.stats['in_flight'])
+        if self._slots:
+            self._slots.acquire()
+        return True
+
+    def release(self, busy_secs):
+        """frees the slot taken by acquire()"""
+        if self._slots:
+            self._slots.release()
+        with self._stats_lock:
+            self.stats['in_flight'] -= 1
+            self.stats['busy_secs'] += busy_secs
+
+
+class StubMaryHandler(BaseHTTPRequestHandler):
+    """handles POST requests to /process like a mary server"""
+
+    def do_POST(self):
+        if urllib.parse.urlparse(self.path).path != '/process':
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        params = urllib.parse.parse_qs(
+            self.rfile.read(length).decode('utf-8'))
+        in_str = params.get('INPUT_TEXT', [''])[0]
+        output_type = params.get('OUTPUT_TYPE', ['AUDIO'])[0]
+        if output_type not in ['AUDIO', 'PHONEMES']:
+            self.send_error(400, 'unsupported OUTPUT_TYPE %s' % output_type)
+            return
+        if not self.server.acquire():
+            self.send_response(503)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        start = time.perf_counter()
+        try:
+            if output_type == 'AUDIO':
+                samples = synthesize(in_str, params.get('VOICE', [None])[0])
+                content = get_wav_bytes(samples)
+                content_type = 'audio/x-wav'
+                audio_secs = len(samples) / float(audio.DEFAULT_RATE)
+            else:
+                content = get_phonemes_xml(get_text(in_str).split()).encode(
+                    'utf-8')
+                content_type = 'text/xml; charset=UTF-8'
+                audio_secs = 0.0
+            # simulate the computation time of a real server
+            delay = (self.server.latency +
+                     self.server.latency_per_sec * audio_secs -
+                     (time.perf_counter() - start))
+            if delay > 0:
+                time.sleep(delay)
+        finally:
+            self.server.release(time.perf_counter() - start)
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        # requests are not logged
+        pass
+
+
+def start_server(ip_addr='127.0.0.1', port=0, **kwargs):
+    """starts a stub server in a background thread
+
+    args:
+        ip_addr: address to listen on
+        port: port to listen on; a free port is chosen if 0
+        kwargs: see StubMaryServer
+
+    returns:
+        the server; server.server_address holds the actual address and port,
+        server.shutdown() stops it
+    """
+    server = StubMaryServer((ip_addr, port), **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main(port=59125, **kwargs):
+    """serves on the default mary port until interrupted; see StubMaryServer
+    for kwargs"""
+    server = StubMaryServer(('127.0.0.1', port), **kwargs)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
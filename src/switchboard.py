@@ -1,10 +1,20 @@
 import remote_tts
-import subprocess
 import entrainer
+import audio
+import transcript
 from os import remove
-from os import rename
 from os.path import isfile
 import json
+import sys
+import multiprocessing
+import shutil
+import tempfile
+import collections
+import functools
+import time
+import results
+import profiling
+from concurrent.futures import ThreadPoolExecutor
 
 """
 This module is used to replace one human speaker in a conversation from the
@@ -13,66 +23,189 @@ This replacement requires an annotated transcription of the conversation and the
 audio of the other speaker as a single channel file.
 """
 
+# channels of the conversation timeline that get mixed at the end
+CHANNEL_HMN = 0
+CHANNEL_SYN = 1
 
-def add_silence(fname, length_secs):
-    """appends given number of seconds of silence to given wav file using sox
+
+@profiling.timed()
+def get_source(audio_in):
+    """returns an audio.Source for given human audio, opening it if necessary
+
+    args:
+        audio_in: name of wav file containing human audio or an audio.Source
+            that was already opened for it (reused without decoding again)
+    """
+    if isinstance(audio_in, audio.Source):
+        return audio_in
+    return audio.Source(audio_in)
+
+
+class TurnPipeline(object):
+    """splices turns into a timeline in transcript order while the audio of
+    later turns is still being produced in worker threads
+
+    turns are added in transcript order; turns whose audio is produced by a
+    function (e.g. synthesis) are submitted to a thread pool and spliced once
+    all earlier turns are spliced; at most lookahead of them are pending at a
+    time, so only a bounded number of synthesized turns is held in memory
+
+    attributes:
+        timeline: audio.Timeline that turns are spliced into
+        lookahead: maximum number of submitted turns not spliced yet
+    """
+
+    def __init__(self, timeline, workers=1, lookahead=None):
+        """constructor; lookahead defaults to twice the number of workers"""
+        self.timeline = timeline
+        self.lookahead = lookahead if lookahead else 2 * workers
+        self._executor = ThreadPoolExecutor(workers)
+        # (future or None, callback) in transcript order
+        self._pending = collections.deque()
+        self._submitted = 0
+
+    def add_silence(self, channel, length_secs):
+        """appends silence to a channel; see audio.Timeline.add_silence()"""
+        self._add(None, lambda _: self.timeline.add_silence(channel,
+                                                            length_secs))
+
+    def append(self, channel, samples):
+        """appends samples to a channel; see audio.Timeline.append()"""
+        self._add(None, lambda _: self.timeline.append(channel, samples))
+
+    def submit(self, callback, function, *args, **kwargs):
+        """runs function(*args, **kwargs) in a worker thread
+
+        args:
+            callback: called with the result of function once all earlier turns
+                are spliced; splices the result into the timeline
+            function: produces the audio of a turn
+
+        returns:
+            concurrent.futures.Future of the result of function
+        """
+        future = self._executor.submit(function, *args, **kwargs)
+        self._submitted += 1
+        self._add(future, callback)
+        # bound the number of pending turns
+        while self._submitted > self.lookahead:
+            self._splice_next()
+        return future
+
+    def finish(self):
+        """splices all remaining turns, waiting for their results"""
+        while self._pending:
+            self._splice_next()
+
+    def shutdown(self):
+        """stops the worker threads; pending turns that have not started are
+        cancelled (e.g. after an error)"""
+        self._executor.shutdown(cancel_futures=True)
+
+    def _add(self, future, callback):
+        self._pending.append((future, callback))
+        # splice everything that is ready without waiting
+        while self._pending and (self._pending[0][0] is None or
+                                 self._pending[0][0].done()):
+            self._splice_next()
+
+    def _splice_next(self):
+        future, callback = self._pending.popleft()
+        if future is None:
+            callback(None)
+        else:
+            self._submitted -= 1
+            callback(future.result())
+
+
+@profiling.timed()
+def load_synthesized(fname, stats=None):
+    """reads a synthesized wav file into memory and deletes it
 
     args:
-        fname: name of the wav file (will be created if it does not exist yet)
-        length_secs: number of seconds of silence to append
+        fname: name of the wav file
+        stats: optional dictionary; the time taken is added to 'splice_secs'
+
+    returns:
+        see audio.read_wav()
     """
-    if length_secs <= 0.0:
-        return
-    if not isfile(fname):
-        subprocess.check_call(['rec', '-r', '16k', '-c', '1', '-q', fname,
-                               'trim', '0', '0'])
-    tmp_fname = fname[:fname.rfind('.')] + 'pad' + fname[fname.rfind('.'):]
-    subprocess.check_call(['sox', fname, tmp_fname, 'pad', '0',
-                           str(length_secs)])
+    start = time.perf_counter()
+    samples, rate = audio.read_wav(fname)
     remove(fname)
-    rename(tmp_fname, fname)
+    remote_tts.add_time(stats, 'splice_secs', start)
+    return samples, rate
+
 
+def create_record(turn_index, syll_count, pitch, speech_rate, intensity,
+                  feat_val_dict, stats):
+    """returns the results record of a synthesized turn (see results module)
 
-def append_audio(in_fname, out_fname, start, end, up_sample=False):
-    """appends given section of one wav file to another
+    args:
+        turn_index: index of the turn among the synthesized turns
+        syll_count: number of syllables in the turn
+        pitch, speech_rate, intensity: target values
+        feat_val_dict: actual values; see remote_tts.extract_feature_values()
+        stats: see remote_tts.synthesize_with_features(); 'splice_secs' is
+            added to the record (and thus to the stats) later
+    """
+    dur = float(feat_val_dict['main_duration'])
+    record = {'turn': turn_index,
+              'syllables': syll_count,
+              'p_tgt': pitch,
+              'p_act': float(feat_val_dict['pitch_mean']),
+              'r_tgt': speech_rate,
+              'r_act': syll_count / dur,
+              'i_tgt': intensity,
+              'i_act': float(feat_val_dict['intensity_mean']),
+              'duration': dur}
+    record.update(stats)
+    return record
+
+
+def render_turn(in_str, speech_rate, intensity, pitch, syll_count,
+                speech_rates_dict, voice, stats=None):
+    """synthesizes a turn with given features and measures the result
 
     args:
-        in_fname: name of the 1st wav file; part of this is appended to the 2nd
-        out_fname: name of the 2nd wav file; part of the 1st is appended to this
-        start: beginning of the section in the 1st wav file that is copied
-        end: end of the section in the 1st wav file that is copied
-        up_sample: whether sample rate of the copied section should be increased
-            to 16k (switchboard audio only has 8k initially)
+        pitch: target pitch in hertz (float)
+        stats: see remote_tts.synthesize_with_features(); the final measuring
+            and loading times are added as well
+        (for details on other parameters see
+        remote_tts.synthesize_with_features())
+
+    returns:
+        tuple of the samples and sample rate of the synthesized audio (see
+        audio.read_wav()) and the extracted feature values (see
+        remote_tts.extract_feature_values())
     """
-    if not isfile(out_fname):
-        subprocess.check_call(['rec', '-r', '16k', '-c', '1', '-q', out_fname,
-                               'trim', '0', '0'])
-    tmp_fname1 = (in_fname[:in_fname.rfind('.')] + 'cut' +
-                  in_fname[in_fname.rfind('.'):])
-    tmp_fname2 = (in_fname[:in_fname.rfind('.')] + 'conc' +
-                  in_fname[in_fname.rfind('.'):])
-
-    subprocess.check_call(['sox', in_fname, tmp_fname1, 'trim', str(start),
-                           '=' + str(end)])
-    if up_sample:
-        tmp_fname1a = (in_fname[:in_fname.rfind('.')] + 'cut_16k' +
-                       in_fname[in_fname.rfind('.'):])
-        subprocess.check_call(['sox', tmp_fname1, '-r', '16k', tmp_fname1a])
-        remove(tmp_fname1)
-        tmp_fname1 = tmp_fname1a
-    subprocess.check_call(['sox', out_fname, tmp_fname1, tmp_fname2])
-    remove(tmp_fname1)
-    remove(out_fname)
-    rename(tmp_fname2, out_fname)
-
-
-def generate_conversation(trans_fname, audio_in_fname, audio_out_fname,
-                          entrainer_pitch, entrainer_rate, entrainer_intensity):
+    # keep pitch and rate as close to target as possible
+    fname_tmp = remote_tts.synthesize_with_features(
+        in_str, speech_rate, intensity, str(pitch) + 'Hz',
+        speech_rates_dict=speech_rates_dict,
+        voice=voice, repeat_until_close=True, syll_count=syll_count,
+        stats=stats
+    )
+    start = time.perf_counter()
+    feat_val_dict = remote_tts.extract_feature_values(fname_tmp, 1, 1, 1, 0)
+    remote_tts.add_time(stats, 'praat_secs', start)
+    samples, rate = load_synthesized(fname_tmp, stats)
+    return samples, rate, feat_val_dict
+
+
+def generate_conversation(trans_fname, audio_in, audio_out_fname,
+                          entrainer_pitch, entrainer_rate, entrainer_intensity,
+                          records=None):
     """generates wav file with spliced human and synthesized speech
 
+    each synthesized turn depends on the measured features of the previous
+    ones, so synthesis and measurement are sequential; reading and splicing the
+    audio of a turn overlaps with the synthesis of the next one
+
     args:
-        trans_fname: name of the file containing annotated transcription
-        audio_in_fname: name of wav file containing human audio
+        trans_fname: name of the file containing annotated transcription (see
+            transcript module)
+        audio_in: name of wav file containing human audio or an audio.Source
+            already opened for it (see get_source())
         audio_out_fname: output file name for the wav file to be generated
         entrainer_pitch: instance of entrainer.Entrainer to generate entraining
             values with regard to pitch
@@ -80,61 +213,84 @@ def generate_conversation(trans_fname, audio_in_fname, audio_out_fname,
             values with regard to speech rate
         entrainer_intensity: instance of entrainer.Entrainer to generate
             entraining values with regard to intensity
+        records: optional list; a results record is appended for every
+            synthesized turn (see create_record())
+
+    raises:
+        ValueError: the transcription is malformed (checked before synthesis)
     """
     # separate channels that get merged at the end
-    audio_tmp_hmn_fname = '../tmp/audio_tmp_hmn.wav'
-    audio_tmp_syn_fname = '../tmp/audio_tmp_syn.wav'
+    timeline = audio.Timeline()
+    pipeline = TurnPipeline(timeline)
+    source = get_source(audio_in)
 
     speech_rates_dict = remote_tts.load_speech_rates_dict()
     voice = 'cmu-rms-hsmm'
 
-    with open(trans_fname, 'r') as trans_file:
-        # arrays to track target values and actual output
-        tgt_pitches = []
-        act_pitches = []
-        tgt_speech_rates = []
-        act_speech_rates = []
-        tgt_intensities = []
-        act_intensities = []
-
-        for line in trans_file.readlines():
-            items = line.split(' ')
-            # lines begin with 0, 1 or 2 to mark the type of turn
-            if items[0] == '0':
-                # 0 => silence for both channels
-                add_silence(audio_tmp_hmn_fname, float(items[1]))
-                add_silence(audio_tmp_syn_fname, float(items[1]))
-            elif items[0] == '1':
-                # 1 => human speaker's turn; copy section from original audio
-                start = float(items[1])
-                end = float(items[2])
-                dur = end - start
-                append_audio(audio_in_fname, audio_tmp_hmn_fname, start, end,
-                             True)
-                add_silence(audio_tmp_syn_fname, dur)
+    # check the whole transcription before spending time on synthesis
+    transcript.validate(trans_fname)
+
+    # arrays to track target values and actual output
+    tgt_pitches = []
+    act_pitches = []
+    tgt_speech_rates = []
+    act_speech_rates = []
+    tgt_intensities = []
+    act_intensities = []
+
+    def splice_synthesized(dur, stats, samples_rate):
+        start = time.perf_counter()
+        with profiling.timer('switchboard.splice'):
+            pipeline.timeline.add_silence(CHANNEL_HMN, dur)
+            pipeline.timeline.append(CHANNEL_SYN, samples_rate[0],
+                                     samples_rate[1], 0, dur)
+        remote_tts.add_time(stats, 'splice_secs', start)
+
+    try:
+        for turn in transcript.iter_turns(trans_fname):
+            if isinstance(turn, transcript.SilenceTurn):
+                # silence for both channels
+                pipeline.add_silence(CHANNEL_HMN, turn.duration)
+                pipeline.add_silence(CHANNEL_SYN, turn.duration)
+            elif isinstance(turn, transcript.HumanTurn):
+                # human speaker's turn; copy section from original audio
+                dur = turn.duration
+                pipeline.append(CHANNEL_HMN,
+                                source.section(turn.start, turn.end))
+                pipeline.add_silence(CHANNEL_SYN, dur)
                 # register which values to entrain to in next synthesized turn
-                entrainer_pitch.register_input(float(items[4]), dur)
-                entrainer_rate.register_input(float(items[5]) / dur, dur)
-                entrainer_intensity.register_input(float(items[3]), dur)
-            elif items[0] == '2':
-                # 2 => synthesized speaker's turn; read text and synthesize
-                # get proposed feature values from entrainers
+                entrainer_pitch.register_input(turn.pitch, dur)
+                entrainer_rate.register_input(turn.speech_rate, dur)
+                entrainer_intensity.register_input(turn.intensity, dur)
+            else:
+                # synthesized speaker's turn; get proposed feature values from
+                # entrainers
                 pitch = entrainer_pitch.propose_output()
                 speech_rate = entrainer_rate.propose_output()
                 intensity = entrainer_intensity.propose_output()
 
-                # synthesize; keep pitch and rate as close to target as possible
-                out_sylls = float(items[1])
-                in_str = ' '.join(items[2:])
+                # synthesize; keep pitch and rate as close to target as
+                # possible
+                out_sylls = turn.syllables
+                stats = {}
                 fname_tmp = remote_tts.synthesize_with_features(
-                    in_str, speech_rate, intensity, str(pitch) + 'Hz',
+                    turn.text, speech_rate, intensity, str(pitch) + 'Hz',
                     speech_rates_dict=speech_rates_dict,
-                    voice=voice, repeat_until_close=True, syll_count=out_sylls
+                    voice=voice, repeat_until_close=True, syll_count=out_sylls,
+                    stats=stats
                 )
 
                 # determine and track actual output feature values
+                start = time.perf_counter()
                 feat_val_dict = remote_tts.extract_feature_values(
                     fname_tmp, 1, 1, 1, 0)
+                remote_tts.add_time(stats, 'praat_secs', start)
+                if records is not None:
+                    # record is completed with the splicing time later
+                    stats = create_record(
+                        len(tgt_pitches), out_sylls, pitch, speech_rate,
+                        intensity, feat_val_dict, stats)
+                    records.append(stats)
                 dur = float(feat_val_dict['main_duration'])
                 tgt_speech_rates.append('%.2f' % speech_rate)
                 act_speech_rates.append('%.2f' % (out_sylls / dur))
@@ -142,11 +298,14 @@ def generate_conversation(trans_fname, audio_in_fname, audio_out_fname,
                 act_intensities.append('%.2f' %
                                        float(feat_val_dict['intensity_mean']))
                 tgt_pitches.append('%.2f' % pitch)
-                act_pitches.append('%.2f' % float(feat_val_dict['pitch_mean']))
+                act_pitches.append('%.2f' %
+                                   float(feat_val_dict['pitch_mean']))
 
-                add_silence(audio_tmp_hmn_fname, dur)
-                append_audio(fname_tmp, audio_tmp_syn_fname, 0, dur)
-                remove(fname_tmp)
+                # read and splice in the background while the next turn is
+                # synthesized
+                pipeline.submit(
+                    functools.partial(splice_synthesized, dur, stats),
+                    load_synthesized, fname_tmp, stats)
 
                 # register output with entrainers
                 entrainer_pitch.register_output(
@@ -155,16 +314,13 @@ def generate_conversation(trans_fname, audio_in_fname, audio_out_fname,
                     out_sylls / dur, 1)
                 entrainer_intensity.register_output(
                     float(feat_val_dict['intensity_mean']), 1)
-            else:
-                # line does not start with 0, 1 or 2
-                print('error!')
-                print(line)
+        pipeline.finish()
+    finally:
+        pipeline.shutdown()
 
-    # merge channels and delete intermediate files
-    subprocess.check_call(['sox', '-m', audio_tmp_hmn_fname,
-                           audio_tmp_syn_fname, audio_out_fname])
-    remove(audio_tmp_hmn_fname)
-    remove(audio_tmp_syn_fname)
+    # merge channels into the output file (the only file written)
+    with profiling.timer('switchboard.write_mix'):
+        timeline.write_mix(audio_out_fname)
 
     # return 'log' of target and actual feature values
     return ('p_tgt: ' + ' '.join(tgt_pitches) + '\n' +
@@ -175,93 +331,107 @@ def generate_conversation(trans_fname, audio_in_fname, audio_out_fname,
             'i_act: ' + ' '.join(act_intensities) + '\n')
 
 
-def imitate_conversation(trans_fname, audio_in_fname, audio_out_fname,
-                         scale_pitch=True):
+def imitate_conversation(trans_fname, audio_in, audio_out_fname,
+                         scale_pitch=True, workers=4, lookahead=None,
+                         records=None):
     """generates wav file with spliced human and synthesized speech
 
     unlike in generate_conversation(), synthesis here does not entrainment but
-    instead matches the replaced speaker's features as closely as possible
+    instead matches the replaced speaker's features as closely as possible;
+    since all targets are known from the transcription, upcoming turns are
+    synthesized and measured in parallel while earlier ones are spliced
 
     args:
         trans_fname: name of the file containing annotated transcription
-            (annotated for feature values of both speakers)
-        audio_in_fname: name of wav file containing human audio
+            (annotated for feature values of both speakers; see transcript
+            module)
+        audio_in: name of wav file containing human audio or an audio.Source
+            already opened for it (see get_source())
         audio_out_fname: output file name for the wav file to be generated
         scale_pitch: whether to linearly scale pitch from female (75 to 500Hz)
             to male (50 to 300) range or not (output voice is male)
+        workers: number of turns synthesized in parallel
+        lookahead: maximum number of synthesized turns waiting to be spliced;
+            see TurnPipeline
+        records: see generate_conversation()
+
+    raises:
+        ValueError: the transcription is malformed (checked before synthesis)
     """
     # separate channels that get merged at the end
-    audio_tmp_hmn_fname = '../tmp/audio_tmp_hmn.wav'
-    audio_tmp_syn_fname = '../tmp/audio_tmp_syn.wav'
+    timeline = audio.Timeline()
+    pipeline = TurnPipeline(timeline, workers, lookahead)
+    source = get_source(audio_in)
 
     speech_rates_dict = remote_tts.load_speech_rates_dict()
     voice = 'cmu-rms-hsmm'
 
-    with open(trans_fname, 'r') as trans_file:
-        # arrays to track target values and actual output
-        tgt_pitches = []
-        act_pitches = []
-        tgt_speech_rates = []
-        act_speech_rates = []
-        tgt_intensities = []
-        act_intensities = []
-
-        for line in trans_file.readlines():
-            items = line.split(' ')
-            # lines begin with 0, 1 or 2 to mark the type of turn
-            if items[0] == '0':
-                # 0 => silence for both channels
-                add_silence(audio_tmp_hmn_fname, float(items[1]))
-                add_silence(audio_tmp_syn_fname, float(items[1]))
-            elif items[0] == '1':
-                # 1 => human speaker's turn; copy section from original audio
-                start = float(items[1])
-                end = float(items[2])
-                dur = end - start
-                append_audio(audio_in_fname, audio_tmp_hmn_fname, start, end,
-                             True)
-                add_silence(audio_tmp_syn_fname, dur)
-            elif items[0] == '2':
-                # 2 => synthesized speaker's turn; read text and features, then
-                # synthesize; keep pitch and rate as close to target as possible
-                out_sylls = float(items[1])
-                intensity = float(items[2])
-                pitch = float(items[3])
+    # check the whole transcription before spending time on synthesis
+    transcript.validate(trans_fname, synth_features=True)
+
+    # arrays to track target values and actual output
+    tgt_pitches = []
+    act_pitches = []
+    tgt_speech_rates = []
+    act_speech_rates = []
+    tgt_intensities = []
+    act_intensities = []
+
+    def splice_synthesized(out_sylls, speech_rate, intensity, pitch, stats,
+                           result):
+        # called in transcript order; track actual output feature values
+        samples, rate, feat_val_dict = result
+        dur = float(feat_val_dict['main_duration'])
+        if records is not None:
+            records.append(create_record(
+                len(tgt_pitches), out_sylls, pitch, speech_rate, intensity,
+                feat_val_dict, stats))
+            stats = records[-1]
+        tgt_speech_rates.append('%.2f' % speech_rate)
+        act_speech_rates.append('%.2f' % (out_sylls / dur))
+        tgt_intensities.append('%.2f' % intensity)
+        act_intensities.append('%.2f' %
+                               float(feat_val_dict['intensity_mean']))
+        tgt_pitches.append('%.2f' % pitch)
+        act_pitches.append('%.2f' % float(feat_val_dict['pitch_mean']))
+
+        start = time.perf_counter()
+        with profiling.timer('switchboard.splice'):
+            pipeline.timeline.add_silence(CHANNEL_HMN, dur)
+            pipeline.timeline.append(CHANNEL_SYN, samples, rate, 0, dur)
+        remote_tts.add_time(stats, 'splice_secs', start)
+
+    try:
+        for turn in transcript.iter_turns(trans_fname, synth_features=True):
+            if isinstance(turn, transcript.SilenceTurn):
+                # silence for both channels
+                pipeline.add_silence(CHANNEL_HMN, turn.duration)
+                pipeline.add_silence(CHANNEL_SYN, turn.duration)
+            elif isinstance(turn, transcript.HumanTurn):
+                # human speaker's turn; copy section from original audio
+                pipeline.append(CHANNEL_HMN,
+                                source.section(turn.start, turn.end))
+                pipeline.add_silence(CHANNEL_SYN, turn.duration)
+            else:
+                # synthesized speaker's turn; synthesize with annotated
+                # features in the background
+                pitch = turn.pitch
                 if scale_pitch:
                     pitch = 50 + ((pitch - 75) / 425) * 250
-                speech_rate = float(items[4])
-                in_str = ' '.join(items[5:])
-                fname_tmp = remote_tts.synthesize_with_features(
-                    in_str, speech_rate, intensity, str(pitch) + 'Hz',
-                    speech_rates_dict=speech_rates_dict,
-                    voice=voice, repeat_until_close=True, syll_count=out_sylls
-                )
-
-                # determine and track actual output feature values
-                feat_val_dict = remote_tts.extract_feature_values(
-                    fname_tmp, 1, 1, 1, 0)
-                dur = float(feat_val_dict['main_duration'])
-                tgt_speech_rates.append('%.2f' % speech_rate)
-                act_speech_rates.append('%.2f' % (out_sylls / dur))
-                tgt_intensities.append('%.2f' % intensity)
-                act_intensities.append('%.2f' %
-                                       float(feat_val_dict['intensity_mean']))
-                tgt_pitches.append('%.2f' % pitch)
-                act_pitches.append('%.2f' % float(feat_val_dict['pitch_mean']))
-
-                add_silence(audio_tmp_hmn_fname, dur)
-                append_audio(fname_tmp, audio_tmp_syn_fname, 0, dur)
-                remove(fname_tmp)
-            else:
-                # line does not start with 0, 1 or 2
-                print('error!')
-                print(line)
-
-    # merge channels and delete intermediate files
-    subprocess.check_call(['sox', '-m', audio_tmp_hmn_fname,
-                           audio_tmp_syn_fname, audio_out_fname])
-    remove(audio_tmp_hmn_fname)
-    remove(audio_tmp_syn_fname)
+                stats = {}
+                pipeline.submit(
+                    functools.partial(splice_synthesized, turn.syllables,
+                                      turn.speech_rate, turn.intensity, pitch,
+                                      stats),
+                    render_turn, turn.text, turn.speech_rate, turn.intensity,
+                    pitch, turn.syllables, speech_rates_dict, voice, stats)
+        pipeline.finish()
+    finally:
+        pipeline.shutdown()
+
+    # merge channels into the output file (the only file written)
+    with profiling.timer('switchboard.write_mix'):
+        timeline.write_mix(audio_out_fname)
 
     # return 'log' of target and actual feature values
     return ('p_tgt: ' + ' '.join(tgt_pitches) + '\n' +
@@ -272,67 +442,180 @@ def imitate_conversation(trans_fname, audio_in_fname, audio_out_fname,
             'i_act: ' + ' '.join(act_intensities) + '\n')
 
 
-def main():
-    """generates two conversations for each entrainment configuration"""
+def create_entrainers(instance):
+    """returns pitch, rate and intensity entrainers for a config.json instance
+
+    args:
+        instance: dictionary of one instance in misc/switchboard/config.json
+    """
+    entrainers = []
+    for feature in ['pitch', 'rate', 'intensity']:
+        cfg = instance[feature]
+        entrainers.append(entrainer.Entrainer(
+            cfg['default'], cfg['glo_weight'], cfg['loc_weight'],
+            cfg['glo_conv'], cfg['loc_conv'], cfg['loc_conv']))
+    return tuple(entrainers)
+
+
+def create_batch_entrainer(instances):
+    """returns one entrainer.BatchEntrainer for many config.json instances
+
+    proposed values are arrays of shape (instances, 3) with the features in
+    the order pitch, rate, intensity (as in create_entrainers())
+
+    args:
+        instances: list of dictionaries of instances in config.json
+    """
+    params = [[[instance[feature][key]
+                for feature in ['pitch', 'rate', 'intensity']]
+               for instance in instances]
+              for key in ['default', 'glo_weight', 'loc_weight', 'glo_conv',
+                          'loc_conv', 'loc_conv']]
+    return entrainer.BatchEntrainer(*params)
+
+
+def generate_instance(instance, part, audio_in, out_dir='../tmp',
+                      results_fname=None):
+    """generates the conversation for one part of one config.json instance
+
+    args:
+        instance: dictionary of one instance in misc/switchboard/config.json
+        part: number of the switchboard transcript part (1 or 2)
+        audio_in: see generate_conversation()
+        out_dir: directory for the generated wav file
+        results_fname: optional results file (see results module) that the
+            records of all synthesized turns are appended to
+
+    returns:
+        log block for the instance, starting with its id and configuration
+    """
+    entrainer_pitch, entrainer_rate, entrainer_intensity = \
+        create_entrainers(instance)
+    inst_id = instance['id'] + chr(64 + part)
+    audio_out_fname = '%s/%s.wav' % (out_dir, inst_id)
+    trans_fname = '../misc/switchboard/part%d.text' % part
+    out_str = ('id: ' + inst_id + '\n' +
+               'p_cfg: ' + str(entrainer_pitch) + '\n' +
+               'r_cfg: ' + str(entrainer_rate) + '\n' +
+               'i_cfg: ' + str(entrainer_intensity) + '\n')
+    records = []
+    out_str += generate_conversation(
+        trans_fname, audio_in, audio_out_fname,
+        entrainer_pitch, entrainer_rate, entrainer_intensity, records)
+    if results_fname:
+        for record in records:
+            record['id'] = inst_id
+        results.ResultsWriter(results_fname).append(records)
+    return out_str
+
+
+# state of a worker process in main(); set once per process by init_worker()
+_worker_source = None
+_worker_scratch_root = None
+_worker_results_fname = None
+
+
+def init_worker(audio_in_fname, scratch_root, results_fname=None):
+    """initializes a worker process of main(); opens the human audio once"""
+    global _worker_source, _worker_scratch_root, _worker_results_fname
+    _worker_source = audio.Source(audio_in_fname)
+    _worker_scratch_root = scratch_root
+    _worker_results_fname = results_fname
+
+
+def run_job(job):
+    """runs one (instance, part) job of main() in a worker process
+
+    intermediate files of the job are written to a scratch directory of its
+    own, so jobs running at the same time do not interfere
+
+    args:
+        job: tuple of a config.json instance and a part number
+
+    returns:
+        see generate_instance()
+    """
+    instance, part = job
+    scratch_dir = tempfile.mkdtemp(
+        prefix='%s%s_' % (instance['id'], chr(64 + part)),
+        dir=_worker_scratch_root)
+    remote_tts.TMP_DIR = scratch_dir
+    try:
+        return generate_instance(instance, part, _worker_source,
+                                 results_fname=_worker_results_fname)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def main(workers=1):
+    """generates two conversations for each entrainment configuration
+
+    besides the text log, per-turn records with stage timings are appended
+    to a results file (see results module) by the workers as they finish
+
+    args:
+        workers: number of processes generating conversations in parallel; log
+            blocks are written in config.json order regardless
+    """
 
-    # 'reset' the log file
+    # warns now if feature extraction falls back to a process per file
+    remote_tts.get_feature_backend()
+    # 'reset' the log and results files
     log_fname = '../tmp/features.log'
-    if isfile(log_fname):
-        remove(log_fname)
+    results_fname = '../tmp/features.jsonl'
+    for fname in [log_fname, results_fname]:
+        if isfile(fname):
+            remove(fname)
     audio_in_fname = '../misc/switchboard/human.wav'
 
     with open('../misc/switchboard/config.json', 'r') as json_file:
         conditions = json.load(json_file)
-
-        for condition in conditions[1:2]:
-            for instance in condition:
-                for i in [1, 2]:
-                    entrainer_pitch = entrainer.Entrainer(
-                        instance['pitch']['default'],
-                        instance['pitch']['glo_weight'],
-                        instance['pitch']['loc_weight'],
-                        instance['pitch']['glo_conv'],
-                        instance['pitch']['loc_conv'],
-                        instance['pitch']['loc_conv'])
-                    entrainer_rate = entrainer.Entrainer(
-                        instance['rate']['default'],
-                        instance['rate']['glo_weight'],
-                        instance['rate']['loc_weight'],
-                        instance['rate']['glo_conv'],
-                        instance['rate']['loc_conv'],
-                        instance['rate']['loc_conv'])
-                    entrainer_intensity = entrainer.Entrainer(
-                        instance['intensity']['default'],
-                        instance['intensity']['glo_weight'],
-                        instance['intensity']['loc_weight'],
-                        instance['intensity']['glo_conv'],
-                        instance['intensity']['loc_conv'],
-                        instance['intensity']['loc_conv'])
-
-                    audio_out_fname = '../tmp/%s%s.wav' % (instance['id'],
-                                                           chr(64 + i))
-                    trans_fname = '../misc/switchboard/part%d.text' % i
-                    # print('generating file %s' % audio_out_fname)
-                    out_str = ('id: ' + instance['id'] + chr(64 + i) + '\n' +
-                               'p_cfg: ' + str(entrainer_pitch) + '\n' +
-                               'r_cfg: ' + str(entrainer_rate) + '\n' +
-                               'i_cfg: ' + str(entrainer_intensity) + '\n')
-                    out_str += generate_conversation(
-                        trans_fname, audio_in_fname, audio_out_fname,
-                        entrainer_pitch, entrainer_rate, entrainer_intensity)
-                    with open(log_fname, 'a') as log_file:
-                        log_file.write(out_str + '\n')
+    jobs = [(instance, i)
+            for condition in conditions[1:2]
+            for instance in condition
+            for i in [1, 2]]
+
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, init_worker,
+                                    (audio_in_fname, '../tmp', results_fname))
+        # imap yields results in job order, which keeps the log deterministic
+        out_strs = pool.imap(run_job, jobs)
+    else:
+        # human audio is decoded and upsampled once and reused for all jobs
+        source = audio.Source(audio_in_fname)
+        pool = None
+        out_strs = (generate_instance(instance, i, source,
+                                      results_fname=results_fname)
+                    for instance, i in jobs)
+    try:
+        for out_str in out_strs:
+            with open(log_fname, 'a') as log_file:
+                log_file.write(out_str + '\n')
+    except BaseException:
+        # a failed job or ctrl-c; do not wait for the remaining conversations
+        if pool:
+            pool.terminate()
+            pool.join()
+        raise
+    if pool:
+        pool.close()
+        pool.join()
 
 
 def main2():
-    audio_in_fname = '../misc/switchboard/human.wav'
+    remote_tts.get_feature_backend()
+    source = audio.Source('../misc/switchboard/human.wav')
     for i in [1, 2]:
         audio_out_fname = '../tmp/features_both_%s.wav' % chr(64 + i)
         trans_fname = '../misc/switchboard/part%d_features_both.text' % i
         out_str = imitate_conversation(
-            trans_fname, audio_in_fname, audio_out_fname)
+            trans_fname, source, audio_out_fname)
         print(out_str)
 
 
 if __name__ == '__main__':
-    main2()
+    # with a number of workers, all configurations are generated (see main())
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main2()
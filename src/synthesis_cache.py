@@ -0,0 +1,176 @@
+import collections
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+"""
+This module contains an on-disk cache for synthesized audio. Entries are
+addressed by a hash of everything that determines the tts output, so identical
+requests (same tts, voice, input type and markup) are only sent to the tts
+server once. The cache directory can be shared by several processes.
+"""
+
+
+class SynthesisCache(object):
+    """content-addressed store of synthesized wav files with lru eviction
+
+    entries are kept in memory in order of recency, starting from the
+    modification times of the files in the directory (updated on every hit, so
+    the next process starts from the same order); when the total size exceeds
+    max_bytes, the least recently used files are deleted until it is below
+    low_water * max_bytes, so that evictions happen in batches rather than on
+    every store; with several processes, each one evicts the entries it knows
+    of: those in the directory at its start and those it used since
+
+    attributes:
+        cache_dir: directory containing the cached files
+        max_bytes: maximum total size of the cached files
+        low_water: share of max_bytes an eviction reduces the size to
+        hits: number of requests answered from the cache (this process)
+        misses: number of requests not found in the cache (this process)
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, low_water=0.9):
+        """constructor; creates the cache directory if it does not exist"""
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        # maps file names to sizes, least recently used first
+        self._entries = collections.OrderedDict(
+            (fname, size) for fname, size, _ in
+            sorted(self._list_entries(), key=lambda entry: entry[2]))
+        self._size = sum(self._entries.values())
+
+    def __str__(self):
+        """returns string representation of the hit and miss counters"""
+        return 'hits: %d misses: %d' % (self.hits, self.misses)
+
+    @staticmethod
+    def get_key(tts_type, voice, input_type, markup):
+        """returns the cache key for a synthesis request"""
+        request = '%s\n%s\n%s\n%s' % (tts_type, voice, input_type, markup)
+        return hashlib.sha1(request.encode('utf-8')).hexdigest()
+
+    def fetch(self, key, out_fname):
+        """copies the cached file for given key to out_fname if there is one
+
+        returns:
+            True if the key was found (counted as a hit), else False
+        """
+        fname = self._get_fname(key)
+        try:
+            shutil.copyfile(fname, out_fname)
+            # mark as recently used
+            os.utime(fname)
+        except (IOError, OSError):
+            with self._lock:
+                self.misses += 1
+            return False
+        self._touch(fname, os.path.getsize(out_fname))
+        return True
+
+    def read(self, key):
+        """returns the content of the cached file for given key
+
+        returns:
+            bytes of the cached wav file if the key was found (counted as a
+            hit), else None
+        """
+        fname = self._get_fname(key)
+        try:
+            with open(fname, 'rb') as cached_file:
+                data = cached_file.read()
+            os.utime(fname)
+        except (IOError, OSError):
+            with self._lock:
+                self.misses += 1
+            return None
+        self._touch(fname, len(data))
+        return data
+
+    def store(self, key, in_fname):
+        """adds a copy of given file to the cache, then evicts if necessary"""
+        # copy under a temporary name first so other processes never read a
+        # partially written entry
+        fd, tmp_fname = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        shutil.copyfile(in_fname, tmp_fname)
+        self._add(key, tmp_fname, os.path.getsize(in_fname))
+
+    def store_data(self, key, data):
+        """adds given content of a wav file to the cache; see store()"""
+        fd, tmp_fname = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+        self._add(key, tmp_fname, len(data))
+
+    def clear(self):
+        """deletes all cached files and resets the counters"""
+        with self._lock:
+            for fname, _, _ in self._list_entries():
+                self._remove(fname)
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def _add(self, key, tmp_fname, size):
+        """moves a completely written temporary file into place as entry"""
+        fname = self._get_fname(key)
+        os.replace(tmp_fname, fname)
+        with self._lock:
+            self._size += size - self._entries.pop(fname, 0)
+            self._entries[fname] = size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _touch(self, fname, size):
+        """counts a hit and marks the entry as most recently used"""
+        with self._lock:
+            self.hits += 1
+            if fname in self._entries:
+                self._entries.move_to_end(fname)
+            else:
+                # stored by another process
+                self._entries[fname] = size
+                self._size += size
+
+    def _get_fname(self, key):
+        return os.path.join(self.cache_dir, key + '.wav')
+
+    def _list_entries(self):
+        """returns list of (file name, size, modification time) of entries"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.wav'):
+                fname = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(fname)
+                except OSError:
+                    # removed by another process in the meantime
+                    continue
+                entries.append((fname, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        """deletes least recently used files until the size is below the low
+        water mark; the lock must be held"""
+        target = self.low_water * self.max_bytes
+        while self._entries and self._size > target:
+            fname, size = self._entries.popitem(last=False)
+            self._remove(fname)
+            self._size -= size
+
+    @staticmethod
+    def _remove(fname):
+        try:
+            os.remove(fname)
+        except OSError:
+            pass
@@ -0,0 +1,159 @@
+from collections import namedtuple
+
+"""
+This module parses the annotated transcriptions used by switchboard (see
+misc/switchboard/part*.text). Every line is one turn and begins with its type:
+
+    0 <duration> [silence]
+    1 <start> <end> <intensity> <pitch> <syllables> <text>
+    2 <syllables> <text>
+    2 <syllables> <intensity> <pitch> <speech rate> <text>
+
+The last form is used by transcriptions annotated for the features of both
+speakers (e.g. part1_features_both.text). Files are read lazily, one line at a
+time, so even large corpora are never loaded as a whole.
+"""
+
+TURN_TYPE_SILENCE = '0'
+TURN_TYPE_HUMAN = '1'
+TURN_TYPE_SYNTH = '2'
+
+
+class SilenceTurn(namedtuple('SilenceTurn', ['duration'])):
+    """pause in which neither speaker talks; duration in seconds"""
+    __slots__ = ()
+
+
+class HumanTurn(namedtuple('HumanTurn', ['start', 'end', 'intensity', 'pitch',
+                                         'syllables', 'text'])):
+    """turn of the human speaker
+
+    attributes:
+        start: beginning of the turn in the human audio in seconds
+        end: end of the turn in the human audio in seconds
+        intensity: mean intensity of the turn
+        pitch: mean pitch of the turn
+        syllables: number of syllables in the turn
+        text: transcription of the turn
+    """
+    __slots__ = ()
+
+    @property
+    def duration(self):
+        """length of the turn in seconds"""
+        return self.end - self.start
+
+    @property
+    def speech_rate(self):
+        """syllables per second"""
+        return self.syllables / self.duration
+
+
+class SynthTurn(namedtuple('SynthTurn', ['syllables', 'text', 'intensity',
+                                         'pitch', 'speech_rate'])):
+    """turn of the synthesized speaker
+
+    attributes:
+        syllables: number of syllables in the turn
+        text: text to synthesize
+        intensity: intensity to synthesize with (None unless annotated)
+        pitch: pitch to synthesize with (None unless annotated)
+        speech_rate: speech rate to synthesize with (None unless annotated)
+    """
+    __slots__ = ()
+
+
+def parse_line(line, synth_features=False):
+    """parses one line of a transcription
+
+    args:
+        line: the line, with or without trailing newline
+        synth_features: whether synthesized turns are annotated for intensity,
+            pitch and speech rate
+
+    returns:
+        SilenceTurn, HumanTurn or SynthTurn
+
+    raises:
+        ValueError: the line is malformed
+    """
+    items = line.rstrip('\r\n').split(' ')
+    try:
+        if items[0] == TURN_TYPE_SILENCE:
+            if len(items) < 2:
+                raise ValueError('missing duration')
+            return SilenceTurn(float(items[1]))
+        elif items[0] == TURN_TYPE_HUMAN:
+            if len(items) < 6:
+                raise ValueError('expected start, end, intensity, pitch and '
+                                 'syllables')
+            turn = HumanTurn(float(items[1]), float(items[2]), float(items[3]),
+                             float(items[4]), float(items[5]),
+                             ' '.join(items[6:]))
+            if turn.duration <= 0:
+                raise ValueError('end of turn before its start')
+            return turn
+        elif items[0] == TURN_TYPE_SYNTH:
+            if synth_features:
+                if len(items) < 5:
+                    raise ValueError('expected syllables, intensity, pitch '
+                                     'and speech rate')
+                return SynthTurn(float(items[1]), ' '.join(items[5:]),
+                                 float(items[2]), float(items[3]),
+                                 float(items[4]))
+            if len(items) < 2:
+                raise ValueError('missing syllables')
+            return SynthTurn(float(items[1]), ' '.join(items[2:]), None, None,
+                             None)
+        raise ValueError('unknown turn type %r' % items[0])
+    except ValueError as error:
+        raise ValueError('%s: %r' % (error, line.rstrip('\r\n')))
+
+
+def parse_lines(lines, synth_features=False, name='<lines>'):
+    """lazily parses the lines of a transcription; empty lines are skipped
+
+    args:
+        lines: iterable of lines (e.g. an open file)
+        synth_features: see parse_line()
+        name: name of the transcription used in error messages
+
+    yields:
+        SilenceTurn, HumanTurn and SynthTurn instances in transcription order
+
+    raises:
+        ValueError: a line is malformed; the message names its line number
+    """
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield parse_line(line, synth_features)
+        except ValueError as error:
+            raise ValueError('%s, line %d: %s' % (name, line_number, error))
+
+
+def iter_turns(trans_fname, synth_features=False):
+    """lazily parses a transcription file; see parse_lines()"""
+    with open(trans_fname, 'r') as trans_file:
+        for turn in parse_lines(trans_file, synth_features, trans_fname):
+            yield turn
+
+
+def validate(trans_fname, synth_features=False):
+    """checks a whole transcription file before any work is done with it
+
+    args:
+        trans_fname: name of the transcription file
+        synth_features: see parse_line()
+
+    returns:
+        dictionary with the number of turns per type (turn class name)
+
+    raises:
+        ValueError: a line is malformed; see parse_lines()
+    """
+    counts = {'SilenceTurn': 0, 'HumanTurn': 0, 'SynthTurn': 0}
+    for turn in iter_turns(trans_fname, synth_features):
+        counts[type(turn).__name__] += 1
+    return counts
@@ -0,0 +1,46 @@
+import os
+import sys
+import pytest
+
+"""
+Shared setup of the tests: the modules in src are imported directly and, like
+when they are run, use paths relative to src (e.g. '../misc').
+"""
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+
+
+@pytest.fixture(autouse=True)
+def src_cwd(monkeypatch):
+    """runs every test in src"""
+    monkeypatch.chdir(SRC_DIR)
+
+
+@pytest.fixture
+def tmp_remote_tts(monkeypatch, tmp_path):
+    """points all files written by remote_tts to a temporary directory"""
+    import remote_tts
+    monkeypatch.setattr(remote_tts, 'TMP_DIR', str(tmp_path))
+    monkeypatch.setattr(remote_tts, 'SCRATCH_DIR', None)
+    monkeypatch.setattr(remote_tts, 'SYNTHESIS_CACHE_DIR',
+                        str(tmp_path / 'synthesis_cache'))
+    monkeypatch.setattr(remote_tts, 'SYLLABLE_CACHE_FNAME',
+                        str(tmp_path / 'syllable_counts.json'))
+    monkeypatch.setattr(remote_tts, '_synthesis_cache', None)
+    monkeypatch.setattr(remote_tts, '_syllable_cache', None)
+    return remote_tts
+
+
+@pytest.fixture
+def stub_server(tmp_remote_tts):
+    """runs a stub mary server (see stub_tts) that remote_tts talks to"""
+    import stub_tts
+    server = stub_tts.start_server()
+    old_endpoints = list(tmp_remote_tts.MARY_ENDPOINTS)
+    tmp_remote_tts.configure_mary(endpoints=[server.server_address])
+    yield server
+    server.shutdown()
+    server.server_close()
+    tmp_remote_tts.configure_mary(endpoints=old_endpoints)
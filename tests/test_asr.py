@@ -0,0 +1,82 @@
+import io
+import json
+import numpy
+import pytest
+import asr
+import audio
+import stub_tts
+
+RATE = 16000
+
+
+def get_speech(syll_count=6):
+    """returns stub speech of syllables separated by short pauses"""
+    return stub_tts.generate_audio(syll_count, 3.0, 120.0, seed=0, rate=RATE)
+
+
+def get_request(samples, rate=RATE):
+    return (json.dumps({'rate': rate, 'samples': len(samples)}) + '\n').encode(
+        'utf-8') + numpy.asarray(samples).astype('<i2').tobytes()
+
+
+def test_stub_decoder_finds_syllables():
+    decoder = asr.StubDecoder(['hello', 'there'], min_pause_secs=0.05)
+    transcription = decoder.decode(get_speech(), RATE)
+    assert len(transcription.words) == 6
+    assert transcription.text == 'hello there hello there hello there'
+    starts = [word.start for word in transcription.words]
+    assert starts == sorted(starts)
+    assert all(word.end > word.start for word in transcription.words)
+
+
+def test_stub_decoder_merges_short_pauses():
+    transcription = asr.StubDecoder(min_pause_secs=10.0).decode(
+        get_speech(), RATE)
+    assert transcription.text == 'speech'
+    assert asr.StubDecoder().decode(numpy.zeros(RATE, numpy.int16),
+                                    RATE).words == []
+
+
+def test_serve_answers_every_request():
+    in_file = io.BytesIO(get_request(get_speech()) +
+                         get_request(numpy.zeros(RATE, numpy.int16)) +
+                         get_request([], 0))
+    out_file = io.BytesIO()
+    asr.serve(asr.DECODER_STUB, {'min_pause_secs': 0.05}, in_file, out_file)
+    responses = [json.loads(line)
+                 for line in out_file.getvalue().decode('utf-8').splitlines()]
+    assert len(responses) == 3
+    assert len(responses[0]['words']) == 6
+    assert responses[1] == {'text': '', 'words': []}
+    # the decoder failed (no sample rate), but the server kept serving
+    assert 'error' in responses[2]
+
+
+def test_client_keeps_process_and_restarts_it():
+    client = asr.DecoderClient(asr.DECODER_STUB, {'words': ['hi'],
+                                                  'min_pause_secs': 0.05})
+    try:
+        buffer = audio.AudioBuffer(get_speech(), RATE)
+        expected = asr.StubDecoder(['hi'], min_pause_secs=0.05).decode(
+            buffer.samples, RATE)
+        assert client.transcribe(buffer) == expected
+        process = client.process
+        assert client.transcribe(buffer) == expected
+        assert client.process is process
+        with pytest.raises(RuntimeError):
+            client.transcribe(audio.AudioBuffer(get_speech(), 0))
+        process.kill()
+        process.wait()
+        # a new process is started on the next request
+        assert client.transcribe(buffer) == expected
+        assert client.process is not process
+    finally:
+        client.close()
+    assert client.process is None
+
+
+def test_get_client_is_shared_per_config():
+    client = asr.get_client(asr.DECODER_STUB, {'words': ['a'], 'load_secs': 0})
+    assert asr.get_client(asr.DECODER_STUB,
+                          {'load_secs': 0, 'words': ['a']}) is client
+    assert asr.get_client(asr.DECODER_STUB, {'words': ['b']}) is not client
@@ -0,0 +1,62 @@
+import asyncio
+import json
+import calibrate_speech_rates
+import remote_tts
+
+
+def test_invert_accepts_unsigned_modifiers():
+    rates_dict = {'mary': {'voice': {'-50%': [3.0, 0.1], '0%': [5.0, 0.1],
+                                     '50%': [7.0, 0.1]}}}
+    inverse_dict = calibrate_speech_rates.invert(rates_dict)
+    assert inverse_dict['mary']['voice']['3.0'] == '-50%'
+    assert inverse_dict['mary']['voice']['5.0'] == '+0%'
+    assert inverse_dict['mary']['voice']['8.0'] == '+50%'
+
+
+def test_load_checkpoint_normalizes_modifiers(tmp_path):
+    checkpoint_fname = str(tmp_path / 'checkpoint.jsonl')
+    with open(checkpoint_fname, 'w') as checkpoint_file:
+        checkpoint_file.write(json.dumps({'tts': 'mary', 'voice': 'voice',
+                                          'modifier': '5%', 'line': 0,
+                                          'rate': 4.0}) + '\n')
+        checkpoint_file.write('{"tts": "mary", "voi')
+    assert calibrate_speech_rates.load_checkpoint(checkpoint_fname) == \
+        {('mary', 'voice', '+5%', 0): 4.0}
+
+
+def test_update_json_keeps_key_order(tmp_path):
+    fname = str(tmp_path / 'rates.json')
+    with open(fname, 'w') as json_file:
+        json.dump({'mary': {'b': {'+1%': 1}, 'a': {'+0%': 0}}}, json_file)
+    calibrate_speech_rates.update_json(
+        fname, {'mary': {'a': {'+2%': 2}, 'c': {'+3%': 3}}})
+    with open(fname, 'r') as json_file:
+        assert list(json.load(json_file)['mary'].items()) == \
+            [('b', {'+1%': 1}), ('a', {'+2%': 2}), ('c', {'+3%': 3})]
+
+
+def test_run_jobs_bounds_concurrency(monkeypatch, tmp_path):
+    corpus = [(5, 'line %d' % i) for i in range(20)]
+    running = [0, 0]  # currently running, maximum
+
+    async def measure_job(tts_type, voice, modifier, syll_count, text):
+        running[0] += 1
+        running[1] = max(running)
+        await asyncio.sleep(0.001)
+        running[0] -= 1
+        return float(syll_count)
+
+    monkeypatch.setattr(remote_tts, 'load_syllable_count_corpus',
+                        lambda: corpus)
+    monkeypatch.setattr(calibrate_speech_rates, 'measure_job', measure_job)
+    checkpoint_fname = str(tmp_path / 'checkpoint.jsonl')
+    results = asyncio.run(calibrate_speech_rates.run_jobs_async(
+        remote_tts.TTS_TYPE_MARY, ['voice'], ['+0%', '+10%'],
+        checkpoint_fname, workers=3))
+    assert len(results) == 40
+    assert running[1] == 3
+    # a second run finds every job in the checkpoint
+    monkeypatch.setattr(calibrate_speech_rates, 'measure_job', None)
+    assert asyncio.run(calibrate_speech_rates.run_jobs_async(
+        remote_tts.TTS_TYPE_MARY, ['voice'], ['+0%', '+10%'],
+        checkpoint_fname, workers=3)) == results
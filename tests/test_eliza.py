@@ -0,0 +1,114 @@
+import random
+import re
+import sys
+import types
+import pytest
+
+try:
+    import pyaudio  # noqa: F401
+except ImportError:
+    # eliza records through pyaudio, which response generation does not need
+    sys.modules['pyaudio'] = types.ModuleType('pyaudio')
+import eliza  # noqa: E402
+
+# pronoun swaps as sequential substitutions, as generate_response() applied
+# them before the rules moved to RULES_FNAME
+SEQUENTIAL_SUBSTITUTIONS = [
+    (r"\b(I'M|I AM)\b", "you are"),
+    (r"[A-Z]\b(AM)\b", " are"),
+    (r"\b(I'VE)\b", "you have"),
+    (r"\b(I WAS)\b", "you were"),
+    (r"\b(I|ME)\b", "you"),
+    (r"\b(MY)\b", "your"),
+    (r"\b(MYSELF)\b", "yourself"),
+    (r"\b(MINE)\b", "yours"),
+    (r"\b(YOU'RE|YOU ARE)\b", "i am"),
+    (r"\b(YOU'VE)\b", "i have"),
+    (r"\b(YOU WERE)\b", "i was"),
+    (r"\b(YOU)\b", "i"),
+    (r"\b(YOUR)\b", "my"),
+    (r"\b(YOURSELF)\b", "myself"),
+    (r"\b(YOURS)\b", "mine")
+]
+WORDS = ['i', "i'm", 'am', "i've", 'was', 'me', 'my', 'myself', 'mine', 'you',
+         "you're", 'are', "you've", 'were', 'your', 'yourself', 'yours',
+         'always', 'every', 'time', 'nobody', 'never', 'not', 'ever', 'once',
+         'love', 'hate', 'like', "can't", 'cannot', 'sad', 'tired', 'happy',
+         'content', "don't", 'do', 'family', 'friends', 'mother', 'dad',
+         'boyfriend', 'wife', 'kids', 'children', 'daughters', 'the', 'dog',
+         'really', 'today', 'all', 'how', 'what', 'why', 'whose', 'somewhat']
+
+
+def generate_response_sequentially(in_str, rules):
+    """reference of generate_response(): substitutes pronouns one regex after
+    the other and tries every rule in order"""
+    if not in_str:
+        choice = random.randint(0, len(rules.empty_responses) - 1)
+        return rules.empty_responses[choice]
+    if any(in_str.find(word + ' ') == 0 for word in rules.question_words):
+        choice = random.randint(0, len(rules.question_responses) - 1)
+        return rules.question_responses[choice]
+    if random.randint(1, rules.standard_response_odds) == 1:
+        choice = random.randint(0, len(rules.standard_responses) - 1)
+        return rules.standard_responses[choice]
+    out_str = in_str.upper()
+    for regex, subst_str in SEQUENTIAL_SUBSTITUTIONS:
+        out_str = re.sub(regex, subst_str, out_str)
+    for pattern, responses in rules.rules:
+        if re.match(pattern, out_str):
+            choice = random.randint(0, len(responses) - 1)
+            return re.sub(pattern, responses[choice], out_str)
+    return out_str
+
+
+def generate_inputs(count, seed=0):
+    rng = random.Random(seed)
+    inputs = ['']
+    for _ in range(count):
+        inputs.append(' '.join(rng.choice(WORDS)
+                               for _ in range(rng.randint(1, 8))))
+    return inputs
+
+
+@pytest.fixture
+def rules():
+    return eliza.ResponseRules(eliza.RULES_FNAME)
+
+
+def test_responses_identical_to_sequential_rules(rules):
+    for seed, in_str in enumerate(generate_inputs(5000)):
+        random.seed(seed)
+        expected = generate_response_sequentially(in_str, rules)
+        expected_state = random.getstate()
+        random.seed(seed)
+        assert eliza.generate_response(in_str, rules) == expected, in_str
+        # the same random numbers were drawn
+        assert random.getstate() == expected_state
+
+
+def test_substitute_swaps_pronouns_once(rules):
+    assert rules.substitute("I AM SURE YOU LIKE MY DOG") == \
+        'you are SURE i LIKE your DOG'
+    assert rules.substitute("YOU'RE MINE AND I'M YOURS") == \
+        'i am yours AND you are mine'
+
+
+def test_index_only_lists_rules_of_keywords(rules):
+    assert rules.match('THE DOG') is None
+    match, responses = rules.match('you LOVE THE DOG')
+    assert match.groups() == ('LOVE', 'THE DOG')
+    assert 'tell me what you \\1 about \\2' in responses
+    for word, indices in rules.index.items():
+        assert indices == sorted(set(indices))
+
+
+def test_rules_file_requires_word_keywords(tmp_path):
+    fname = str(tmp_path / 'rules.json')
+    with open(fname, 'w') as rules_file:
+        rules_file.write('{"empty_responses": [], "question_words": [], '
+                         '"question_responses": [], "standard_responses": '
+                         '[], "standard_response_odds": 5, "substitutions": '
+                         '[], "rules": [{"keywords": ["?"], "pattern": ".*", '
+                         '"responses": []}]}')
+    with pytest.raises(ValueError):
+        eliza.ResponseRules(fname)
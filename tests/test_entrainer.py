@@ -0,0 +1,156 @@
+import numpy
+import pytest
+import entrainer
+
+
+class ListEntrainer(object):
+    """reference implementation summing the whole turn history on every
+    proposal, as Entrainer did before it kept running sums"""
+
+    def __init__(self, def_val, init_glo_weight, init_loc_weight,
+                 glo_conv, loc_conv, first_k):
+        self.def_val = def_val
+        self.glo_weight = max(init_glo_weight, 0)
+        self.loc_weight = max(init_loc_weight, 0)
+        self.glo_weight_tmp = self.glo_weight
+        self.loc_weight_tmp = self.loc_weight
+        if self.glo_weight + self.loc_weight > 1:
+            self.glo_weight = (self.glo_weight /
+                               (self.glo_weight + self.loc_weight))
+            self.loc_weight = (self.loc_weight /
+                               (self.glo_weight + self.loc_weight))
+        self.glo_conv = glo_conv
+        self.loc_conv = loc_conv
+        self.first_k = max(first_k, 1)
+        self.def_weight = 1 - self.glo_weight - self.loc_weight
+        self.user_turns = []
+        self.system_turns = []
+
+    def register_input(self, val, len_s):
+        if len(self.user_turns) == len(self.system_turns):
+            self.user_turns.append([val, len_s])
+        else:
+            last = self.user_turns.pop()
+            average_val = (last[0] * last[1] + val * len_s) / (last[1] + len_s)
+            self.user_turns.append([average_val, last[1] + len_s])
+
+    def register_output(self, val, len_s):
+        if len(self.system_turns) < len(self.user_turns):
+            self.system_turns.append([val, len_s])
+        else:
+            last = self.system_turns.pop()
+            average_val = (last[0] * last[1] + val * len_s) / (last[1] + len_s)
+            self.system_turns.append([average_val, last[1] + len_s])
+
+    def propose_output(self):
+        if len(self.system_turns) < len(self.user_turns):
+            k = min(len(self.user_turns), self.first_k)
+            k_average = sum(val[0] for val in self.user_turns[0:k]) / k
+            out_sum = sum(val[0] for val in self.system_turns)
+            glo = len(self.user_turns) * k_average - out_sum
+            glo *= self.glo_weight
+            loc = self.loc_weight * self.user_turns[-1][0]
+            proposed_val = self.def_weight * self.def_val + glo + loc
+            self.glo_weight_tmp = max(self.glo_weight_tmp + self.glo_conv, 0)
+            self.loc_weight_tmp = max(self.loc_weight_tmp + self.loc_conv, 0)
+            if self.glo_weight_tmp + self.loc_weight_tmp > 1:
+                self.glo_weight = (self.glo_weight_tmp /
+                                   (self.glo_weight_tmp + self.loc_weight_tmp))
+                self.loc_weight = (self.loc_weight_tmp /
+                                   (self.glo_weight_tmp + self.loc_weight_tmp))
+            else:
+                self.glo_weight = self.glo_weight_tmp
+                self.loc_weight = self.loc_weight_tmp
+            self.def_weight = 1 - self.glo_weight - self.loc_weight
+        else:
+            proposed_val = self.system_turns[-1][0]
+        return proposed_val
+
+
+CONFIGS = [(94, 0.3, 0.2, 0.1, 0.3, 12), (4.5, 0.7, 0.6, -0.05, 0.02, 3),
+           (65.0, 0.0, 1.0, 0.0, -0.1, 1), (200.0, 1.5, 0.5, 0.2, 0.2, 0)]
+
+
+def get_calls(seed, turns=200):
+    """returns a random sequence of entrainer calls with several utterances
+    per turn; outputs are the proposed values plus an error"""
+    rng = numpy.random.default_rng(seed)
+    calls = []
+    for _ in range(turns):
+        for _ in range(rng.integers(1, 4)):
+            calls.append(('input', rng.uniform(50, 300),
+                          rng.uniform(0.2, 5.0)))
+        for _ in range(rng.integers(1, 3)):
+            calls.append(('output', rng.normal(0, 5), rng.uniform(0.2, 5.0)))
+    return calls
+
+
+def replay(entr, calls):
+    proposals = []
+    for call, val, len_s in calls:
+        if call == 'input':
+            entr.register_input(val, len_s)
+        else:
+            proposal = entr.propose_output()
+            proposals.append(proposal)
+            entr.register_output(proposal + val, len_s)
+    return proposals
+
+
+@pytest.mark.parametrize('config', CONFIGS)
+@pytest.mark.parametrize('seed', range(3))
+def test_proposals_identical_to_list_implementation(config, seed):
+    calls = get_calls(seed)
+    reference = ListEntrainer(*config)
+    expected = replay(reference, calls)
+    for max_history in [None, 5]:
+        entr = entrainer.Entrainer(*config, max_history=max_history)
+        # bit-identical, not only close
+        assert replay(entr, calls) == expected
+    entr = entrainer.Entrainer(*config)
+    replay(entr, calls)
+    assert entr.user_turns == reference.user_turns
+    assert entr.system_turns == reference.system_turns
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_batch_identical_to_single_entrainers(seed):
+    calls = get_calls(seed)
+    expected = numpy.array([replay(entrainer.Entrainer(*config), calls)
+                            for config in CONFIGS]).T
+    batch = entrainer.BatchEntrainer(*zip(*CONFIGS))
+    assert numpy.array_equal(numpy.array(replay(batch, calls)), expected)
+
+
+def test_running_sum_matches_builtin_sum():
+    values = list(numpy.random.default_rng(0).normal(0, 1e6, 1000)) + \
+        [1e16, 1.0, -1e16, 0.1]
+    running_sum = entrainer.RunningSum()
+    for i, val in enumerate(values):
+        assert running_sum.get_value(val) == sum(values[:i + 1])
+        running_sum.add(val)
+        assert running_sum.get_value() == sum(values[:i + 1])
+
+
+def test_turn_history_ring_buffer():
+    history = entrainer.TurnHistory(3)
+    history.set_last(9.0, 9.0)
+    assert history.to_list() == []
+    for i in range(5):
+        history.append(float(i), 1.0)
+    assert len(history) == 3
+    assert history.to_list() == [[2.0, 1.0], [3.0, 1.0], [4.0, 1.0]]
+    history.set_last(5.0, 2.0)
+    assert history.to_list() == [[2.0, 1.0], [3.0, 1.0], [5.0, 2.0]]
+    history.append(6.0, 1.0)
+    assert history.to_list() == [[3.0, 1.0], [5.0, 2.0], [6.0, 1.0]]
+
+
+def test_turn_history_limits():
+    unlimited = entrainer.TurnHistory()
+    for i in range(100):
+        unlimited.append(float(i), 1.0)
+    assert len(unlimited) == 100 and unlimited.to_list()[-1] == [99.0, 1.0]
+    empty = entrainer.TurnHistory(0)
+    empty.append(1.0, 1.0)
+    assert empty.to_list() == []
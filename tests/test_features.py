@@ -0,0 +1,80 @@
+import shutil
+import warnings
+import numpy
+import pytest
+import audio
+import features
+import stub_tts
+
+
+def get_sine(amplitude, frequency, secs=1.0, rate=audio.DEFAULT_RATE):
+    times = numpy.arange(audio.secs_to_samples(secs, rate)) / float(rate)
+    return amplitude * numpy.sin(2 * numpy.pi * frequency * times)
+
+
+@pytest.mark.parametrize('amplitude', [1000.0, 10000.0])
+def test_numpy_intensity_of_sine(amplitude):
+    # praat's intensity is relative to 2e-5 pascal with samples in pascal
+    expected = 10 * numpy.log10((amplitude / 32768.0) ** 2 / 2 / 4e-10)
+    feat_val_dict = features.extract_samples(get_sine(amplitude, 200.0),
+                                             audio.DEFAULT_RATE)
+    assert abs(float(feat_val_dict['intensity_mean']) - expected) <= 0.5
+
+
+@pytest.mark.parametrize('pitch', [90.0, 120.0, 200.0])
+def test_numpy_pitch_of_stub_speech(pitch):
+    samples = stub_tts.generate_audio(10, 4.0, pitch, seed=0)
+    feat_val_dict = features.extract_samples(samples, audio.DEFAULT_RATE)
+    assert abs(float(feat_val_dict['pitch_mean']) - pitch) <= 2.0
+    assert 60.0 <= float(feat_val_dict['intensity_mean']) <= 90.0
+
+
+def test_numpy_durations_of_stub_speech():
+    samples = stub_tts.generate_audio(10, 4.0, 120.0, seed=0)
+    feat_val_dict = features.extract_samples(samples, audio.DEFAULT_RATE)
+    total = len(samples) / float(audio.DEFAULT_RATE)
+    assert float(feat_val_dict['total_duration']) == pytest.approx(total)
+    # trailing silence is excluded from the main duration
+    assert float(feat_val_dict['main_duration']) < total
+    assert float(feat_val_dict['speech_duration']) < \
+        float(feat_val_dict['main_duration'])
+
+
+def test_numpy_jitter_shimmer_are_nan():
+    feat_val_dict = features.extract_buffer(
+        audio.AudioBuffer(get_sine(1000.0, 200.0)),
+        backend=features.BACKEND_NUMPY)
+    assert numpy.isnan(float(feat_val_dict['jitter_local']))
+    assert numpy.isnan(float(feat_val_dict['shimmer_local']))
+
+
+def test_batch_respects_backend():
+    samples = get_sine(1000.0, 200.0)
+    batch = features.extract_batch([(samples, audio.DEFAULT_RATE)],
+                                   backend=features.BACKEND_NUMPY)
+    assert batch[0] == features.extract_samples(audio.to_int16(samples),
+                                                audio.DEFAULT_RATE)
+    with pytest.raises(ValueError):
+        features.extract_batch([(samples, audio.DEFAULT_RATE)],
+                               backend=features.BACKEND_PRAAT)
+
+
+@pytest.mark.skipif(not features.parselmouth and not shutil.which('praat'),
+                    reason='neither parselmouth nor praat installed')
+def test_conformance_with_praat(tmp_path):
+    fnames = []
+    for i, pitch in enumerate([90.0, 120.0, 200.0]):
+        fname = str(tmp_path / ('stub%d.wav' % i))
+        audio.write_wav(fname, stub_tts.generate_audio(10, 4.0, pitch, i))
+        fnames.append(fname)
+    assert features.check_conformance(fnames) == []
+
+
+def test_default_backend_warns_once_without_parselmouth(monkeypatch):
+    monkeypatch.setattr(features, 'parselmouth', None)
+    monkeypatch.setattr(features, '_fallback_warned', False)
+    with pytest.warns(RuntimeWarning):
+        assert features.get_default_backend() == features.BACKEND_PRAAT
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        assert features.get_default_backend() == features.BACKEND_PRAAT
@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+import features
+import profiling
+import remote_tts
+import stub_tts
+
+
+@pytest.mark.parametrize('rate_tolerance,pitch_tolerance',
+                         [(0.0, 1.0), (0.05, 0.0), (-0.05, 1.0)])
+def test_search_rejects_non_positive_tolerances(rate_tolerance,
+                                                pitch_tolerance):
+    def synthesize_candidate(rate_modifier, pitch):
+        raise AssertionError('synthesized despite invalid tolerance')
+
+    rates_dict = {'5.0': '+0%'}
+    with pytest.raises(ValueError):
+        remote_tts.search_rate_and_pitch(
+            synthesize_candidate, rates_dict, 10, 5.0, 120.0,
+            rate_tolerance=rate_tolerance, pitch_tolerance=pitch_tolerance)
+
+
+def test_run_coroutine_inside_running_loop():
+    async def answer():
+        return 42
+
+    async def main():
+        # a blocking caller inside a coroutine, where asyncio.run() fails
+        return remote_tts.run_coroutine(answer())
+
+    assert remote_tts.run_coroutine(answer()) == 42
+    assert asyncio.run(main()) == 42
+
+
+def test_detect_speech_rate_inside_running_loop(monkeypatch, stub_server):
+    monkeypatch.setattr(remote_tts, 'FEATURE_BACKEND', features.BACKEND_NUMPY)
+    monkeypatch.setattr(remote_tts, 'load_syllable_count_corpus',
+                        lambda: [(4, 'one two three four'),
+                                 (3, 'five six seven')])
+
+    async def main():
+        return remote_tts.detect_tts_speech_rate(
+            remote_tts.TTS_TYPE_MARY, remote_tts.DEFAULT_VOICE_MARY, '+0%')
+
+    mean, std = asyncio.run(main())
+    assert mean > 0 and std >= 0
+
+
+def test_count_syllables_splits_batch_around_expanded_word(monkeypatch,
+                                                            tmp_remote_tts):
+    requests = []
+
+    def request_phonemes(in_str, ip_addr=None, port=None):
+        # like mary, numbers are expanded into several tokens
+        requests.append(in_str)
+        words = []
+        for word in in_str.split():
+            words.extend(['nineteen', 'ninety'] if word == '1990' else [word])
+        return stub_tts.get_phonemes_xml(words).encode('utf-8')
+
+    monkeypatch.setattr(remote_tts, 'request_phonemes', request_phonemes)
+    texts = ['the summer', 'of 1990 was', 'very hot indeed']
+    assert remote_tts.count_syllables_texts(texts) == [3, 8, 5]
+    # all words were requested at once, then before, at and after the number;
+    # only the text with the number was requested on its own
+    assert requests == ['the summer of 1990 was very hot indeed',
+                        'was very hot indeed', '1990', 'the summer of',
+                        'of 1990 was']
+    cache = remote_tts.get_syllable_cache()
+    assert '1990' not in cache['words']
+    assert cache['words']['indeed'] == 2
+    assert cache['texts'] == {'of 1990 was': 8}
+    requests[:] = []
+    assert remote_tts.count_syllables_texts(['hot summer', 'of 1990 was']) \
+        == [3, 8]
+    assert requests == []
+
+
+def test_streaming_requests_are_timed_separately(stub_server):
+    sink = profiling.HistogramSink()
+    old_sink = profiling.set_sink(sink)
+    try:
+        params = {'INPUT_TEXT': 'hello there', 'INPUT_TYPE': 'TEXT',
+                  'OUTPUT_TYPE': 'AUDIO', 'LOCALE': 'en_US',
+                  'AUDIO': 'WAVE_FILE'}
+        remote_tts.post_mary(params)
+        b''.join(remote_tts.post_mary(params, stream=True))
+    finally:
+        profiling.set_sink(old_sink)
+    summary = sink.summary()
+    assert summary['remote_tts.post_mary'][0] == 1
+    assert summary['remote_tts.post_mary.headers'][0] == 1
@@ -0,0 +1,47 @@
+import threading
+import numpy
+import results
+
+
+def test_append_and_load(tmp_path):
+    fname = str(tmp_path / 'results.jsonl')
+    writer = results.ResultsWriter(fname)
+    writer.append([])
+    writer.append([{'id': 'a', 'turn': 0, 'p_tgt': 120.0, 'p_act': 121.5},
+                   {'id': 'a', 'turn': 1, 'p_tgt': 130.0, 'extra': 2}])
+    columns = results.load(fname)
+    assert list(columns['id']) == ['a', 'a']
+    assert list(columns['turn']) == [0.0, 1.0]
+    assert columns['p_act'][0] == 121.5 and numpy.isnan(columns['p_act'][1])
+    assert numpy.isnan(columns['extra'][0]) and columns['extra'][1] == 2.0
+    assert set(results.FIELDS) <= set(columns)
+    assert list(results.load(fname, ['turn'])) == ['turn']
+
+
+def test_incomplete_last_line_is_skipped(tmp_path):
+    fname = str(tmp_path / 'results.jsonl')
+    results.ResultsWriter(fname).append([{'id': 'a', 'turn': 0}])
+    with open(fname, 'a') as results_file:
+        results_file.write('{"id": "a", "tu')
+    assert results.read_records(fname) == [{'id': 'a', 'turn': 0}]
+
+
+def test_concurrent_appends_are_not_interleaved(tmp_path):
+    fname = str(tmp_path / 'results.jsonl')
+    writer = results.ResultsWriter(fname)
+
+    def append(thread_index):
+        for batch in range(20):
+            writer.append([{'id': str(thread_index), 'turn': batch * 5 + i,
+                            'text': 'x' * 1000} for i in range(5)])
+
+    threads = [threading.Thread(target=append, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    records = results.read_records(fname)
+    assert len(records) == 400
+    for thread_index in range(4):
+        assert [record['turn'] for record in records
+                if record['id'] == str(thread_index)] == list(range(100))
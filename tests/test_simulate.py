@@ -0,0 +1,83 @@
+import json
+import numpy
+import simulate
+import switchboard
+import transcript
+
+SWITCHBOARD_DIR = '../misc/switchboard'
+LOG_FNAME = SWITCHBOARD_DIR + '/features.log'
+
+
+def load_instances():
+    with open(SWITCHBOARD_DIR + '/config.json', 'r') as json_file:
+        return [instance for condition in json.load(json_file)
+                for instance in condition]
+
+
+def replay_single(instance, trans_fname):
+    """simulates one instance without errors through separate entrainers, as
+    switchboard.generate_conversation() uses them"""
+    entrainers = switchboard.create_entrainers(instance)
+    targets = []
+    for turn in transcript.iter_turns(trans_fname):
+        if isinstance(turn, transcript.HumanTurn):
+            for entr, val in zip(entrainers, [turn.pitch, turn.speech_rate,
+                                              turn.intensity]):
+                entr.register_input(val, turn.duration)
+        elif isinstance(turn, transcript.SynthTurn):
+            target = [entr.propose_output() for entr in entrainers]
+            for entr, val in zip(entrainers, target):
+                entr.register_output(val, 1)
+            targets.append(target)
+    return numpy.array(targets)
+
+
+def test_batch_turns_identical_to_single_entrainers():
+    instances = load_instances()
+    trans_fname = SWITCHBOARD_DIR + '/part1.text'
+    targets, actuals = simulate.simulate_turns(
+        trans_fname, switchboard.create_batch_entrainer(instances),
+        simulate.NoErrorModel(), numpy.random.default_rng(0))
+    assert numpy.array_equal(targets, actuals)
+    for i, instance in enumerate(instances):
+        assert numpy.array_equal(targets[:, i],
+                                 replay_single(instance, trans_fname))
+
+
+def test_grid_log_has_turns_of_real_log(tmp_path):
+    log_fname = str(tmp_path / 'simulated_features.log')
+    error_model = simulate.GaussianErrorModel.fit(LOG_FNAME)
+    with open(log_fname, 'w') as log_file:
+        log_file.write(simulate.simulate_grid(load_instances(), error_model))
+    blocks = simulate.read_log(log_fname)
+    # the real log also has blocks of instances removed from config.json since
+    real_blocks = dict((block['id'], block)
+                       for block in simulate.read_log(LOG_FNAME))
+    assert len(blocks) == 2 * len(load_instances())
+    for block in blocks:
+        real_block = real_blocks[block['id']]
+        for prefix in simulate.LOG_PREFIXES:
+            assert len(block[prefix + '_tgt']) == \
+                len(real_block[prefix + '_tgt'])
+
+
+def test_simulation_is_seeded():
+    instances = load_instances()[:2]
+    error_model = simulate.GaussianErrorModel([0.0, 0.0, 0.0],
+                                              [1.0, 0.1, 0.5])
+    log = simulate.simulate_grid(instances, error_model, seed=1)
+    assert simulate.simulate_grid(instances, error_model, seed=1) == log
+    assert simulate.simulate_grid(instances, error_model, seed=2) != log
+
+
+def test_fitted_errors_match_log():
+    error_model = simulate.GaussianErrorModel.fit(LOG_FNAME)
+    errors = [[] for _ in simulate.FEATURES]
+    for block in simulate.read_log(LOG_FNAME):
+        for i, prefix in enumerate(simulate.LOG_PREFIXES):
+            errors[i].extend(numpy.subtract(block[prefix + '_act'],
+                                            block[prefix + '_tgt']))
+    assert numpy.allclose(error_model.means, [numpy.mean(errs)
+                                              for errs in errors])
+    assert numpy.allclose(error_model.stds, [numpy.std(errs)
+                                             for errs in errors])
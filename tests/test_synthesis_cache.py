@@ -0,0 +1,68 @@
+import os
+from synthesis_cache import SynthesisCache
+
+
+def get_keys(cache):
+    return [os.path.basename(fname)[:-len('.wav')]
+            for fname in cache._entries]
+
+
+def test_fetch_and_read(tmp_path):
+    cache = SynthesisCache(str(tmp_path / 'cache'))
+    key = SynthesisCache.get_key('mary', 'voice', 'TEXT', 'hello')
+    assert cache.read(key) is None
+    cache.store_data(key, b'RIFF')
+    assert cache.read(key) == b'RIFF'
+    out_fname = str(tmp_path / 'out.wav')
+    assert cache.fetch(key, out_fname)
+    with open(out_fname, 'rb') as out_file:
+        assert out_file.read() == b'RIFF'
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_key_depends_on_all_fields():
+    key = SynthesisCache.get_key('mary', 'voice', 'TEXT', 'hello')
+    assert key != SynthesisCache.get_key('mary', 'voice', 'SSML', 'hello')
+    assert key != SynthesisCache.get_key('mary', 'other', 'TEXT', 'hello')
+
+
+def test_evicts_least_recently_used_to_low_water(tmp_path):
+    cache = SynthesisCache(str(tmp_path / 'cache'), max_bytes=1000)
+    for key in 'abcde':
+        cache.store_data(key, b'x' * 200)
+    # a hit makes 'a' the most recently used entry
+    assert cache.read('a') is not None
+    assert get_keys(cache) == ['b', 'c', 'd', 'e', 'a']
+    # 1100 bytes exceed max_bytes, so entries are evicted down to 900
+    cache.store_data('f', b'x' * 100)
+    assert get_keys(cache) == ['c', 'd', 'e', 'a', 'f']
+    assert cache._size == 900
+    # then one more store evicts several entries at once
+    cache.store_data('g', b'x' * 300)
+    assert get_keys(cache) == ['e', 'a', 'f', 'g']
+    assert cache._size == 800
+    assert sorted(os.listdir(cache.cache_dir)) == \
+        ['a.wav', 'e.wav', 'f.wav', 'g.wav']
+
+
+def test_replacing_entry_keeps_size(tmp_path):
+    cache = SynthesisCache(str(tmp_path / 'cache'))
+    cache.store_data('a', b'x' * 200)
+    cache.store_data('a', b'x' * 100)
+    assert cache._size == 100
+
+
+def test_loads_entries_in_mtime_order(tmp_path):
+    cache = SynthesisCache(str(tmp_path / 'cache'))
+    for i, key in enumerate('cab'):
+        cache.store_data(key, b'x' * 10)
+        os.utime(cache._get_fname(key), (i, i))
+    reloaded = SynthesisCache(cache.cache_dir)
+    assert get_keys(reloaded) == ['c', 'a', 'b']
+    assert reloaded._size == 30
+    # entries stored by another process are picked up on a hit
+    cache.store_data('d', b'x' * 10)
+    assert reloaded.read('d') is not None
+    assert get_keys(reloaded) == ['c', 'a', 'b', 'd']
+    reloaded.clear()
+    assert reloaded._size == 0 and os.listdir(reloaded.cache_dir) == []
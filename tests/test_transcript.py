@@ -0,0 +1,46 @@
+import os
+import pytest
+import transcript
+
+SWITCHBOARD_DIR = '../misc/switchboard'
+
+
+def test_parse_line_types():
+    assert transcript.parse_line('0 0.3 [silence]\n') == \
+        transcript.SilenceTurn(0.3)
+    turn = transcript.parse_line('1 1.5 3.5 64.0 164 11 hello there\n')
+    assert turn == transcript.HumanTurn(1.5, 3.5, 64.0, 164.0, 11.0,
+                                        'hello there')
+    assert turn.duration == 2.0
+    assert turn.speech_rate == 5.5
+    assert transcript.parse_line('2 13 I would say') == \
+        transcript.SynthTurn(13.0, 'I would say', None, None, None)
+    assert transcript.parse_line('2 13 65.0 120.0 4.5 I would say',
+                                 synth_features=True) == \
+        transcript.SynthTurn(13.0, 'I would say', 65.0, 120.0, 4.5)
+
+
+@pytest.mark.parametrize('line', ['0', '1 1.5 3.5 64.0 164',
+                                  '1 3.5 1.5 64.0 164 11 reversed',
+                                  '2', '2 x hello', '3 1.0 unknown'])
+def test_parse_line_rejects_malformed(line):
+    with pytest.raises(ValueError):
+        transcript.parse_line(line)
+
+
+def test_parse_lines_names_line_number():
+    turns = transcript.parse_lines(['0 0.3 [silence]\n', '\n',
+                                    '2 bad text\n'], name='part9.text')
+    assert next(turns) == transcript.SilenceTurn(0.3)
+    with pytest.raises(ValueError, match='part9.text, line 3'):
+        next(turns)
+
+
+@pytest.mark.parametrize('fname,synth_features',
+                         [('part1.text', False), ('part2.text', False),
+                          ('part1_features_both.text', True),
+                          ('part2_features_both.text', True)])
+def test_switchboard_transcriptions_are_valid(fname, synth_features):
+    counts = transcript.validate(os.path.join(SWITCHBOARD_DIR, fname),
+                                 synth_features)
+    assert counts['HumanTurn'] > 0 and counts['SynthTurn'] > 0